@@ -1,6 +1,12 @@
+from collections import defaultdict
+
+from dcim.models import Device
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db import models
+from django.utils import timezone
+from extras.choices import ObjectChangeActionChoices
 from ipam.api.nested_serializers import NestedIPAddressSerializer
+from ipam.models import IPAddress
 from netbox.api.serializers import WritableNestedSerializer
 from rest_framework import serializers
 from rest_framework.serializers import (
@@ -9,13 +15,17 @@ from rest_framework.serializers import (
     SerializerMethodField,
 )
 from tenancy.api.nested_serializers import NestedTenantSerializer
+from tenancy.models import Tenant
 
 from netbox_cmdb.api.common_serializers import CommonDeviceSerializer
-from netbox_cmdb.choices import AssetMonitoringStateChoices
+from netbox_cmdb.choices import AssetMonitoringStateChoices, AssetStateChoices
 from netbox_cmdb.constants import BGP_MAX_ASN, BGP_MIN_ASN
+from netbox_cmdb.helpers import changelog, cleaning, references
 from netbox_cmdb.models.bgp import (
     ASN,
+    ENDPOINT_FIELDS,
     AfiSafi,
+    AfiSafiChoices,
     Aggregate,
     BGPGlobal,
     BGPPeerGroup,
@@ -24,6 +34,7 @@ from netbox_cmdb.models.bgp import (
     DeviceBGPSession,
     GlobalAfiSafi,
     RedistributedNetwork,
+    session_endpoints,
 )
 from netbox_cmdb.models.circuit import Circuit
 from netbox_cmdb.models.route_policy import RoutePolicy
@@ -44,6 +55,32 @@ class AvailableAsnSerializer(ModelSerializer):
         fields = ["organization_name", "min_asn", "max_asn"]
 
 
+class BulkAvailableAsnSerializer(serializers.Serializer):
+    min_asn = IntegerField(max_value=BGP_MAX_ASN, min_value=BGP_MIN_ASN)
+    max_asn = IntegerField(max_value=BGP_MAX_ASN, min_value=BGP_MIN_ASN)
+    organization_names = serializers.ListField(
+        child=serializers.CharField(max_length=100), allow_empty=False, max_length=1000
+    )
+
+    def validate_organization_names(self, organization_names):
+        duplicates = sorted(
+            {name for name in organization_names if organization_names.count(name) > 1}
+        )
+        if duplicates:
+            raise serializers.ValidationError(
+                f"organization names must be unique: {', '.join(duplicates)}"
+            )
+
+        existing = ASN.objects.filter(organization_name__in=organization_names).values_list(
+            "organization_name", flat=True
+        )
+        if existing:
+            raise serializers.ValidationError(
+                f"ASNs already exist for organization names: {', '.join(sorted(existing))}"
+            )
+        return organization_names
+
+
 class NestedAggregateSerializer(ModelSerializer):
     class Meta:
         model = Aggregate
@@ -364,19 +401,16 @@ class BGPSessionSerializer(ModelSerializer):
     def validate(self, attrs):
         # Check for a duplicate BGP session (same devices / ips).
         errors = []
-        if BGPSession.objects.exclude(pk=getattr(self.instance, "id", None)).filter(
-            Q(
-                peer_a__device=attrs["peer_a"]["device"],
-                peer_a__local_address=attrs["peer_a"]["local_address"],
-                peer_b__device=attrs["peer_b"]["device"],
-                peer_b__local_address=attrs["peer_b"]["local_address"],
-            )
-            | Q(
-                peer_a__device__name=attrs["peer_b"]["device"],
-                peer_a__local_address=attrs["peer_b"]["local_address"],
-                peer_b__device__name=attrs["peer_a"]["device"],
-                peer_b__local_address=attrs["peer_a"]["local_address"],
+        endpoints = session_endpoints(
+            *(
+                (attrs[peer]["device"].pk, attrs[peer]["local_address"].pk)
+                for peer in ["peer_a", "peer_b"]
             )
+        )
+        if (
+            BGPSession.objects.exclude(pk=getattr(self.instance, "id", None))
+            .filter(**endpoints)
+            .exists()
         ):
             error = serializers.ValidationError(
                 "A BGP session already exists between these 2 devices and IP addresses."
@@ -412,4 +446,345 @@ class BGPSessionSerializer(ModelSerializer):
 
     class Meta:
         model = BGPSession
-        fields = "__all__"
+        # the endpoints are derived from the peers
+        exclude = ENDPOINT_FIELDS
+
+
+class BulkAfiSafiSerializer(serializers.Serializer):
+    afi_safi_name = serializers.ChoiceField(choices=AfiSafiChoices)
+    route_policy_in = IntegerField(required=False, allow_null=True)
+    route_policy_out = IntegerField(required=False, allow_null=True)
+
+
+class BulkDeviceBGPSessionSerializer(serializers.Serializer):
+    device = IntegerField()
+    local_address = IntegerField()
+    local_asn = IntegerField(required=False, allow_null=True)
+    peer_group = IntegerField(required=False, allow_null=True)
+    route_policy_in = IntegerField(required=False, allow_null=True)
+    route_policy_out = IntegerField(required=False, allow_null=True)
+    description = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    enabled = serializers.BooleanField(required=False)
+    enforce_first_as = serializers.BooleanField(required=False)
+    maximum_prefixes = IntegerField(required=False, allow_null=True, min_value=0)
+    delay_open_timer = IntegerField(required=False, min_value=0, max_value=240)
+    afi_safis = BulkAfiSafiSerializer(required=False, many=True)
+
+    def validate_afi_safis(self, value):
+        names = [afi_safi["afi_safi_name"] for afi_safi in value]
+        if len(names) != len(set(names)):
+            raise serializers.ValidationError("AFI/SAFI names must be unique.")
+        return value
+
+
+class BulkBGPSessionListSerializer(serializers.ListSerializer):
+    """Validates and creates or updates a batch of BGP sessions with set-based queries.
+
+    Related objects of the whole batch are fetched with one query per model, which is enough
+    to check device consistency in Python, and duplicates are searched with a single query.
+    Updates are partial and applied to the sessions given as `instance`, in the order of the
+    data; the devices and local addresses of their peers cannot be changed.
+    """
+
+    # (model, fields referencing it) of the DeviceBGPSession and AfiSafi payloads
+    PEER_REFERENCES = [
+        (Device, ["device"]),
+        (IPAddress, ["local_address"]),
+        (ASN, ["local_asn"]),
+        (BGPPeerGroup, ["peer_group"]),
+        (RoutePolicy, ["route_policy_in", "route_policy_out"]),
+    ]
+    SESSION_REFERENCES = [
+        (Circuit, ["circuit"]),
+        (Tenant, ["tenant"]),
+    ]
+
+    def _resolve_references(self, sessions):
+        """Replace primary keys by objects, return the errors of each session."""
+        wanted = defaultdict(set)
+        for session in sessions:
+            for model, fields in self.SESSION_REFERENCES:
+                wanted[model].update(session.get(field) for field in fields)
+            for peer in ["peer_a", "peer_b"]:
+                if peer not in session:
+                    continue
+                for model, fields in self.PEER_REFERENCES:
+                    wanted[model].update(session[peer].get(field) for field in fields)
+                for afi_safi in session[peer].get("afi_safis", []):
+                    wanted[RoutePolicy].update(
+                        afi_safi.get(field) for field in ["route_policy_in", "route_policy_out"]
+                    )
+
+        objects = {
+            model: model.objects.in_bulk([pk for pk in pks if pk is not None])
+            for model, pks in wanted.items()
+        }
+
+        def resolve(data, model, field, errors):
+            pk = data.get(field)
+            if pk is None:
+                return
+            if pk not in objects[model]:
+                errors.append(f"{field}: {model._meta.verbose_name} {pk} does not exist.")
+                return
+            data[field] = objects[model][pk]
+
+        all_errors = []
+        for session in sessions:
+            errors = []
+            for model, fields in self.SESSION_REFERENCES:
+                for field in fields:
+                    resolve(session, model, field, errors)
+            for peer in ["peer_a", "peer_b"]:
+                if peer not in session:
+                    continue
+                for model, fields in self.PEER_REFERENCES:
+                    for field in fields:
+                        resolve(session[peer], model, field, errors)
+                for afi_safi in session[peer].get("afi_safis", []):
+                    for field in ["route_policy_in", "route_policy_out"]:
+                        resolve(afi_safi, RoutePolicy, field, errors)
+            all_errors.append(errors)
+
+        return all_errors
+
+    @staticmethod
+    def _session_key(session):
+        """Orientation independent key identifying the devices and IPs of a session."""
+        endpoints = session_endpoints(
+            *(
+                (session[peer]["device"].pk, session[peer]["local_address"].pk)
+                for peer in ["peer_a", "peer_b"]
+            )
+        )
+        return tuple(endpoints[f"{field}_id"] for field in ENDPOINT_FIELDS)
+
+    def _check_duplicates(self, sessions, all_errors):
+        keys = [self._session_key(session) for session in sessions]
+        # the sessions between the devices of the batch, read from the endpoint index
+        existing = set(
+            BGPSession.objects.filter(
+                low_device__in={key[0] for key in keys},
+                high_device__in={key[1] for key in keys},
+            ).values_list(*ENDPOINT_FIELDS)
+        )
+
+        seen = set()
+        for index, key in enumerate(keys):
+            errors = all_errors[index]
+            if key in existing:
+                errors.append(
+                    "A BGP session already exists between these 2 devices and IP addresses."
+                )
+            elif key in seen:
+                errors.append("This BGP session is defined more than once in the batch.")
+            seen.add(key)
+
+    @staticmethod
+    def _check_device_consistency(sessions, all_errors):
+        for index, session in enumerate(sessions):
+            errors = all_errors[index]
+            for peer in ["peer_a", "peer_b"]:
+                data = session[peer]
+                try:
+                    DeviceBGPSession.validate_device_consistency(
+                        data["device"],
+                        data.get("peer_group"),
+                        data.get("route_policy_in"),
+                        data.get("route_policy_out"),
+                    )
+                except ValidationError as error:
+                    errors.extend(error.messages)
+
+                for afi_safi in data.get("afi_safis", []):
+                    try:
+                        AfiSafi.validate_device_consistency(
+                            data["device"],
+                            afi_safi.get("route_policy_in"),
+                            afi_safi.get("route_policy_out"),
+                        )
+                    except ValidationError as error:
+                        errors.extend(error.messages)
+
+    def _check_endpoints_unchanged(self, sessions, all_errors):
+        for index, session in enumerate(sessions):
+            for peer in ["peer_a", "peer_b"]:
+                current = getattr(self.instance[index], peer)
+                for field in ["device", "local_address"]:
+                    # an unknown primary key is not resolved and already reported
+                    value = getattr(session.get(peer, {}).get(field), "pk", None)
+                    if value is not None and value != getattr(current, f"{field}_id"):
+                        all_errors[index].append(
+                            f"{peer}.{field}: cannot be changed by a bulk update."
+                        )
+
+    def _with_current_values(self, sessions):
+        """Complete the peers of partial updates with the current values of their sessions."""
+        complete = []
+        for index, session in enumerate(sessions):
+            peers = {}
+            for peer in ["peer_a", "peer_b"]:
+                current = getattr(self.instance[index], peer)
+                peers[peer] = {
+                    "device": current.device,
+                    "peer_group": current.peer_group,
+                    "route_policy_in": current.route_policy_in,
+                    "route_policy_out": current.route_policy_out,
+                    **session.get(peer, {}),
+                }
+            complete.append(peers)
+        return complete
+
+    def validate(self, attrs):
+        all_errors = self._resolve_references(attrs)
+        if self.instance is None:
+            if not any(all_errors):
+                self._check_duplicates(attrs, all_errors)
+                self._check_device_consistency(attrs, all_errors)
+        else:
+            self._check_endpoints_unchanged(attrs, all_errors)
+            if not any(all_errors):
+                self._check_device_consistency(self._with_current_values(attrs), all_errors)
+
+        if any(all_errors):
+            # errors are keyed by the index of the failing sessions in the batch
+            raise serializers.ValidationError(
+                {
+                    "errors": {
+                        str(index): errors for index, errors in enumerate(all_errors) if errors
+                    }
+                }
+            )
+
+        return attrs
+
+    def create(self, validated_data):
+        peers = []
+        afi_safis = []
+        sessions = []
+        for data in validated_data:
+            session_data = dict(data)
+            for peer in ["peer_a", "peer_b"]:
+                peer_data = dict(session_data.pop(peer))
+                afi_safis_data = peer_data.pop("afi_safis", [])
+                session_data[peer] = DeviceBGPSession(**peer_data)
+                peers.append(session_data[peer])
+                afi_safis.extend(
+                    AfiSafi(device_bgp_session=session_data[peer], **afi_safi_data)
+                    for afi_safi_data in afi_safis_data
+                )
+            sessions.append(BGPSession(**session_data))
+
+        # Peers get their primary keys from this insertion, they are then picked up by the
+        # AFI/SAFIs and sessions referencing them.
+        DeviceBGPSession.objects.bulk_create(peers)
+        AfiSafi.objects.bulk_create(afi_safis)
+        BGPSession.objects.bulk_create(sessions)
+        references.index_created(DeviceBGPSession, peers)
+        references.index_created(BGPSession, sessions)
+
+        request = self.context.get("request")
+        if request is not None:
+            changelog.log_bulk_changes(request, peers + afi_safis + sessions)
+
+        return sessions
+
+    @staticmethod
+    def _apply_changes(obj, data, changed_fields):
+        """Set the values of `data` which differ on `obj`, return whether it changed."""
+        changed = False
+        for field, value in data.items():
+            input_value = value.pk if isinstance(value, models.Model) else value
+            if input_value == getattr(obj, obj._meta.get_field(field).attname):
+                continue
+            if not changed:
+                obj.snapshot()
+                changed = True
+            setattr(obj, field, value)
+            changed_fields.add(field)
+        return changed
+
+    def update(self, instance, validated_data):
+        """Apply partial updates to a batch of sessions with one query per kind of write.
+
+        The AFI/SAFIs of a peer are replaced when given: they are matched by name, then
+        created, updated and deleted. Unchanged objects are not written.
+        """
+        sessions, peers, afi_safis = [], [], []
+        created, deleted = [], []
+        session_fields, peer_fields, afi_safi_fields = set(), set(), set()
+        for index, data in enumerate(validated_data):
+            session = instance[index]
+            session_data = dict(data)
+            for peer in ["peer_a", "peer_b"]:
+                peer_data = dict(session_data.pop(peer, {}))
+                afi_safis_data = peer_data.pop("afi_safis", None)
+                device_bgp_session = getattr(session, peer)
+                if self._apply_changes(device_bgp_session, peer_data, peer_fields):
+                    peers.append(device_bgp_session)
+                if afi_safis_data is None:
+                    continue
+
+                existing = {
+                    afi_safi.afi_safi_name: afi_safi
+                    for afi_safi in device_bgp_session.afi_safis.all()
+                }
+                for afi_safi_data in afi_safis_data:
+                    afi_safi = existing.pop(afi_safi_data["afi_safi_name"], None)
+                    if afi_safi is None:
+                        created.append(
+                            AfiSafi(device_bgp_session=device_bgp_session, **afi_safi_data)
+                        )
+                    elif self._apply_changes(afi_safi, afi_safi_data, afi_safi_fields):
+                        afi_safis.append(afi_safi)
+                deleted.extend(existing.values())
+            if self._apply_changes(session, session_data, session_fields):
+                sessions.append(session)
+
+        if deleted:
+            for afi_safi in deleted:
+                afi_safi.snapshot()
+            # the change log of the AFI/SAFIs is recorded below
+            cleaning.raw_delete(
+                AfiSafi, AfiSafi._meta.pk.column, [afi_safi.pk for afi_safi in deleted]
+            )
+        now = timezone.now()
+        for model, objects, fields in [
+            (DeviceBGPSession, peers, peer_fields),
+            (AfiSafi, afi_safis, afi_safi_fields),
+            (BGPSession, sessions, session_fields),
+        ]:
+            if objects:
+                for obj in objects:
+                    obj.last_updated = now
+                model.objects.bulk_update(objects, [*sorted(fields), "last_updated"])
+        AfiSafi.objects.bulk_create(created)
+
+        request = self.context.get("request")
+        if request is not None:
+            changelog.log_bulk_changes(request, deleted, ObjectChangeActionChoices.ACTION_DELETE)
+            changelog.log_bulk_changes(
+                request, peers + afi_safis + sessions, ObjectChangeActionChoices.ACTION_UPDATE
+            )
+            changelog.log_bulk_changes(request, created, ObjectChangeActionChoices.ACTION_CREATE)
+
+        return instance
+
+
+class BulkBGPSessionSerializer(serializers.Serializer):
+    """Write-only BGP session payload of the bulk endpoint.
+
+    Related objects are referenced by primary key only, so the whole batch can be resolved
+    with one query per model. Use `partial=True` for updates.
+    """
+
+    peer_a = BulkDeviceBGPSessionSerializer()
+    peer_b = BulkDeviceBGPSessionSerializer()
+    state = serializers.ChoiceField(choices=AssetStateChoices, required=False)
+    monitoring_state = serializers.ChoiceField(choices=AssetMonitoringStateChoices, required=False)
+    password = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    circuit = IntegerField(required=False, allow_null=True)
+    tenant = IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        list_serializer_class = BulkBGPSessionListSerializer
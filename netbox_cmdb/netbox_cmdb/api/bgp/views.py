@@ -1,9 +1,12 @@
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.db import transaction
+from django.db.models import Prefetch
 from django_pglocks import advisory_lock
 from drf_yasg.utils import swagger_auto_schema
+from netbox.api.serializers import BulkOperationSerializer
 from netbox.api.viewsets.mixins import ObjectValidationMixin
 from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -15,6 +18,8 @@ from netbox_cmdb.api.bgp.serializers import (
     BGPGlobalSerializer,
     BGPPeerGroupSerializer,
     BGPSessionSerializer,
+    BulkAvailableAsnSerializer,
+    BulkBGPSessionSerializer,
     DeviceBGPSessionSerializer,
 )
 from netbox_cmdb.api.viewsets import CustomNetBoxModelViewSet
@@ -23,8 +28,10 @@ from netbox_cmdb.filtersets import (
     BGPSessionFilterSet,
     DeviceBGPSessionFilterSet,
 )
+from netbox_cmdb.helpers import changelog
 from netbox_cmdb.models.bgp import (
     ASN,
+    AfiSafi,
     BGPGlobal,
     BGPPeerGroup,
     BGPSession,
@@ -72,7 +79,7 @@ class AvailableASNsView(ObjectValidationMixin, APIView):
 
     @advisory_lock("create-next-available-asn")
     def _create_next_available_asn(self, min_asn, max_asn, organization_name):
-        available_asns = ASN().get_available_asns(min_asn, max_asn)
+        available_asns = ASN().get_available_asns(min_asn, max_asn, limit=1)
         if not len(available_asns) > 0:
             raise ValidationError(detail="No ASN available within this range.")
 
@@ -95,20 +102,183 @@ class AvailableASNsView(ObjectValidationMixin, APIView):
         return serializer.data
 
 
+class BulkAvailableASNsView(APIView):
+    queryset = ASN.objects.all()
+
+    @swagger_auto_schema(
+        request_body=BulkAvailableAsnSerializer,
+        responses={201: BGPASNSerializer(many=True)},
+    )
+    def post(self, request):
+        self.queryset = self.queryset.restrict(request.user, "add")
+
+        serializer = BulkAvailableAsnSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+
+        min_asn, max_asn = (
+            serializer.validated_data["min_asn"],
+            serializer.validated_data["max_asn"],
+        )
+        if min_asn > max_asn:
+            raise ValidationError(detail="Min ASN can't be inferior to max ASN.")
+
+        created = self._create_next_available_asns(
+            request, min_asn, max_asn, serializer.validated_data["organization_names"]
+        )
+        return Response(
+            BGPASNSerializer(created, many=True, context={"request": request}).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @advisory_lock("create-next-available-asn")
+    def _create_next_available_asns(self, request, min_asn, max_asn, organization_names):
+        available_asns = ASN().get_available_asns(min_asn, max_asn, limit=len(organization_names))
+        if len(available_asns) < len(organization_names):
+            raise ValidationError(
+                detail=f"Only {len(available_asns)} ASNs available within this range."
+            )
+
+        asns = [
+            ASN(number=number, organization_name=organization_names[index])
+            for index, number in enumerate(available_asns)
+        ]
+        try:
+            with transaction.atomic():
+                ASN.objects.bulk_create(asns)
+                pks = [asn.pk for asn in asns]
+                if self.queryset.filter(pk__in=pks).count() != len(pks):
+                    raise ObjectDoesNotExist()
+                changelog.log_bulk_changes(request, asns)
+        except ObjectDoesNotExist:
+            raise PermissionDenied()
+        return asns
+
+
 class BGPGlobalViewSet(CustomNetBoxModelViewSet):
     queryset = BGPGlobal.objects.all()
     serializer_class = BGPGlobalSerializer
     filterset_fields = ["device__name"] + filtersets.device_location_filterset
 
 
+# Relations rendered by DeviceBGPSessionSerializer, relative to a DeviceBGPSession.
+# Keep these in sync with the serializer: any nested field missing here costs one query per row.
+DEVICE_BGP_SESSION_SELECT_RELATED = [
+    "device",
+    "local_address",
+    "local_asn",
+    "peer_group__device",
+    "route_policy_in",
+    "route_policy_out",
+]
+
+
+def device_bgp_session_prefetch_related(prefix=""):
+    """Return the prefetch needed to render the AFI/SAFIs of a DeviceBGPSession.
+
+    Both route policies are joined in the AFI/SAFI query, so all AFI/SAFIs of a page are
+    loaded in a single query whatever the number of sessions.
+    """
+    return [
+        Prefetch(
+            f"{prefix}afi_safis",
+            queryset=AfiSafi.objects.select_related("route_policy_in", "route_policy_out"),
+        )
+    ]
+
+
 class BGPSessionsViewSet(CustomNetBoxModelViewSet):
-    queryset = BGPSession.objects.all()
+    queryset = BGPSession.objects.select_related(
+        "tenant",
+        *[f"peer_a__{field}" for field in DEVICE_BGP_SESSION_SELECT_RELATED],
+        *[f"peer_b__{field}" for field in DEVICE_BGP_SESSION_SELECT_RELATED],
+    ).prefetch_related(
+        *device_bgp_session_prefetch_related("peer_a__"),
+        *device_bgp_session_prefetch_related("peer_b__"),
+    )
     serializer_class = BGPSessionSerializer
     filterset_class = BGPSessionFilterSet
 
+    @swagger_auto_schema(
+        request_body=BulkBGPSessionSerializer(many=True),
+        responses={201: BGPSessionSerializer(many=True)},
+    )
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
+        """Create a batch of BGP sessions with set-based validation and insertion.
+
+        Related objects are referenced by primary key. Change logging is preserved but, as
+        with any bulk operation, no webhook is triggered.
+        """
+        serializer = BulkBGPSessionSerializer(
+            data=request.data, many=True, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            with transaction.atomic():
+                sessions = serializer.save()
+                pks = [session.pk for session in sessions]
+                # Enforce object-level permissions on the whole batch at once
+                if self.queryset.filter(pk__in=pks).count() != len(pks):
+                    raise ObjectDoesNotExist
+        except ObjectDoesNotExist:
+            raise PermissionDenied()
+
+        data = BGPSessionSerializer(
+            self.queryset.filter(pk__in=pks), many=True, context=self.get_serializer_context()
+        ).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        request_body=BulkBGPSessionSerializer(many=True, partial=True),
+        responses={200: BGPSessionSerializer(many=True)},
+    )
+    @bulk_create.mapping.patch
+    def bulk_update_sessions(self, request):
+        """Update a batch of BGP sessions with set-based validation and writes.
+
+        Each item gives the `id` of a session and the attributes to change; the AFI/SAFIs of
+        a peer are replaced when given. The devices and local addresses of the peers cannot
+        be changed. Change logging is preserved but no webhook is triggered.
+        """
+        ids = BulkOperationSerializer(data=request.data, many=True)
+        ids.is_valid(raise_exception=True)
+        pks = [item["id"] for item in ids.validated_data]
+
+        # the queryset is restricted to the sessions the user can change
+        sessions = self.queryset.in_bulk(pks)
+        errors = {}
+        seen = set()
+        for index, pk in enumerate(pks):
+            if pk not in sessions:
+                errors[str(index)] = [f"BGP session {pk} does not exist."]
+            elif pk in seen:
+                errors[str(index)] = ["This BGP session is defined more than once in the batch."]
+            seen.add(pk)
+        if errors:
+            raise ValidationError({"errors": errors})
+
+        serializer = BulkBGPSessionSerializer(
+            [sessions[pk] for pk in pks],
+            data=request.data,
+            many=True,
+            partial=True,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+
+        data = BGPSessionSerializer(
+            self.queryset.filter(pk__in=pks), many=True, context=self.get_serializer_context()
+        ).data
+        return Response(data)
+
 
 class DeviceBGPSessionsViewSet(CustomNetBoxModelViewSet):
-    queryset = DeviceBGPSession.objects.all()
+    queryset = DeviceBGPSession.objects.select_related(
+        *DEVICE_BGP_SESSION_SELECT_RELATED
+    ).prefetch_related(*device_bgp_session_prefetch_related())
     serializer_class = DeviceBGPSessionSerializer
     filterset_class = DeviceBGPSessionFilterSet
 
@@ -0,0 +1,170 @@
+"""Assembly of all CMDB objects attached to devices."""
+
+from collections import defaultdict
+
+from netbox_cmdb.api.bgp.serializers import (
+    BGPGlobalSerializer,
+    BGPPeerGroupSerializer,
+    BGPSessionSerializer,
+    DeviceBGPSessionSerializer,
+)
+from netbox_cmdb.api.bgp.views import BGPSessionsViewSet, DeviceBGPSessionsViewSet
+from netbox_cmdb.api.bgp_community_list.serializers import BGPCommunityListSerializer
+from netbox_cmdb.api.interface.serializers import (
+    DeviceInterfaceSerializer,
+    LinkSerializer,
+    LogicalInterfaceSerializer,
+)
+from netbox_cmdb.api.prefix_list.serializers import PrefixListSerializer
+from netbox_cmdb.api.route_policy.serializers import WritableRoutePolicySerializer
+from netbox_cmdb.api.route_policy.views import RoutePolicyViewSet
+from netbox_cmdb.api.snmp.serializers import SNMPReadSerializer
+from netbox_cmdb.api.syslog.serializers import SyslogReadSerializer
+from netbox_cmdb.api.tacacs.serializers import TacacsReadSerializer
+from netbox_cmdb.models.bgp import BGPGlobal, BGPPeerGroup
+from netbox_cmdb.models.bgp_community_list import BGPCommunityList
+from netbox_cmdb.models.interface import DeviceInterface, Link, LogicalInterface
+from netbox_cmdb.models.prefix_list import PrefixList
+from netbox_cmdb.models.snmp import SNMP
+from netbox_cmdb.models.syslog import Syslog
+from netbox_cmdb.models.tacacs import Tacacs
+
+
+class BundleContent:
+    """One kind of CMDB object in a device bundle.
+
+    `device_fields` are the paths from the object to the device(s) it is attached to, an object
+    reachable from several devices (e.g. a BGP session) appears in the bundle of each of them.
+    A `single` content is rendered as one object (or null) instead of a list.
+    """
+
+    def __init__(self, name, queryset, serializer_class, device_fields=("device",), single=False):
+        self.name = name
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.device_fields = device_fields
+        self.single = single
+
+
+BUNDLE_CONTENT = [
+    BundleContent(
+        "bgp_global",
+        BGPGlobal.objects.select_related("device", "local_asn").prefetch_related(
+            "afi_safis__aggregates", "afi_safis__redistributed_networks"
+        ),
+        BGPGlobalSerializer,
+        single=True,
+    ),
+    BundleContent(
+        "bgp_sessions",
+        BGPSessionsViewSet.queryset,
+        BGPSessionSerializer,
+        device_fields=("peer_a__device", "peer_b__device"),
+    ),
+    BundleContent(
+        "device_bgp_sessions", DeviceBGPSessionsViewSet.queryset, DeviceBGPSessionSerializer
+    ),
+    BundleContent(
+        "peer_groups",
+        BGPPeerGroup.objects.select_related(
+            "device", "local_asn", "remote_asn", "route_policy_in", "route_policy_out"
+        ),
+        BGPPeerGroupSerializer,
+    ),
+    BundleContent(
+        "route_policies",
+        RoutePolicyViewSet.queryset,
+        WritableRoutePolicySerializer,
+    ),
+    BundleContent(
+        "prefix_lists",
+        PrefixList.objects.select_related("device").prefetch_related("prefix_list_term"),
+        PrefixListSerializer,
+    ),
+    BundleContent(
+        "bgp_community_lists",
+        BGPCommunityList.objects.select_related("device").prefetch_related(
+            "bgp_community_list_term"
+        ),
+        BGPCommunityListSerializer,
+    ),
+    BundleContent(
+        "snmp",
+        SNMP.objects.select_related("device").prefetch_related("community_list"),
+        SNMPReadSerializer,
+        single=True,
+    ),
+    BundleContent(
+        "syslog",
+        Syslog.objects.select_related("device").prefetch_related("server_list"),
+        SyslogReadSerializer,
+        single=True,
+    ),
+    BundleContent(
+        "tacacs",
+        Tacacs.objects.select_related("device").prefetch_related("server_list"),
+        TacacsReadSerializer,
+        single=True,
+    ),
+    BundleContent(
+        "device_interfaces",
+        DeviceInterface.objects.select_related("device"),
+        DeviceInterfaceSerializer,
+    ),
+    BundleContent(
+        "logical_interfaces",
+        LogicalInterface.objects.select_related(
+            "parent_interface__device",
+            "vrf",
+            "ipv4_address",
+            "ipv6_address",
+            "untagged_vlan",
+            "native_vlan",
+        ).prefetch_related("tagged_vlans"),
+        LogicalInterfaceSerializer,
+        device_fields=("parent_interface__device",),
+    ),
+    BundleContent(
+        "links",
+        Link.objects.select_related("interface_a__device", "interface_b__device"),
+        LinkSerializer,
+        device_fields=("interface_a__device", "interface_b__device"),
+    ),
+]
+
+
+def build_device_bundles(devices, request):
+    """Return the CMDB bundle of each device, in the order of `devices`.
+
+    Each kind of object is fetched for all devices at once, so the number of queries only
+    depends on BUNDLE_CONTENT, not on the number of devices or objects.
+    """
+    device_ids = [device.pk for device in devices]
+    context = {"request": request}
+    bundles = {device.pk: {"device": {"id": device.pk, "name": device.name}} for device in devices}
+
+    for content in BUNDLE_CONTENT:
+        objects_per_device = defaultdict(list)
+        for field in content.device_fields:
+            queryset = content.queryset.restrict(request.user, "view").filter(
+                **{f"{field}__in": device_ids}
+            )
+            *path, device_field = field.split("__")
+            for obj in queryset:
+                parent = obj
+                for attr in path:
+                    parent = getattr(parent, attr)
+                objects_per_device[getattr(parent, f"{device_field}_id")].append(obj)
+
+        for device_id, bundle in bundles.items():
+            objects = objects_per_device[device_id]
+            if content.single:
+                bundle[content.name] = (
+                    content.serializer_class(objects[0], context=context).data if objects else None
+                )
+            else:
+                bundle[content.name] = content.serializer_class(
+                    objects, many=True, context=context
+                ).data
+
+    return [bundles[device_id] for device_id in device_ids]
@@ -0,0 +1,231 @@
+"""Incremental feed of the CMDB changes, built on NetBox change log."""
+
+import base64
+import binascii
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Q
+from extras.choices import ObjectChangeActionChoices
+from extras.models import ObjectChange
+
+from netbox_cmdb.models.bgp import (
+    AfiSafi,
+    Aggregate,
+    BGPGlobal,
+    BGPPeerGroup,
+    BGPSession,
+    DeviceBGPSession,
+    GlobalAfiSafi,
+    RedistributedNetwork,
+)
+from netbox_cmdb.models.bgp_community_list import BGPCommunityList, BGPCommunityListTerm
+from netbox_cmdb.models.interface import DeviceInterface, Link, LogicalInterface
+from netbox_cmdb.models.prefix_list import PrefixList, PrefixListTerm
+from netbox_cmdb.models.route_policy import RoutePolicy, RoutePolicyTerm
+from netbox_cmdb.models.snmp import SNMP, SNMPCommunity
+from netbox_cmdb.models.syslog import Syslog, SyslogServer
+from netbox_cmdb.models.tacacs import Tacacs, TacacsServer
+
+# Paths from a CMDB object to the device(s) whose configuration it is part of.
+# Models missing here (ASN, VRF, VLAN...) are shared objects, not attached to any device.
+DEVICE_PATHS = {
+    BGPGlobal: ["device"],
+    GlobalAfiSafi: ["bgp_global__device"],
+    Aggregate: ["global_afi_safi__bgp_global__device"],
+    RedistributedNetwork: ["global_afi_safi__bgp_global__device"],
+    BGPSession: ["peer_a__device", "peer_b__device"],
+    DeviceBGPSession: ["device"],
+    AfiSafi: ["device_bgp_session__device"],
+    BGPPeerGroup: ["device"],
+    RoutePolicy: ["device"],
+    RoutePolicyTerm: ["route_policy__device"],
+    PrefixList: ["device"],
+    PrefixListTerm: ["prefix_list__device"],
+    BGPCommunityList: ["device"],
+    BGPCommunityListTerm: ["bgp_community_list__device"],
+    SNMP: ["device"],
+    SNMPCommunity: ["snmp_community__device"],
+    Syslog: ["device"],
+    SyslogServer: ["syslog_syslog_server__device"],
+    Tacacs: ["device"],
+    TacacsServer: ["tacacs_tacacs_server__device"],
+    DeviceInterface: ["device"],
+    LogicalInterface: ["parent_interface__device"],
+    Link: ["interface_a__device", "interface_b__device"],
+}
+
+
+# Change ids are allocated on insertion but read on commit: a change committed after a
+# change with a higher id was read is behind the cursor. The ids missing below the cursor are
+# kept in it, and read again, until their change shows up or for this long, after which their
+# transaction is taken as rolled back.
+PENDING_TIMEOUT = timedelta(minutes=5)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(change_id, pending=None):
+    """Encode the last change id read and the {id: time first missed} of the pending ids."""
+    cursor = f"c:{change_id}"
+    if pending:
+        cursor += ":" + ",".join(
+            f"{pk}@{int(missed.timestamp())}" for pk, missed in sorted(pending.items())
+        )
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the last change id read and the pending ids of a cursor."""
+    try:
+        prefix, change_id, *rest = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        if prefix != "c" or len(rest) > 1:
+            raise ValueError()
+        pending = {}
+        for item in rest[0].split(",") if rest else []:
+            pk, missed = item.split("@")
+            pending[int(pk)] = datetime.fromtimestamp(int(missed), tz=timezone.utc)
+        return int(change_id), pending
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError, OSError):
+        raise InvalidCursor()
+
+
+def _pending_ids(since, last, pending, now):
+    """Return the ids missing in (since, last] and still pending, with their missed time.
+
+    Only the ids above the last change older than PENDING_TIMEOUT are looked for: the ids
+    below it were allocated before it, by transactions which would be timed out.
+    """
+    expired = now - PENDING_TIMEOUT
+    start = (
+        ObjectChange.objects.filter(pk__gt=since, pk__lte=last, time__lt=expired)
+        .order_by("-pk")
+        .values_list("pk", flat=True)
+        .first()
+    ) or since
+    committed = set(
+        ObjectChange.objects.filter(
+            Q(pk__gt=start, pk__lte=last) | Q(pk__in=list(pending))
+        ).values_list("pk", flat=True)
+    )
+
+    missing = {pk: missed for pk, missed in pending.items() if missed > expired}
+    missing.update((pk, now) for pk in range(start + 1, last + 1))
+    return {pk: missed for pk, missed in missing.items() if pk not in committed}
+
+
+def _devices_of_existing_objects(model, pks):
+    """Return {pk: {device ids}} for objects still in the database."""
+    devices = defaultdict(set)
+    for path in DEVICE_PATHS.get(model, []):
+        for pk, device_id in model.objects.filter(pk__in=pks).values_list("pk", path):
+            if device_id is not None:
+                devices[pk].add(device_id)
+    return devices
+
+
+def _devices_of_deleted_objects(model, changes):
+    """Return {pk: {device ids}} for deleted objects, from their last known snapshot.
+
+    The first hop of each path is read from the snapshot, the rest of the path is resolved
+    in the database when the parent object still exists (e.g. the prefix list of a term).
+    """
+    devices = defaultdict(set)
+    for path in DEVICE_PATHS.get(model, []):
+        first, _, rest = path.partition("__")
+        parents = {
+            change.changed_object_id: (change.prechange_data or {}).get(first) for change in changes
+        }
+        if not rest:
+            for pk, device_id in parents.items():
+                if device_id is not None:
+                    devices[pk].add(device_id)
+            continue
+
+        related_model = model._meta.get_field(first).related_model
+        parent_devices = dict(
+            related_model.objects.filter(
+                pk__in=[parent for parent in parents.values() if parent is not None]
+            ).values_list("pk", rest)
+        )
+        for pk, parent in parents.items():
+            if parent_devices.get(parent) is not None:
+                devices[pk].add(parent_devices[parent])
+    return devices
+
+
+def get_changes(request, cursor, limit):
+    """Return the CMDB objects upserted or deleted after a decoded cursor.
+
+    At most `limit` change log entries are read, `more` tells whether another call with the
+    returned cursor is needed to catch up. Pending changes committed since the previous call
+    come first, an object may be returned again when such a change is read.
+    """
+    since, pending = cursor
+    changes = list(
+        ObjectChange.objects.restrict(request.user, "view")
+        .filter(Q(pk__gt=since) | Q(pk__in=list(pending)))
+        .filter(changed_object_type__app_label="netbox_cmdb")
+        .select_related("changed_object_type")
+        .defer("postchange_data")
+        .order_by("pk")[: limit + 1]
+    )
+    more = len(changes) > limit
+    changes = changes[:limit]
+
+    # the pending ids above the last change read are left for the next call
+    last = max(changes[-1].pk, since) if changes else since
+    unread = {pk: missed for pk, missed in pending.items() if more and pk > changes[-1].pk}
+    pending = _pending_ids(
+        since,
+        last,
+        {pk: missed for pk, missed in pending.items() if pk not in unread},
+        datetime.now(timezone.utc),
+    )
+    pending.update(unread)
+
+    # only the last change of each object matters
+    latest = defaultdict(dict)
+    for change in changes:
+        model = change.changed_object_type.model_class()
+        latest[model][change.changed_object_id] = change
+
+    models = {}
+    devices = defaultdict(lambda: defaultdict(lambda: {"upserted": [], "deleted": []}))
+    for model, model_changes in latest.items():
+        if model is None:
+            # content type of a model which does not exist anymore
+            continue
+
+        label = model._meta.label_lower
+        deleted = [
+            change
+            for change in model_changes.values()
+            if change.action == ObjectChangeActionChoices.ACTION_DELETE
+        ]
+        deleted_pks = {change.changed_object_id for change in deleted}
+        upserted = [pk for pk in model_changes if pk not in deleted_pks]
+        models[label] = {"upserted": sorted(upserted), "deleted": sorted(deleted_pks)}
+
+        for status, object_devices in [
+            ("upserted", _devices_of_existing_objects(model, upserted)),
+            ("deleted", _devices_of_deleted_objects(model, deleted)),
+        ]:
+            for pk, device_ids in object_devices.items():
+                for device_id in device_ids:
+                    devices[device_id][label][status].append(pk)
+
+    return {
+        "cursor": encode_cursor(last, pending),
+        "more": more,
+        "models": models,
+        "devices": devices,
+    }
+
+
+def get_current_cursor():
+    """Return the cursor of the latest change, to start following the feed from now."""
+    latest = ObjectChange.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+    return encode_cursor(latest, _pending_ids(0, latest, {}, datetime.now(timezone.utc)))
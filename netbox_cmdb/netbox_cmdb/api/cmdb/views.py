@@ -1,12 +1,20 @@
-from dcim.models import Device, Site
+import json
+import math
+
+from dcim.models import Device, Rack, Site
 from django.db import transaction
+from django.db.models import Q
 from django.http import StreamingHttpResponse
 from drf_yasg.utils import swagger_auto_schema
 from netbox.api.authentication import IsAuthenticatedOrLoginNotRequired
 from rest_framework import serializers, status
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
+from netbox_cmdb import jobs
+from netbox_cmdb.api.cmdb import changes
+from netbox_cmdb.api.cmdb.bundle import build_device_bundles
 from netbox_cmdb.helpers import cleaning
 
 
@@ -102,6 +110,108 @@ class DeviceDecommissioningAPIView(APIView):
         )
 
 
+class DevicesDecommissioningSerializer(serializers.Serializer):
+    devices = serializers.ListField(
+        child=serializers.CharField(), required=False, allow_empty=False
+    )
+    site = serializers.CharField(required=False)
+    rack = serializers.CharField(required=False)
+    role = serializers.CharField(required=False)
+    chunk_size = serializers.IntegerField(min_value=1, max_value=500, default=20)
+
+    def validate(self, data):
+        filters = [name for name in ("site", "rack", "role") if name in data]
+        if "devices" in data and filters:
+            raise serializers.ValidationError("devices can't be combined with site, rack or role")
+        if "devices" not in data and not filters:
+            raise serializers.ValidationError("devices or one of site, rack, role is required")
+        if "rack" in data and "site" not in data:
+            # rack names are only unique within a site, and even a location of a site
+            raise serializers.ValidationError("site is required with rack")
+        return data
+
+
+class DevicesDecommissioningAPIView(APIView):
+
+    detail = "Devices full decommissioning"
+    permission_classes = [IsAuthenticatedOrLoginNotRequired]
+
+    @swagger_auto_schema(
+        request_body=DevicesDecommissioningSerializer,
+        responses={
+            status.HTTP_200_OK: "Progress of each chunk of devices, one per line (NDJSON)",
+            status.HTTP_400_BAD_REQUEST: "Bad Request: devices or a filter is required",
+            status.HTTP_404_NOT_FOUND: "Bad Request: Device not found",
+        },
+    )
+    def delete(self, request):
+        """Decommission devices, given by id or name or selected by site, rack and role.
+
+        Devices are deleted `chunk_size` at a time, the outcome of each chunk is streamed
+        as a JSON line, followed by a summary line.
+        """
+        serializer = DevicesDecommissioningSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        devices = Device.objects.restrict(request.user, "delete")
+        if "devices" in data:
+            identifiers = data["devices"]
+            devices = devices.filter(
+                Q(pk__in=[int(value) for value in identifiers if value.isdigit()])
+                | Q(name__in=[value for value in identifiers if not value.isdigit()])
+            )
+        else:
+            filters = {"site": "site__name", "role": "device_role__name"}
+            devices = devices.filter(
+                **{lookup: data[name] for name, lookup in filters.items() if name in data}
+            )
+            if "rack" in data:
+                racks = list(
+                    Rack.objects.filter(site__name=data["site"], name=data["rack"]).values_list(
+                        "pk", flat=True
+                    )
+                )
+                if len(racks) > 1:
+                    return Response(
+                        {
+                            "error": f"rack {data['rack']} matches {len(racks)} racks in site "
+                            f"{data['site']}: {', '.join(str(pk) for pk in racks)}"
+                        },
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                devices = devices.filter(rack__in=racks)
+
+        devices = list(devices.order_by("pk"))
+        found = {str(dev.pk) for dev in devices} | {dev.name for dev in devices}
+        not_found = [value for value in data.get("devices", []) if value not in found]
+        if not devices:
+            return Response(
+                {"error": "no matching devices found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        def _start():
+            chunks = math.ceil(len(devices) / data["chunk_size"])
+            deleted = 0
+            failed = [{"device": value, "error": "device not found"} for value in not_found]
+            for i, result in enumerate(
+                cleaning.decommission_devices(devices, data["chunk_size"]), start=1
+            ):
+                deleted += len(result["deleted"])
+                failed.extend(result["failed"])
+                yield json.dumps({"chunk": i, "chunks": chunks, **result}) + "\n"
+
+            summary = {
+                "message": f"{deleted} devices decommissioned, {len(failed)} failed",
+                "deleted": deleted,
+                "failed": failed,
+            }
+            yield json.dumps(summary) + "\n"
+
+        return StreamingHttpResponse(_start(), content_type="application/x-ndjson")
+
+
 class SiteDecommissioningSerializer(serializers.Serializer):
     site_name = serializers.CharField()
 
@@ -143,7 +253,7 @@ class SiteDecommissioningAPIView(APIView):
                 chunk = device_ids[i : i + CHUNK_SIZE]
                 try:
                     with transaction.atomic():
-                        cleaning.clean_cmdb_for_devices(chunk)
+                        cleaning.clean_cmdb_for_devices(chunk, counts_only=True)
                         for dev in devices[i : i + CHUNK_SIZE]:
                             dev.delete()
                     yield f'{{"deleted": {[dev.name for dev in devices[i:i+CHUNK_SIZE]]}}}\n\n'
@@ -170,3 +280,243 @@ class SiteDecommissioningAPIView(APIView):
             yield f"{msg}\n\n"
 
         return StreamingHttpResponse(_start(), content_type="text/plain")
+
+
+class SiteDecommissioningJobSerializer(serializers.Serializer):
+    site_name = serializers.CharField()
+    chunk_size = serializers.IntegerField(min_value=1, max_value=500, default=20)
+
+
+def _site_decommissioning_job_data(job_result, since_chunk=0):
+    progress = job_result.data or {}
+    return {
+        "job_id": job_result.job_id,
+        "site": job_result.name,
+        "status": job_result.status,
+        "created": job_result.created,
+        "completed": job_result.completed,
+        "progress": {**progress, "chunks": progress.get("chunks", [])[since_chunk:]},
+    }
+
+
+class SiteDecommissioningJobsAPIView(APIView):
+
+    detail = "Site full decommissioning, as a background job"
+    permission_classes = [IsAuthenticatedOrLoginNotRequired]
+
+    @swagger_auto_schema(
+        request_body=SiteDecommissioningJobSerializer,
+        responses={
+            status.HTTP_202_ACCEPTED: "Site decommissioning job queued",
+            status.HTTP_400_BAD_REQUEST: "Bad Request: Site name is required",
+            status.HTTP_404_NOT_FOUND: "Bad Request: Site not found",
+            status.HTTP_409_CONFLICT: "Conflict: Site decommissioning already in progress",
+        },
+    )
+    def post(self, request):
+        """Queue the decommissioning of a site, to be followed with the returned job id."""
+        serializer = SiteDecommissioningJobSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            site = Site.objects.get(name=serializer.validated_data["site_name"])
+        except Site.DoesNotExist:
+            return Response({"error": "site not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if jobs.get_site_decommissioning_in_progress(site) is not None:
+            return Response(
+                {"error": "site decommissioning already in progress"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        job_result = jobs.enqueue_site_decommissioning(
+            site,
+            request.user if request.user.is_authenticated else None,
+            serializer.validated_data["chunk_size"],
+        )
+        return Response(_site_decommissioning_job_data(job_result), status=status.HTTP_202_ACCEPTED)
+
+
+class SiteDecommissioningJobAPIView(APIView):
+
+    detail = "Site decommissioning job"
+    permission_classes = [IsAuthenticatedOrLoginNotRequired]
+
+    @swagger_auto_schema(
+        responses={
+            status.HTTP_200_OK: "Status and progress of the job",
+            status.HTTP_404_NOT_FOUND: "Bad Request: Job not found",
+        },
+    )
+    def get(self, request, job_id):
+        """Return the status and progress of a site decommissioning job.
+
+        With `since_chunk`, only the chunks processed after this one are returned.
+        """
+        job_result = jobs.get_site_decommissioning_jobs().filter(job_id=job_id).first()
+        if job_result is None:
+            return Response({"error": "job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            since_chunk = max(int(request.query_params.get("since_chunk", 0)), 0)
+        except ValueError:
+            return Response(
+                {"error": "since_chunk must be an integer"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            _site_decommissioning_job_data(job_result, since_chunk), status=status.HTTP_200_OK
+        )
+
+    @swagger_auto_schema(
+        responses={
+            status.HTTP_202_ACCEPTED: "Cancellation requested",
+            status.HTTP_400_BAD_REQUEST: "Bad Request: Job already finished",
+            status.HTTP_404_NOT_FOUND: "Bad Request: Job not found",
+        },
+    )
+    def delete(self, request, job_id):
+        """Cancel a site decommissioning job, once the chunk in progress is done."""
+        job_result = jobs.get_site_decommissioning_jobs().filter(job_id=job_id).first()
+        if job_result is None:
+            return Response({"error": "job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        job_result = jobs.request_cancel(job_result)
+        if job_result is None:
+            return Response({"error": "job already finished"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_site_decommissioning_job_data(job_result), status=status.HTTP_202_ACCEPTED)
+
+
+class DeviceCMDBBundleAPIView(APIView):
+
+    detail = "All CMDB objects attached to a device"
+    permission_classes = [IsAuthenticatedOrLoginNotRequired]
+
+    @swagger_auto_schema(
+        responses={
+            status.HTTP_200_OK: "CMDB bundle of the device",
+            status.HTTP_400_BAD_REQUEST: "Bad Request: Device name is ambiguous",
+            status.HTTP_404_NOT_FOUND: "Bad Request: Device not found",
+        },
+    )
+    def get(self, request, device):
+        """Return every CMDB object attached to a device, identified by its id or name."""
+        lookup = {"pk": device} if device.isdigit() else {"name": device}
+        devices = list(Device.objects.restrict(request.user, "view").filter(**lookup))
+        if not devices:
+            return Response({"error": "device not found"}, status=status.HTTP_404_NOT_FOUND)
+        if len(devices) > 1:
+            return Response(
+                {"error": "several devices share this name, use the device id"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(build_device_bundles(devices, request)[0], status=status.HTTP_200_OK)
+
+
+class DeviceCMDBBundlesSerializer(serializers.Serializer):
+    devices = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+
+
+class DeviceCMDBBundlesAPIView(APIView):
+
+    detail = "All CMDB objects attached to a list of devices"
+    permission_classes = [IsAuthenticatedOrLoginNotRequired]
+
+    # Number of devices whose bundles are built with the same set of queries
+    CHUNK_SIZE = 50
+
+    @swagger_auto_schema(
+        request_body=DeviceCMDBBundlesSerializer,
+        responses={
+            status.HTTP_200_OK: "One CMDB bundle per line (NDJSON)",
+            status.HTTP_400_BAD_REQUEST: "Bad Request: devices is required",
+        },
+    )
+    def post(self, request):
+        """Stream the CMDB bundle of each device, one JSON document per line.
+
+        Devices are identified by id or name, unknown devices yield an error line.
+        """
+        serializer = DeviceCMDBBundlesSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        identifiers = serializer.validated_data["devices"]
+
+        def _start():
+            for i in range(0, len(identifiers), self.CHUNK_SIZE):
+                chunk = identifiers[i : i + self.CHUNK_SIZE]
+                ids = [int(value) for value in chunk if value.isdigit()]
+                names = [value for value in chunk if not value.isdigit()]
+                devices = Device.objects.restrict(request.user, "view").filter(
+                    Q(pk__in=ids) | Q(name__in=names)
+                )
+                found = {}
+                for device in devices:
+                    found[str(device.pk)] = device
+                    # a name shared by several devices is ambiguous, it must not resolve
+                    found[device.name] = None if device.name in found else device
+
+                bundles = iter(
+                    build_device_bundles([found[v] for v in chunk if found.get(v)], request)
+                )
+                for value in chunk:
+                    if found.get(value):
+                        line = next(bundles)
+                    elif value in found:
+                        line = {"device": value, "error": "several devices share this name"}
+                    else:
+                        line = {"device": value, "error": "device not found"}
+                    yield json.dumps(line, cls=JSONEncoder) + "\n"
+
+        return StreamingHttpResponse(_start(), content_type="application/x-ndjson")
+
+
+class CMDBChangesAPIView(APIView):
+
+    detail = "CMDB objects changed since a cursor"
+    permission_classes = [IsAuthenticatedOrLoginNotRequired]
+
+    # Maximum number of change log entries read per call
+    MAX_LIMIT = 10000
+
+    @swagger_auto_schema(
+        responses={
+            status.HTTP_200_OK: "CMDB objects upserted and deleted since the cursor",
+            status.HTTP_400_BAD_REQUEST: "Bad Request: Invalid cursor",
+        },
+    )
+    def get(self, request):
+        """Return the CMDB objects upserted or deleted since the `since` cursor.
+
+        Without `since`, only the current cursor is returned: clients do a full sync, then
+        follow the feed from that cursor. Objects are grouped per model and per affected device.
+        """
+        since = request.query_params.get("since")
+        if since is None:
+            return Response(
+                {
+                    "cursor": changes.get_current_cursor(),
+                    "more": False,
+                    "models": {},
+                    "devices": {},
+                },
+                status=status.HTTP_200_OK,
+            )
+
+        try:
+            since = changes.decode_cursor(since)
+        except changes.InvalidCursor:
+            return Response({"error": "invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(int(request.query_params.get("limit", 1000)), self.MAX_LIMIT)
+            if limit < 1:
+                raise ValueError()
+        except ValueError:
+            return Response(
+                {"error": "limit must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(changes.get_changes(request, since, limit), status=status.HTTP_200_OK)
@@ -1,6 +1,28 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta, timezone
+
+from django.db import connections
+from django.db.models import Field, Func, QuerySet, Value
 from netbox.api.pagination import OptionalLimitOffsetPagination
 from netbox.config import get_config
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.utils.urls import replace_query_param
+
+# creation times are encoded in cursors as microseconds since the epoch
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class RowValue(Func):
+    """SQL row value `(a, b)`, compared to another one column by column.
+
+    `(created, id) > (%s, %s)` starts the index scan right after the last object read, where
+    `created >= %s` excluding the objects already read scans all the ties of `created`.
+    """
+
+    function = ""
+    output_field = Field()
 
 
 # CustomCursorPagination, we took the work made here PR https://github.com/netbox-community/netbox/pull/10764/
@@ -108,7 +130,163 @@ class CustomCursorPagination(CursorPagination):
         return self.default_page_size
 
 
+class KeysetPagination(CustomCursorPagination):
+    """Keyset pagination, for clients walking large tables.
+
+    Objects are ordered by `(created, id)`, or by `id` alone with `pagination_key=id`, and each
+    page is read from the key of the last object of the previous page: an index range scan of
+    the same cost at any depth, where the offsets of the cursor pagination on ties of `created`
+    make deep pages slower. Objects without a creation time come last, ordered by id.
+
+    Cursors only go forward, `previous` is always null.
+    """
+
+    key_query_param = "pagination_key"
+    keys = ("created", "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.key, position = self.decode_cursor(request)
+
+        # an extra object tells whether there is a next page
+        results = []
+        for part in self._querysets(queryset, position):
+            if self.page_size:
+                results += part[: self.page_size + 1 - len(results)]
+                if len(results) > self.page_size:
+                    break
+            else:
+                results += part
+
+        self.page = results[: self.page_size] if self.page_size else results
+        self.has_next = len(results) > len(self.page)
+        self.has_previous = False
+        self.next_cursor = self.encode_position(self.page[-1]) if self.has_next else None
+
+        if self.has_next and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _querysets(self, queryset, position):
+        """Return the querysets read in turn to fill a page from a position."""
+        if self.key == "id":
+            if position is not None:
+                queryset = queryset.filter(id__gt=position[0])
+            return [queryset.order_by("id")]
+
+        created, last_id = position or (None, None)
+        # objects without a creation time are out of the range of the index, they come last
+        without_created = queryset.filter(created__isnull=True).order_by("id")
+        if created is None and last_id is not None:
+            return [without_created.filter(id__gt=last_id)]
+
+        if created is None:
+            with_created = queryset.filter(created__isnull=False)
+        else:
+            with_created = queryset.alias(position=RowValue("created", "id")).filter(
+                position__gt=RowValue(Value(created), Value(last_id))
+            )
+        return [with_created.order_by("created", "id"), without_created]
+
+    def encode_position(self, instance):
+        values = [instance.pk]
+        if self.key == "created":
+            created = instance.created
+            values.insert(0, "" if created is None else (created - EPOCH) // MICROSECOND)
+        cursor = ":".join(str(value) for value in [self.key, *values])
+        return urlsafe_b64encode(cursor.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        """Return the key and the position of the cursor, None on the first page."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            key = request.query_params.get(self.key_query_param)
+            return (key if key in self.keys else self.keys[0]), None
+
+        try:
+            cursor = urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+            key, *values = cursor.split(":")
+            if key == "id" and len(values) == 1:
+                return key, (int(values[0]),)
+            if key == "created" and len(values) == 2:
+                created = EPOCH + int(values[0]) * MICROSECOND if values[0] else None
+                return key, (created, int(values[1]))
+        except (ValueError, OverflowError):
+            pass
+        raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.next_cursor)
+
+    def get_previous_link(self):
+        return None
+
+
+class CustomLimitOffsetPagination(OptionalLimitOffsetPagination):
+    """NetBox limit/offset pagination, with a `count` option for the count of the results.
+
+    - `exact`, the default: a COUNT(*) of the filtered queryset, as NetBox does;
+    - `estimate`: the row count of the table estimated by PostgreSQL, when the list is not
+      filtered; filtered lists are counted exactly, their estimates are unreliable;
+    - `none`: `count` is null.
+
+    Without an exact count, one more object is fetched to know whether there is a next page.
+    """
+
+    count_query_param = "count"
+    # tables estimated below this size are counted exactly, which is cheap at this size
+    min_estimated_count = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_mode = request.query_params.get(self.count_query_param)
+        if self.count_mode not in ("estimate", "none") or not isinstance(queryset, QuerySet):
+            self.count_mode = "exact"
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.request = request
+        if self.limit:
+            results = list(queryset[self.offset : self.offset + self.limit + 1])
+            self.has_next = len(results) > self.limit
+            results = results[: self.limit]
+        else:
+            results = list(queryset[self.offset :])
+            self.has_next = False
+
+        self.count = self.estimate_count(queryset) if self.count_mode == "estimate" else None
+        return results
+
+    def estimate_count(self, queryset):
+        """Return the estimated row count of the table of an unfiltered queryset."""
+        if not queryset.query.where and not queryset.query.distinct:
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            # tables never analyzed are estimated to -1 rows
+            if row and row[0] >= self.min_estimated_count:
+                return row[0]
+        return queryset.count()
+
+    def get_next_link(self):
+        if self.count_mode == "exact":
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+
 PAGINATORS = {
-    "limit_offset": OptionalLimitOffsetPagination,  # Default per settings.DEFAULT_PAGINATION_CLASS
+    "limit_offset": CustomLimitOffsetPagination,  # Default of the CMDB viewsets
     "cursor": CustomCursorPagination,
+    "keyset": KeysetPagination,
 }
@@ -1,9 +1,20 @@
 """Prefix list serializers."""
 
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
+from extras.choices import ObjectChangeActionChoices
+from netaddr import IPNetwork
 from rest_framework.serializers import ModelSerializer, ValidationError
 
 from netbox_cmdb.api.common_serializers import CommonDeviceSerializer
-from netbox_cmdb.models.prefix_list import PrefixList, PrefixListTerm
+from netbox_cmdb.helpers import changelog, cleaning, prefix_list_index
+from netbox_cmdb.models.prefix_list import (
+    PrefixList,
+    PrefixListIPVersionChoices,
+    PrefixListTerm,
+)
+
+TERMS_BATCH_SIZE = 1000
 
 
 class PrefixListTermSerializer(ModelSerializer):
@@ -32,44 +43,125 @@ class PrefixListSerializer(ModelSerializer):
                 }
             )
 
+    def _validate_term_values(self, ip_version, terms_data):
+        """Validate all the terms of a prefix list at once, without any query."""
+        errors = {}
+        sequences = set()
+        for term_data in terms_data:
+            sequence = term_data["sequence"]
+            if sequence in sequences:
+                errors[str(sequence)] = ["duplicate sequence"]
+                continue
+            sequences.add(sequence)
+
+            try:
+                PrefixListTerm.validate_prefix(
+                    IPNetwork(term_data["prefix"]),
+                    term_data.get("ge"),
+                    term_data.get("le"),
+                    ip_version,
+                )
+            except DjangoValidationError as e:
+                errors[str(sequence)] = e.messages
+
+        if errors:
+            raise ValidationError({"terms": errors})
+
+    def sync_terms(self, prefix_list, terms_data):
+        """Apply the terms of a prefix list as a diff against its existing terms.
+
+        Terms are matched by sequence, then created, updated and deleted with one query
+        each, in batches; unchanged terms are not written.
+        """
+        request = self.context.get("request")
+        existing = {term.sequence: term for term in prefix_list.prefix_list_term.all()}
+
+        created, updated = [], []
+        for term_data in terms_data:
+            term = existing.pop(term_data["sequence"], None)
+            if term is None:
+                created.append(PrefixListTerm(prefix_list=prefix_list, **term_data))
+                continue
+
+            prefix = IPNetwork(term_data.get("prefix", term.prefix))
+            le = term_data.get("le", term.le)
+            ge = term_data.get("ge", term.ge)
+            if (prefix, le, ge) == (IPNetwork(term.prefix), term.le, term.ge):
+                continue
+
+            term.snapshot()
+            term.prefix, term.le, term.ge = prefix, le, ge
+            updated.append(term)
+
+        deleted = list(existing.values())
+        if deleted:
+            for term in deleted:
+                term.snapshot()
+            # the change log of the terms is recorded below
+            cleaning.raw_delete(
+                PrefixListTerm, PrefixListTerm._meta.pk.column, [term.pk for term in deleted]
+            )
+        if updated:
+            now = timezone.now()
+            for term in updated:
+                term.last_updated = now
+            PrefixListTerm.objects.bulk_update(
+                updated, ["prefix", "le", "ge", "last_updated"], batch_size=TERMS_BATCH_SIZE
+            )
+        if created:
+            PrefixListTerm.objects.bulk_create(created, batch_size=TERMS_BATCH_SIZE)
+
+        if deleted or updated or created:
+            prefix_list_index.invalidate()
+
+        if request is not None:
+            changelog.log_bulk_changes(request, deleted, ObjectChangeActionChoices.ACTION_DELETE)
+            changelog.log_bulk_changes(request, updated, ObjectChangeActionChoices.ACTION_UPDATE)
+            changelog.log_bulk_changes(request, created, ObjectChangeActionChoices.ACTION_CREATE)
+
     def create(self, validated_data):
         terms_data = validated_data.pop("prefix_list_term")
         self._validate_terms(terms_data)
+        self._validate_term_values(
+            validated_data.get("ip_version", PrefixListIPVersionChoices.IPV4), terms_data
+        )
         # we create the prefix list first
         prefix_list = PrefixList.objects.create(**validated_data)
 
         # then we create terms, and associate it to the newly created prefix list
-        for term_data in terms_data:
-            PrefixListTerm.objects.create(prefix_list=prefix_list, **term_data)
+        self.sync_terms(prefix_list, terms_data)
         return prefix_list
 
     def update(self, instance, validated_data):
         terms_data = validated_data.pop("prefix_list_term")
         self._validate_terms(terms_data)
 
-        # get current prefix list terms
-        pf_terms = list(PrefixListTerm.objects.filter(prefix_list=instance))
-        term_mapping = {term.sequence: term for term in pf_terms}
-        data_mapping = {term["sequence"]: term for term in terms_data}
-
         instance.name = validated_data.get("name", instance.name)
         instance.device = validated_data.get("device", instance.device)
         instance.ip_version = validated_data.get("ip_version", instance.ip_version)
+        self._validate_term_values(instance.ip_version, terms_data)
         instance.save()
 
-        for term_data in terms_data:
-            term, created = PrefixListTerm.objects.get_or_create(
-                prefix_list=instance, sequence=term_data["sequence"], defaults=term_data
-            )
-            if not created:
-                term.prefix = term_data.get("prefix", term.prefix)
-                term.le = term_data.get("le", term.le)
-                term.ge = term_data.get("ge", term.ge)
-                term.save()
-
-        # removing extra terms
-        for term_sequence, term in term_mapping.items():
-            if term_sequence not in data_mapping:
-                term.delete()
+        self.sync_terms(instance, terms_data)
 
         return instance
+
+
+class PrefixListMatchSerializer(ModelSerializer):
+    """Prefix list of a matching term."""
+
+    device = CommonDeviceSerializer()
+
+    class Meta:  # pylint: disable=missing-docstring
+        model = PrefixList
+        fields = ["id", "name", "device", "ip_version"]
+
+
+class PrefixListTermMatchSerializer(ModelSerializer):
+    """Prefix list term matching a route, with its prefix list."""
+
+    prefix_list = PrefixListMatchSerializer()
+
+    class Meta:  # pylint: disable=missing-docstring
+        model = PrefixListTerm
+        fields = ["id", "prefix_list", "sequence", "prefix", "ge", "le"]
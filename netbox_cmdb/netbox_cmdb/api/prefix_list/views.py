@@ -1,9 +1,33 @@
 """Route Policy views."""
 
+from django.db import transaction
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from extras.choices import ObjectChangeActionChoices
+from netaddr import AddrFormatError
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+
 from netbox_cmdb import filtersets
-from netbox_cmdb.api.prefix_list.serializers import PrefixListSerializer
+from netbox_cmdb.api.prefix_list.serializers import (
+    PrefixListSerializer,
+    PrefixListTermMatchSerializer,
+)
 from netbox_cmdb.api.viewsets import CustomNetBoxModelViewSet
-from netbox_cmdb.models.prefix_list import PrefixList
+from netbox_cmdb.helpers import (
+    changelog,
+    cleaning,
+    prefix_list_compression,
+    prefix_list_import,
+    prefix_list_index,
+)
+from netbox_cmdb.models.prefix_list import (
+    PrefixList,
+    PrefixListIPVersionChoices,
+    PrefixListTerm,
+)
 
 
 class PrefixListViewSet(CustomNetBoxModelViewSet):
@@ -16,3 +40,207 @@ class PrefixListViewSet(CustomNetBoxModelViewSet):
         "device__id",
         "device__name",
     ] + filtersets.device_location_filterset
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter("prefix", openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter("device_id", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: PrefixListTermMatchSerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"], url_path="match")
+    def match(self, request):
+        """Return the prefix list terms matching a route, on all devices or on one device.
+
+        Matching terms are found in an in-memory radix tree of all the terms, rebuilt after
+        term changes, then fetched from the database.
+        """
+        try:
+            term_ids = prefix_list_index.index.match(request.query_params.get("prefix", ""))
+        except (AddrFormatError, ValueError, TypeError):
+            return Response(
+                {"error": "a valid prefix parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        terms = (
+            PrefixListTerm.objects.filter(pk__in=term_ids, prefix_list__in=self.get_queryset())
+            .select_related("prefix_list__device")
+            .order_by("prefix_list__device__name", "prefix_list__name", "sequence")
+        )
+        if device_id := request.query_params.get("device_id"):
+            if not device_id.isdigit():
+                return Response(
+                    {"error": "device_id must be an integer"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            terms = terms.filter(prefix_list__device_id=device_id)
+
+        return Response(PrefixListTermMatchSerializer(terms, many=True).data)
+
+    @staticmethod
+    def _get_sequences(request):
+        """Return the sequence_start and sequence_step parameters, or an error response."""
+        try:
+            sequence_start = int(request.query_params.get("sequence_start", 5))
+            sequence_step = int(request.query_params.get("sequence_step", 5))
+        except ValueError:
+            return Response(
+                {"error": "sequence_start and sequence_step must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if sequence_start < 0 or sequence_step < 1:
+            return Response(
+                {"error": "sequence_start must be positive and sequence_step at least 1"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return sequence_start, sequence_step
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter("sequence_start", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter("sequence_step", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_STRING,
+            description=(
+                "One `prefix [ge X] [le Y]` term per line (text/plain), or one "
+                '`{"prefix": ..., "ge": ..., "le": ...}` object per line (application/x-ndjson)'
+            ),
+        ),
+    )
+    @action(detail=True, methods=["post"], url_path="import")
+    def import_terms(self, request, pk):
+        """Replace the terms of a prefix list by a streamed list of prefixes.
+
+        The body is parsed and validated line by line and loaded with PostgreSQL COPY, in a
+        single transaction: the import is applied entirely or not at all. Terms are numbered
+        in the order of the lines. Only the update of the prefix list is recorded in the
+        change log, not each of its terms.
+        """
+        if not request.user.has_perm("netbox_cmdb.change_prefixlist"):
+            raise PermissionDenied()
+
+        sequences = self._get_sequences(request)
+        if isinstance(sequences, Response):
+            return sequences
+        sequence_start, sequence_step = sequences
+
+        fmt = (
+            prefix_list_import.FORMAT_NDJSON
+            if request.content_type.startswith("application/x-ndjson")
+            else prefix_list_import.FORMAT_TEXT
+        )
+
+        with transaction.atomic():
+            prefix_list = (
+                PrefixList.objects.restrict(request.user, "change")
+                .select_for_update()
+                .filter(pk=pk)
+                .first()
+            )
+            if prefix_list is None:
+                return Response(
+                    {"error": "prefix list not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+            prefix_list.snapshot()
+
+            deleted = cleaning.raw_delete(
+                PrefixListTerm,
+                PrefixListTerm._meta.get_field("prefix_list").column,
+                [prefix_list.pk],
+            )
+
+            # the stream is read lazily, line by line, as COPY consumes the terms
+            term_import = prefix_list_import.TermImport(
+                prefix_list,
+                iter(request.stream.readline, b"") if request.stream else [],
+                fmt,
+                sequence_start=sequence_start,
+                sequence_step=sequence_step,
+            )
+            imported = term_import.copy()
+
+            if term_import.errors:
+                transaction.set_rollback(True)
+                return Response({"errors": term_import.errors}, status=status.HTTP_400_BAD_REQUEST)
+            if not imported:
+                transaction.set_rollback(True)
+                return Response(
+                    {"error": "you must have at least one term in your prefix-list"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            changelog.log_bulk_changes(
+                request, [prefix_list], ObjectChangeActionChoices.ACTION_UPDATE
+            )
+            prefix_list_index.invalidate()
+
+        return Response({"prefix_list": prefix_list.pk, "deleted": deleted, "imported": imported})
+
+    @swagger_auto_schema(
+        methods=["get", "post"],
+        manual_parameters=[
+            openapi.Parameter("sequence_start", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter("sequence_step", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+    )
+    @action(detail=True, methods=["get", "post"], url_path="compress")
+    def compress(self, request, pk):
+        """Compress the terms of a prefix list into fewer equivalent terms.
+
+        GET returns the compressed terms with a report of the reduction, POST replaces the
+        terms of the prefix list by them. Terms are numbered in address order.
+        """
+        sequences = self._get_sequences(request)
+        if isinstance(sequences, Response):
+            return sequences
+        sequence_start, sequence_step = sequences
+
+        if request.method == "POST" and not request.user.has_perm("netbox_cmdb.change_prefixlist"):
+            raise PermissionDenied()
+
+        with transaction.atomic():
+            prefix_lists = PrefixList.objects.restrict(
+                request.user, "change" if request.method == "POST" else "view"
+            )
+            if request.method == "POST":
+                prefix_lists = prefix_lists.select_for_update()
+            prefix_list = prefix_lists.filter(pk=pk).first()
+            if prefix_list is None:
+                return Response(
+                    {"error": "prefix list not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+
+            terms = list(
+                PrefixListTerm.objects.filter(prefix_list=prefix_list).values_list(
+                    "prefix", "ge", "le"
+                )
+            )
+            compressed = prefix_list_compression.compress_terms(
+                terms, 4 if prefix_list.ip_version == PrefixListIPVersionChoices.IPV4 else 6
+            )
+            terms_data = [
+                {
+                    "sequence": sequence_start + i * sequence_step,
+                    "prefix": prefix,
+                    "ge": ge,
+                    "le": le,
+                }
+                for i, (prefix, ge, le) in enumerate(compressed)
+            ]
+
+            if request.method == "POST" and terms_data:
+                serializer = self.get_serializer(prefix_list)
+                serializer.sync_terms(prefix_list, terms_data)
+
+        return Response(
+            {
+                "prefix_list": prefix_list.pk,
+                "applied": request.method == "POST",
+                "original_terms": len(terms),
+                "compressed_terms": len(terms_data),
+                "reduction": round(1 - len(terms_data) / len(terms), 4) if terms else 0,
+                "terms": [{**term, "prefix": str(term["prefix"])} for term in terms_data],
+            }
+        )
@@ -1,18 +1,37 @@
 """Route Policy serializers."""
 
 from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils import timezone
+from extras.choices import ObjectChangeActionChoices
 from netbox.api.serializers import WritableNestedSerializer
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer, SerializerMethodField
 
 from netbox_cmdb.api.bgp.serializers import AsnSerializer
 from netbox_cmdb.api.common_serializers import CommonDeviceSerializer
+from netbox_cmdb.helpers import changelog, cleaning
 from netbox_cmdb.models.bgp_community_list import BGPCommunityList
 from netbox_cmdb.models.prefix_list import PrefixList
 from netbox_cmdb.models.route_policy import RoutePolicy, RoutePolicyTerm
 
+TERMS_BATCH_SIZE = 1000
 
-class NestedBgpCommunityListSerializer(WritableNestedSerializer):
+PREFETCHED_CONTEXT_KEY = "prefetched_objects"
+
+
+class PrefetchedNestedMixin:
+    """Resolve an object given by its id from the objects prefetched by
+    RoutePolicyTermListSerializer, instead of fetching it for each term."""
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get(PREFETCHED_CONTEXT_KEY, {}).get(self.Meta.model, {})
+        if isinstance(data, (int, str)) and str(data).isdigit() and int(data) in prefetched:
+            return prefetched[int(data)]
+        return super().to_internal_value(data)
+
+
+class NestedBgpCommunityListSerializer(PrefetchedNestedMixin, WritableNestedSerializer):
     class Meta:
         model = BGPCommunityList
         fields = ["id", "device", "name"]
@@ -24,7 +43,7 @@ class NestedBgpCommunityListSerializer(WritableNestedSerializer):
         return []
 
 
-class NestedPrefixListSerializer(WritableNestedSerializer):
+class NestedPrefixListSerializer(PrefetchedNestedMixin, WritableNestedSerializer):
     class Meta:
         model = PrefixList
         fields = ["id", "device", "name"]
@@ -36,15 +55,44 @@ class NestedPrefixListSerializer(WritableNestedSerializer):
         return []
 
 
+class PrefetchedAsnSerializer(PrefetchedNestedMixin, AsnSerializer):
+    class Meta(AsnSerializer.Meta):
+        pass
+
+
+class RoutePolicyTermListSerializer(serializers.ListSerializer):
+    """Terms of a route policy, fetching the objects they refer to by id with one query per
+    model rather than one query per term."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            prefetched = self.context.setdefault(PREFETCHED_CONTEXT_KEY, {})
+            for name, field in self.child.fields.items():
+                if not isinstance(field, PrefetchedNestedMixin):
+                    continue
+                ids = {
+                    int(item[name])
+                    for item in data
+                    if isinstance(item, dict)
+                    and isinstance(item.get(name), (int, str))
+                    and str(item[name]).isdigit()
+                }
+                if ids:
+                    model = field.Meta.model
+                    prefetched.setdefault(model, {}).update(model.objects.in_bulk(ids))
+        return super().to_internal_value(data)
+
+
 class RoutePolicyTermSerializer(ModelSerializer):
     from_bgp_community_list = NestedBgpCommunityListSerializer(
         required=False, many=False, allow_null=True
     )
     from_prefix_list = NestedPrefixListSerializer(required=False, many=False, allow_null=True)
-    set_as_path_prepend_asn = AsnSerializer(required=False, allow_null=True)
+    set_as_path_prepend_asn = PrefetchedAsnSerializer(required=False, allow_null=True)
 
     class Meta:
         model = RoutePolicyTerm
+        list_serializer_class = RoutePolicyTermListSerializer
         fields = [
             "description",
             "sequence",
@@ -86,6 +134,87 @@ class WritableRoutePolicySerializer(ModelSerializer):
                 }
             )
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        term_changes = getattr(instance, "_term_changes", None)
+        if term_changes is not None:
+            data["term_changes"] = term_changes
+        return data
+
+    @staticmethod
+    def _term_value(term, field):
+        """Return the value of a term field as compared to the input, ids for foreign keys."""
+        if RoutePolicyTerm._meta.get_field(field).is_relation:
+            return getattr(term, f"{field}_id")
+        return getattr(term, field)
+
+    def sync_terms(self, route_policy, terms_data):
+        """Apply the terms of a route policy as a diff against its existing terms.
+
+        Terms are matched by sequence, then created, updated and deleted with one query
+        each, in batches; unchanged terms are not written. The sequences of the created,
+        changed, unchanged and removed terms are reported in the `term_changes` of the
+        response.
+        """
+        request = self.context.get("request")
+        existing = {term.sequence: term for term in route_policy.route_policy_term.all()}
+
+        created, updated, unchanged = [], [], []
+        updated_fields = set()
+        for term_data in terms_data:
+            term = existing.pop(term_data["sequence"], None)
+            if term is None:
+                created.append(RoutePolicyTerm(route_policy=route_policy, **term_data))
+                continue
+
+            changes = {}
+            for field, value in term_data.items():
+                input_value = value.pk if isinstance(value, models.Model) else value
+                if input_value != self._term_value(term, field):
+                    changes[field] = value
+            if not changes:
+                unchanged.append(term)
+                continue
+
+            term.snapshot()
+            for field, value in changes.items():
+                setattr(term, field, value)
+            updated_fields.update(changes)
+            updated.append(term)
+
+        deleted = list(existing.values())
+        if deleted:
+            for term in deleted:
+                term.snapshot()
+            # the change log of the terms is recorded below
+            cleaning.raw_delete(
+                RoutePolicyTerm, RoutePolicyTerm._meta.pk.column, [term.pk for term in deleted]
+            )
+        if updated:
+            now = timezone.now()
+            for term in updated:
+                term.last_updated = now
+            RoutePolicyTerm.objects.bulk_update(
+                updated, [*sorted(updated_fields), "last_updated"], batch_size=TERMS_BATCH_SIZE
+            )
+        if created:
+            RoutePolicyTerm.objects.bulk_create(created, batch_size=TERMS_BATCH_SIZE)
+
+        if request is not None:
+            changelog.log_bulk_changes(request, deleted, ObjectChangeActionChoices.ACTION_DELETE)
+            changelog.log_bulk_changes(request, updated, ObjectChangeActionChoices.ACTION_UPDATE)
+            changelog.log_bulk_changes(request, created, ObjectChangeActionChoices.ACTION_CREATE)
+
+        route_policy._term_changes = {
+            name: sorted(term.sequence for term in terms)
+            for name, terms in (
+                ("created", created),
+                ("changed", updated),
+                ("unchanged", unchanged),
+                ("removed", deleted),
+            )
+        }
+
     def create(self, validated_data):
         terms_data = validated_data.pop("route_policy_term")
         self._validate_terms(terms_data)
@@ -93,71 +222,31 @@ class WritableRoutePolicySerializer(ModelSerializer):
         route_policy = RoutePolicy.objects.create(**validated_data)
 
         # then we create terms, and associate it to the newly created route policy
-        for term_data in terms_data:
-            RoutePolicyTerm.objects.create(route_policy=route_policy, **term_data)
+        self.sync_terms(route_policy, terms_data)
         return route_policy
 
     def update(self, instance, validated_data):
         terms_data = validated_data.pop("route_policy_term")
         self._validate_terms(terms_data)
 
-        # get current route policy terms
-        rp_terms = list(RoutePolicyTerm.objects.filter(route_policy=instance))
-        term_mapping = {term.sequence: term for term in rp_terms}
-        data_mapping = {term["sequence"]: term for term in terms_data}
-
         instance.name = validated_data.get("name", instance.name)
         instance.device = validated_data.get("device", instance.device)
         instance.description = validated_data.get("description", instance.description)
         instance.save()
 
-        for term_data in terms_data:
-            term, created = RoutePolicyTerm.objects.get_or_create(
-                route_policy=instance,
-                sequence=term_data["sequence"],
-                defaults=term_data,
-            )
-            if not created:
-                term.decision = term_data.get("decision", term.decision)
-                term.description = term_data.get("description", term.description)
-                term.from_bgp_community = term_data.get(
-                    "from_bgp_community", term.from_bgp_community
-                )
-                term.from_bgp_community_list = term_data.get(
-                    "from_bgp_community_list", term.from_bgp_community_list
-                )
-                term.from_prefix_list = term_data.get("from_prefix_list", term.from_prefix_list)
-                term.from_source_protocol = term_data.get(
-                    "from_source_protocol", term.from_source_protocol
-                )
-                term.from_route_type = term_data.get("from_route_type", term.from_route_type)
-                term.from_local_pref = term_data.get("from_local_pref", term.from_local_pref)
-                term.set_local_pref = term_data.get("set_local_pref", term.set_local_pref)
-                term.set_community = term_data.get("set_community", term.set_community)
-                term.set_origin = term_data.get("set_origin", term.set_origin)
-                term.set_metric = term_data.get("set_metric", term.set_metric)
-                term.set_large_community = term_data.get(
-                    "set_large_community", term.set_large_community
-                )
-                term.set_as_path_prepend_repeat = term_data.get(
-                    "set_as_path_prepend_repeat", term.set_as_path_prepend_repeat
-                )
-                term.set_as_path_prepend_asn = term_data.get(
-                    "set_as_path_prepend_asn", term.set_as_path_prepend_asn
-                )
-                term.set_next_hop = term_data.get("set_next_hop", term.set_next_hop)
-                term.save()
-
-        # removing extra terms
-        for term_sequence, term in term_mapping.items():
-            if term_sequence not in data_mapping:
-                term.delete()
+        self.sync_terms(instance, terms_data)
 
         return instance
 
     def validate(self, attrs):
+        """Validate the terms at once: the lists they refer to are already fetched, checking
+        their device does not query the database."""
         errors = []
+        sequences = set()
         for term in attrs.get("route_policy_term", []):
+            if term["sequence"] in sequences:
+                errors.append(ValidationError(f"duplicate sequence {term['sequence']}"))
+            sequences.add(term["sequence"])
             try:
                 RoutePolicyTerm.validate_device_consistency(
                     attrs["device"],
@@ -171,3 +260,48 @@ class WritableRoutePolicySerializer(ModelSerializer):
             raise serializers.ValidationError({"errors": ValidationError(errors).messages})
 
         return super().validate(attrs)
+
+
+class RouteListField(serializers.ListField):
+    """A list of routes.
+
+    Routes are validated by the evaluation itself: validating each of them with serializer
+    fields would be much slower on full routing tables.
+    """
+
+    child = serializers.DictField()
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not data:
+            self.fail("empty")
+        return data
+
+
+class RoutePolicyEvaluationSerializer(serializers.Serializer):
+    """Routes to evaluate against a route policy, or against candidate terms for it.
+
+    Each route is an object with a `prefix` and optionally `communities`,
+    `large_communities`, `as_path`, `protocol` (bgp by default), `route_type`, `local_pref`,
+    `metric`, `origin` and `next_hop`. The route policy is expected in the context.
+    """
+
+    routes = RouteListField()
+    terms = RoutePolicyTermSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        device = self.context["route_policy"].device
+        errors = []
+        for term in attrs.get("terms", []):
+            try:
+                RoutePolicyTerm.validate_device_consistency(
+                    device, term.get("from_bgp_community_list"), term.get("from_prefix_list")
+                )
+            except ValidationError as error:
+                errors.append(error)
+
+        if errors:
+            raise serializers.ValidationError({"errors": ValidationError(errors).messages})
+
+        return super().validate(attrs)
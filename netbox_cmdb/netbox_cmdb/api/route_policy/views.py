@@ -1,12 +1,121 @@
 """Route Policy views."""
 
-from netbox_cmdb.api.route_policy.serializers import WritableRoutePolicySerializer
+from django.db.models import Prefetch
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from netbox.api.authentication import TokenPermissions
+from netbox.api.viewsets import BaseViewSet
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from netbox_cmdb.api.route_policy.serializers import (
+    RoutePolicyEvaluationSerializer,
+    WritableRoutePolicySerializer,
+)
 from netbox_cmdb.api.viewsets import CustomNetBoxModelViewSet
 from netbox_cmdb.filtersets import RoutePolicyFilterSet
-from netbox_cmdb.models.route_policy import RoutePolicy
+from netbox_cmdb.helpers import route_policy_evaluation
+from netbox_cmdb.models.route_policy import RoutePolicy, RoutePolicyTerm
+
+
+def route_policy_prefetch_related():
+    """Return the prefetch needed to render the terms of RoutePolicies.
+
+    The lists and the ASN referenced by terms are joined in the term query, so all terms of
+    a page are loaded in a single query whatever the number of policies and terms.
+    """
+    return [
+        Prefetch(
+            "route_policy_term",
+            queryset=RoutePolicyTerm.objects.select_related(
+                "from_bgp_community_list", "from_prefix_list", "set_as_path_prepend_asn"
+            ),
+        )
+    ]
+
+
+class EvaluatePermissions(TokenPermissions):
+    """Permissions of the route policy evaluation, a POST which changes nothing.
+
+    It is permitted like a GET: the view permission is enough, read-only tokens included.
+    """
+
+    def _verify_write_permission(self, request):
+        return True
+
+    def get_required_permissions(self, method, model_cls):
+        return super().get_required_permissions("GET", model_cls)
 
 
 class RoutePolicyViewSet(CustomNetBoxModelViewSet):
-    queryset = RoutePolicy.objects.all()
+    queryset = RoutePolicy.objects.select_related("device").prefetch_related(
+        *route_policy_prefetch_related()
+    )
     serializer_class = WritableRoutePolicySerializer
     filterset_class = RoutePolicyFilterSet
+
+    def get_permissions(self):
+        if self.action == "evaluate":
+            return [EvaluatePermissions()]
+        return super().get_permissions()
+
+    def initial(self, request, *args, **kwargs):
+        if self.action != "evaluate":
+            return super().initial(request, *args, **kwargs)
+
+        # BaseViewSet restricts the queryset with the action of the HTTP method, "add" for
+        # a POST: the evaluation only reads the route policy, so restrict it with "view".
+        super(BaseViewSet, self).initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            self.queryset = self.queryset.restrict(request.user, "view")
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "results",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_BOOLEAN,
+                description="Return the result of each route, not only the summary",
+            ),
+        ],
+        request_body=RoutePolicyEvaluationSerializer,
+    )
+    @action(detail=True, methods=["post"], url_path="evaluate")
+    def evaluate(self, request, pk):
+        """Evaluate a batch of routes against a route policy, without changing anything.
+
+        The routes are evaluated against the terms of the route policy, or against the
+        candidate `terms` given in the body, to check a change before rolling it out. Each
+        result gives the decision, the sequence of the deciding term and, for permitted
+        routes, their attributes once the set actions are applied.
+        """
+        route_policy = self.queryset.filter(pk=pk).first()
+        if route_policy is None:
+            return Response({"error": "route policy not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = RoutePolicyEvaluationSerializer(
+            data=request.data, context={"request": request, "route_policy": route_policy}
+        )
+        serializer.is_valid(raise_exception=True)
+
+        terms = None
+        if "terms" in serializer.validated_data:
+            terms = [
+                RoutePolicyTerm(route_policy=route_policy, **term_data)
+                for term_data in serializer.validated_data["terms"]
+            ]
+        policy = route_policy_evaluation.CompiledRoutePolicy.from_route_policy(
+            route_policy, terms=terms
+        )
+        results, errors = policy.evaluate(serializer.validated_data["routes"])
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = {
+            "route_policy": route_policy.pk,
+            "summary": route_policy_evaluation.summarize(results),
+        }
+        if request.query_params.get("results", "true").lower() != "false":
+            data["results"] = results
+        return Response(data)
@@ -7,13 +7,20 @@ from netbox_cmdb.api.bgp.views import (
     BGPGlobalViewSet,
     BGPPeerGroupViewSet,
     BGPSessionsViewSet,
+    BulkAvailableASNsView,
     DeviceBGPSessionsViewSet,
 )
 from netbox_cmdb.api.bgp_community_list.views import BGPCommunityListViewSet
 from netbox_cmdb.api.cmdb.views import (
+    CMDBChangesAPIView,
+    DeviceCMDBBundleAPIView,
+    DeviceCMDBBundlesAPIView,
     DeviceCMDBDecommissioningAPIView,
     DeviceDecommissioningAPIView,
+    DevicesDecommissioningAPIView,
     SiteDecommissioningAPIView,
+    SiteDecommissioningJobAPIView,
+    SiteDecommissioningJobsAPIView,
 )
 from netbox_cmdb.api.interface.views import (
     DeviceInterfaceViewSet,
@@ -58,6 +65,26 @@ urlpatterns = [
         AvailableASNsView.as_view(),
         name="asns-available-asn",
     ),
+    path(
+        "asns/available-asns/",
+        BulkAvailableASNsView.as_view(),
+        name="asns-available-asns",
+    ),
+    path(
+        "changes/",
+        CMDBChangesAPIView.as_view(),
+        name="changes",
+    ),
+    path(
+        "devices/cmdb-bundles/",
+        DeviceCMDBBundlesAPIView.as_view(),
+        name="device-cmdb-bundles",
+    ),
+    path(
+        "devices/<str:device>/cmdb-bundle/",
+        DeviceCMDBBundleAPIView.as_view(),
+        name="device-cmdb-bundle",
+    ),
     path(
         "management/device-cmdb-decommissioning/",
         DeviceCMDBDecommissioningAPIView.as_view(),
@@ -68,10 +95,25 @@ urlpatterns = [
         DeviceDecommissioningAPIView.as_view(),
         name="device-decommissioning",
     ),
+    path(
+        "management/devices-decommissioning/",
+        DevicesDecommissioningAPIView.as_view(),
+        name="devices-decommissioning",
+    ),
     path(
         "management/site-decommissioning/",
         SiteDecommissioningAPIView.as_view(),
         name="site-decommissioning",
     ),
+    path(
+        "management/site-decommissioning/jobs/",
+        SiteDecommissioningJobsAPIView.as_view(),
+        name="site-decommissioning-jobs",
+    ),
+    path(
+        "management/site-decommissioning/jobs/<uuid:job_id>/",
+        SiteDecommissioningJobAPIView.as_view(),
+        name="site-decommissioning-job",
+    ),
 ]
 urlpatterns += router.urls
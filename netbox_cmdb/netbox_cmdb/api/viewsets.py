@@ -1,6 +1,10 @@
+import json
+
+from django.http import StreamingHttpResponse
 from netbox.api.viewsets import NetBoxModelViewSet
+from rest_framework.utils.encoders import JSONEncoder
 
-from netbox_cmdb.api.pagination import PAGINATORS
+from netbox_cmdb.api.pagination import PAGINATORS, CustomLimitOffsetPagination
 
 
 class CustomNetBoxModelViewSet(NetBoxModelViewSet):
@@ -9,6 +13,12 @@ class CustomNetBoxModelViewSet(NetBoxModelViewSet):
     # https://github.com/encode/django-rest-framework/pull/8954
     ordering = "-created"
 
+    # NetBox limit/offset pagination, with the `count` option
+    pagination_class = CustomLimitOffsetPagination
+
+    # Number of objects fetched per query when streaming a list (stream=true)
+    stream_chunk_size = 500
+
     # Code taken from https://github.com/netbox-community/netbox/pull/10764
     @property
     def paginator(self):
@@ -23,3 +33,31 @@ class CustomNetBoxModelViewSet(NetBoxModelViewSet):
             else:
                 self._paginator = self.pagination_class()
         return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get("stream", "").lower() == "true":
+            return self.stream_list(request)
+        return super().list(request, *args, **kwargs)
+
+    def stream_list(self, request):
+        """
+        Stream the whole filtered queryset as NDJSON, one serialized object per line.
+
+        Objects are fetched by chunks of stream_chunk_size using the primary key as a cursor,
+        so prefetches keep applying and the memory used does not depend on the table size.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by("pk")
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+
+        def _start():
+            last_pk = 0
+            while True:
+                chunk = list(queryset.filter(pk__gt=last_pk)[: self.stream_chunk_size])
+                if not chunk:
+                    return
+                for data in serializer_class(chunk, many=True, context=context).data:
+                    yield json.dumps(data, cls=JSONEncoder) + "\n"
+                last_pk = chunk[-1].pk
+
+        return StreamingHttpResponse(_start(), content_type="application/x-ndjson")
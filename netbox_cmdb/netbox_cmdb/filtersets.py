@@ -1,9 +1,12 @@
 import django_filters
-from django.db.models import Q
+from dcim.models import Device
+from django.db.models import F, Q
+from ipam.models import IPAddress
 from netbox.filtersets import ChangeLoggedModelFilterSet
 from tenancy.filtersets import TenancyFilterSet
 from utilities.filters import MultiValueCharFilter
 
+from netbox_cmdb.helpers import search
 from netbox_cmdb.models.bgp import ASN, BGPPeerGroup, BGPSession, DeviceBGPSession
 from netbox_cmdb.models.interface import Link, LogicalInterface
 from netbox_cmdb.models.route_policy import RoutePolicy
@@ -37,9 +40,36 @@ class ASNFilterSet(ChangeLoggedModelFilterSet):
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(
-            Q(number__icontains=value) | Q(organization_name__icontains=value)
-        ).distinct()
+        return search.icontains(queryset, value, ["number", "organization_name"])
+
+
+def sessions_with_peer_in(peers):
+    """Return the ids of the BGP sessions with a peer in `peers`, a DeviceBGPSession queryset.
+
+    Each side is searched with its own semi-join, so that PostgreSQL uses the index of each
+    peer foreign key, where `peer_a IN (...) OR peer_b IN (...)` scans all the sessions and
+    joining both peers duplicates rows that must then be sorted out with DISTINCT.
+    """
+    peer_ids = peers.values("pk")
+    return (
+        BGPSession.objects.filter(peer_a__in=peer_ids)
+        .values("pk")
+        .union(BGPSession.objects.filter(peer_b__in=peer_ids).values("pk"), all=True)
+    )
+
+
+def sessions_with_endpoint_in(kind, objects):
+    """Return the ids of the BGP sessions with an endpoint in `objects`.
+
+    `kind` is "device" for a Device queryset and "address" for an IPAddress queryset. As with
+    peers, the low and high endpoints are searched with one semi-join each, on their index.
+    """
+    ids = objects.values("pk")
+    return (
+        BGPSession.objects.filter(**{f"low_{kind}__in": ids})
+        .values("pk")
+        .union(BGPSession.objects.filter(**{f"high_{kind}__in": ids}).values("pk"), all=True)
+    )
 
 
 class BGPSessionFilterSet(ChangeLoggedModelFilterSet, TenancyFilterSet):
@@ -106,64 +136,50 @@ class BGPSessionFilterSet(ChangeLoggedModelFilterSet, TenancyFilterSet):
             "monitoring_state",
         ] + device_location_filterset
 
-    def filter_peer_address(self, queryset, name, value):
+    def _filter_endpoints(self, queryset, value, kind, lookup):
+        """Keep the sessions with, for each value, an endpoint matching `lookup(value)`."""
         if len(value) > 2:
             # a BGP session can't have more than 2 peers
             return queryset.none()
 
+        model = Device if kind == "device" else IPAddress
         for val in value:
             # we chain the querysets to get a single BGP session when 2 values are passed
-            queryset = queryset.filter(
-                Q(peer_a__local_address__address__net_in=[val])
-                | Q(peer_b__local_address__address__net_in=[val])
-            )
+            objects = model.objects.filter(lookup(val))
+            queryset = queryset.filter(pk__in=sessions_with_endpoint_in(kind, objects))
         return queryset
 
-    def filter_peer_device(self, queryset, name, value):
-        if len(value) > 2:
-            # a BGP session can't have more than 2 devices
-            return queryset.none()
+    def filter_peer_address(self, queryset, name, value):
+        return self._filter_endpoints(
+            queryset, value, "address", lambda val: Q(address__net_in=[val])
+        )
 
-        for val in value:
-            # we chain the querysets to get a single BGP session when 2 values are passed
-            queryset = queryset.filter(Q(peer_a__device__name=val) | Q(peer_b__device__name=val))
-        return queryset
+    def filter_peer_device(self, queryset, name, value):
+        if len(value) == 2 and value[0] != value[1]:
+            # the sessions between 2 devices are read from the endpoint unique index: both
+            # endpoints are one of the devices, and not twice the same name
+            devices = Device.objects.filter(name__in=value).values("pk")
+            return queryset.filter(low_device__in=devices, high_device__in=devices).exclude(
+                low_device__name=F("high_device__name")
+            )
+        return self._filter_endpoints(queryset, value, "device", lambda val: Q(name=val))
 
     def filter_device_location(self, queryset, name, value):
-        if len(value) > 2:
-            # a BGP session can't have more than 2 devices
-            return queryset.none()
-
-        for val in value:
-            # we chain the querysets to get a single BGP session when 2 values are passed
-            peer_a_lookup = {f"peer_a__{name}": val}
-            peer_b_lookup = {f"peer_b__{name}": val}
-
-            queryset = queryset.filter(Q(**peer_a_lookup) | Q(**peer_b_lookup))
-        return queryset
+        # the lookups of the filters are relative to the peer, `device__site__name`...
+        lookup = name.split("__", 1)[1]
+        return self._filter_endpoints(queryset, value, "device", lambda val: Q(**{lookup: val}))
 
     def filter_device_type(self, queryset, name, value):
-        if len(value) > 2:
-            # a BGP session can't have more than 2 devices
-            return queryset.none()
-
-        for val in value:
-            # we chain the querysets to get a single BGP session when 2 values are passed
-            peer_a_lookup = {f"peer_a__{name}": val}
-            peer_b_lookup = {f"peer_b__{name}": val}
-
-            queryset = queryset.filter(Q(**peer_a_lookup) | Q(**peer_b_lookup)).distinct()
-        return queryset
+        lookup = name.split("__", 1)[1]
+        return self._filter_endpoints(queryset, value, "device", lambda val: Q(**{lookup: val}))
 
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(
-            Q(peer_a__device__name__icontains=value)
-            | Q(peer_a__description__icontains=value)
-            | Q(peer_b__device__name__icontains=value)
-            | Q(peer_b__description__icontains=value)
-        ).distinct()
+        peers = search.icontains(
+            DeviceBGPSession.objects.all(), value, ["device__name", "description"]
+        )
+        return queryset.filter(pk__in=sessions_with_peer_in(peers))
 
 
 class DeviceBGPSessionFilterSet(ChangeLoggedModelFilterSet):
@@ -181,9 +197,7 @@ class DeviceBGPSessionFilterSet(ChangeLoggedModelFilterSet):
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(
-            Q(device__name__icontains=value) | Q(description__icontains=value)
-        ).distinct()
+        return search.icontains(queryset, value, ["device__name", "description"])
 
 
 class RoutePolicyFilterSet(ChangeLoggedModelFilterSet):
@@ -201,7 +215,7 @@ class RoutePolicyFilterSet(ChangeLoggedModelFilterSet):
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(name__icontains=value)
+        return search.icontains(queryset, value, ["name"])
 
 
 class BGPPeerGroupFilterSet(ChangeLoggedModelFilterSet):
@@ -219,9 +233,7 @@ class BGPPeerGroupFilterSet(ChangeLoggedModelFilterSet):
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(
-            Q(device__name__icontains=value) | Q(name__icontains=value)
-        ).distinct()
+        return search.icontains(queryset, value, ["device__name", "name"])
 
 
 class LinkFilterSet(ChangeLoggedModelFilterSet):
@@ -245,12 +257,16 @@ class LinkFilterSet(ChangeLoggedModelFilterSet):
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(
-            Q(interface_a__name__icontains=value)
-            | Q(interface_a__device__name__icontains=value)
-            | Q(interface_b__name__icontains=value)
-            | Q(interface_b__device__name__icontains=value)
-        ).distinct()
+        return search.icontains(
+            queryset,
+            value,
+            [
+                "interface_a__name",
+                "interface_a__device__name",
+                "interface_b__name",
+                "interface_b__device__name",
+            ],
+        )
 
 
 class LogicalInterfaceFilterSet(ChangeLoggedModelFilterSet):
@@ -276,11 +292,11 @@ class LogicalInterfaceFilterSet(ChangeLoggedModelFilterSet):
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(
-            Q(parent_interface__name__icontains=value)
-            | Q(parent_interface__device__name__icontains=value)
-            | Q(description__icontains=value)
-        ).distinct()
+        return search.icontains(
+            queryset,
+            value,
+            ["parent_interface__name", "parent_interface__device__name", "description"],
+        )
 
 
 class SNMPFilterSet(ChangeLoggedModelFilterSet):
@@ -298,7 +314,7 @@ class SNMPFilterSet(ChangeLoggedModelFilterSet):
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(Q(device__name__icontains=value)).distinct()
+        return search.icontains(queryset, value, ["device__name"])
 
 
 class SyslogFilterSet(ChangeLoggedModelFilterSet):
@@ -316,7 +332,7 @@ class SyslogFilterSet(ChangeLoggedModelFilterSet):
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(Q(device__name__icontains=value)).distinct()
+        return search.icontains(queryset, value, ["device__name"])
 
 
 class TacacsFilterSet(ChangeLoggedModelFilterSet):
@@ -334,4 +350,4 @@ class TacacsFilterSet(ChangeLoggedModelFilterSet):
     def search(self, queryset, name, value):
         if not value.strip():
             return queryset
-        return queryset.filter(Q(device__name__icontains=value)).distinct()
+        return search.icontains(queryset, value, ["device__name"])
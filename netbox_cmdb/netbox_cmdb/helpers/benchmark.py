@@ -0,0 +1,591 @@
+"""Query count, latency and memory benchmark of the CMDB API.
+
+A synthetic fabric is seeded, then list, retrieve, create and update requests are sent to
+every viewset registered in the API router. The report is a JSON-serializable dict with
+sorted keys, meant to be diffed between commits.
+"""
+
+import json
+import statistics
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ipam.models import IPAddress
+
+from netbox_cmdb.api.urls import router
+from netbox_cmdb.choices import AssetStateChoices
+from netbox_cmdb.constants import MIN_TACACS_PASSKEY_LENGTH
+from netbox_cmdb.helpers import references
+from netbox_cmdb.models.bgp import (
+    ASN,
+    AfiSafi,
+    BGPGlobal,
+    BGPPeerGroup,
+    BGPSession,
+    DeviceBGPSession,
+)
+from netbox_cmdb.models.bgp_community_list import BGPCommunityList, BGPCommunityListTerm
+from netbox_cmdb.models.interface import (
+    DeviceInterface,
+    Link,
+    LogicalInterface,
+    PortLayout,
+)
+from netbox_cmdb.models.prefix_list import PrefixList, PrefixListTerm
+from netbox_cmdb.models.route_policy import RoutePolicy, RoutePolicyTerm
+from netbox_cmdb.models.snmp import SNMP, SNMPCommunity
+from netbox_cmdb.models.syslog import Syslog, SyslogServer
+from netbox_cmdb.models.tacacs import Tacacs, TacacsServer
+from netbox_cmdb.models.vlan import VLAN
+from netbox_cmdb.models.vrf import VRF
+
+PREFIX = "benchmark"
+
+# private ASNs, allocated from the top of the 4-byte range to stay clear of real ones
+ASN_BASE = 4200000000
+
+
+def _address(index):
+    """Return a distinct /32 out of 100.64.0.0/10 for each index."""
+    return f"100.{64 + index // 65536}.{index // 256 % 256}.{index % 256}/32"
+
+
+class Fabric:
+    """Objects of a seeded fabric, needed to build request payloads."""
+
+    def __init__(self, **sizes):
+        self.sizes = sizes
+        self.addresses = 0
+
+    def new_addresses(self, count):
+        addresses = IPAddress.objects.bulk_create(
+            [IPAddress(address=_address(self.addresses + i)) for i in range(count)]
+        )
+        self.addresses += count
+        return addresses
+
+
+def seed_fabric(
+    devices=20,
+    sessions_per_device=10,
+    policy_terms=10,
+    prefix_list_terms=10,
+    interfaces=10,
+    spares=10,
+):
+    """Create a fabric of `devices` routers with their CMDB configuration.
+
+    Each router peers with the next `sessions_per_device` routers and holds a route policy
+    of `policy_terms` terms, a prefix list and a community list of `prefix_list_terms` terms,
+    and `interfaces` interfaces linked to the next router. `spares` routers without any
+    configuration are kept for the creation of per-device objects.
+    """
+    fabric = Fabric(
+        devices=devices,
+        sessions_per_device=sessions_per_device,
+        policy_terms=policy_terms,
+        prefix_list_terms=prefix_list_terms,
+        interfaces=interfaces,
+    )
+
+    site = Site.objects.create(name=PREFIX, slug=PREFIX)
+    manufacturer = Manufacturer.objects.create(name=PREFIX, slug=PREFIX)
+    fabric.device_type = DeviceType.objects.create(
+        manufacturer=manufacturer, model=PREFIX, slug=PREFIX
+    )
+    fabric.device_role = DeviceRole.objects.create(name=PREFIX, slug=PREFIX)
+    fabric.devices = [
+        Device.objects.create(
+            name=f"{PREFIX}-router{i}",
+            device_role=fabric.device_role,
+            device_type=fabric.device_type,
+            site=site,
+        )
+        for i in range(devices + spares)
+    ]
+    fabric.spare_devices = fabric.devices[devices:]
+    routers = fabric.devices[:devices]
+
+    fabric.asns = ASN.objects.bulk_create(
+        [
+            ASN(number=ASN_BASE + i, organization_name=f"{PREFIX}-{i}")
+            for i in range(len(fabric.devices))
+        ]
+    )
+    bgp_globals = BGPGlobal.objects.bulk_create(
+        [
+            BGPGlobal(device=dev, local_asn=fabric.asns[i], graceful_restart=True)
+            for i, dev in enumerate(routers)
+        ]
+    )
+
+    fabric.prefix_lists = PrefixList.objects.bulk_create(
+        [PrefixList(name="PL-BENCHMARK", device=dev) for dev in routers]
+    )
+    PrefixListTerm.objects.bulk_create(
+        [
+            PrefixListTerm(
+                prefix_list=prefix_list,
+                sequence=(j + 1) * 5,
+                prefix=f"10.{j // 256}.{j % 256}.0/24",
+            )
+            for prefix_list in fabric.prefix_lists
+            for j in range(prefix_list_terms)
+        ]
+    )
+    fabric.community_lists = BGPCommunityList.objects.bulk_create(
+        [BGPCommunityList(name="CL-BENCHMARK", device=dev) for dev in routers]
+    )
+    BGPCommunityListTerm.objects.bulk_create(
+        [
+            BGPCommunityListTerm(
+                bgp_community_list=community_list, sequence=(j + 1) * 5, community=f"65000:{j}"
+            )
+            for community_list in fabric.community_lists
+            for j in range(prefix_list_terms)
+        ]
+    )
+    fabric.route_policies = RoutePolicy.objects.bulk_create(
+        [RoutePolicy(name="RP-BENCHMARK", device=dev) for dev in routers]
+    )
+    RoutePolicyTerm.objects.bulk_create(
+        [
+            RoutePolicyTerm(
+                route_policy=route_policy,
+                sequence=(j + 1) * 5,
+                from_prefix_list=fabric.prefix_lists[i] if j % 2 else None,
+                from_bgp_community_list=None if j % 2 else fabric.community_lists[i],
+                set_local_pref=100 + j,
+            )
+            for i, route_policy in enumerate(fabric.route_policies)
+            for j in range(policy_terms)
+        ]
+    )
+    fabric.peer_groups = BGPPeerGroup.objects.bulk_create(
+        [BGPPeerGroup(name="PG-BENCHMARK", device=dev) for dev in routers]
+    )
+
+    pairs = [
+        (i, (i + j) % devices)
+        for i in range(devices)
+        for j in range(1, min(sessions_per_device, devices - 1) + 1)
+    ]
+    addresses = fabric.new_addresses(2 * len(pairs))
+    peers = DeviceBGPSession.objects.bulk_create(
+        [
+            DeviceBGPSession(
+                device=routers[device],
+                local_address=addresses[2 * k + side],
+                local_asn=fabric.asns[device],
+                peer_group=fabric.peer_groups[device],
+                route_policy_in=fabric.route_policies[device],
+                route_policy_out=fabric.route_policies[device],
+            )
+            for k, pair in enumerate(pairs)
+            for side, device in enumerate(pair)
+        ]
+    )
+    AfiSafi.objects.bulk_create(
+        [
+            AfiSafi(
+                device_bgp_session=peer,
+                afi_safi_name="ipv4-unicast",
+                route_policy_in=peer.route_policy_in,
+                route_policy_out=peer.route_policy_out,
+            )
+            for peer in peers
+        ]
+    )
+    sessions = BGPSession.objects.bulk_create(
+        [
+            BGPSession(
+                peer_a=peers[2 * k],
+                peer_b=peers[2 * k + 1],
+                state=AssetStateChoices.STATE_PRODUCTION,
+            )
+            for k in range(len(pairs))
+        ]
+    )
+
+    fabric.interfaces = DeviceInterface.objects.bulk_create(
+        [
+            DeviceInterface(name=f"eth{j}", device=dev)
+            for dev in fabric.devices
+            for j in range(interfaces)
+        ]
+    )
+    fabric.vlans = VLAN.objects.bulk_create(
+        [VLAN(vid=j + 1, name=f"{PREFIX}-{j}") for j in range(10)]
+    )
+    fabric.vrfs = VRF.objects.bulk_create([VRF(name=f"{PREFIX}-{j}") for j in range(10)])
+    LogicalInterface.objects.bulk_create(
+        [
+            LogicalInterface(
+                parent_interface=interface, index=0, type="l2", untagged_vlan=fabric.vlans[0]
+            )
+            for interface in fabric.interfaces[: devices * interfaces]
+        ]
+    )
+    links = Link.objects.bulk_create(
+        [
+            Link(
+                interface_a=fabric.interfaces[i * interfaces + j],
+                interface_b=fabric.interfaces[(i + 1) % devices * interfaces + j],
+            )
+            for i in range(devices)
+            for j in range(interfaces)
+        ]
+    )
+    PortLayout.objects.bulk_create(
+        [
+            PortLayout(
+                device_type=fabric.device_type,
+                network_role=fabric.device_role,
+                name=f"eth{j}",
+                label_name=str(j),
+                logical_name=f"Ethernet{j}",
+                vendor_name=f"Ethernet{j}",
+                vendor_short_name=f"Eth{j}",
+                vendor_long_name=f"Ethernet{j}",
+            )
+            for j in range(interfaces)
+        ]
+    )
+
+    fabric.snmp_community = SNMPCommunity.objects.create(name=PREFIX, community=PREFIX)
+    snmps = SNMP.objects.bulk_create(
+        [SNMP(device=dev, location=PREFIX, contact=PREFIX) for dev in routers]
+    )
+    SNMP.community_list.through.objects.bulk_create(
+        [
+            SNMP.community_list.through(snmp=snmp, snmpcommunity=fabric.snmp_community)
+            for snmp in snmps
+        ]
+    )
+    fabric.syslog_servers = SyslogServer.objects.bulk_create(
+        [SyslogServer(server_address=f"192.0.2.{j + 1}") for j in range(2)]
+    )
+    syslogs = Syslog.objects.bulk_create([Syslog(device=dev) for dev in routers])
+    Syslog.server_list.through.objects.bulk_create(
+        [
+            Syslog.server_list.through(syslog=syslog, syslogserver=server)
+            for syslog in syslogs
+            for server in fabric.syslog_servers
+        ]
+    )
+    fabric.tacacs_servers = TacacsServer.objects.bulk_create(
+        [TacacsServer(server_address=f"198.51.100.{j + 1}", priority=j + 1) for j in range(2)]
+    )
+    tacacs = Tacacs.objects.bulk_create(
+        [Tacacs(device=dev, passkey="x" * MIN_TACACS_PASSKEY_LENGTH) for dev in routers]
+    )
+    Tacacs.server_list.through.objects.bulk_create(
+        [
+            Tacacs.server_list.through(tacacs=config, tacacsserver=server)
+            for config in tacacs
+            for server in fabric.tacacs_servers
+        ]
+    )
+
+    # bulk_create sends no signal, the device references are indexed here
+    for model, objects in [
+        (BGPGlobal, bgp_globals),
+        (PrefixList, fabric.prefix_lists),
+        (BGPCommunityList, fabric.community_lists),
+        (RoutePolicy, fabric.route_policies),
+        (BGPPeerGroup, fabric.peer_groups),
+        (DeviceBGPSession, peers),
+        (BGPSession, sessions),
+        (DeviceInterface, fabric.interfaces),
+        (Link, links),
+        (SNMP, snmps),
+        (Syslog, syslogs),
+        (Tacacs, tacacs),
+    ]:
+        references.index_created(model, objects)
+
+    return fabric
+
+
+def _device_bgp_session_payload(fabric, device_index, address):
+    return {
+        "device": {"id": fabric.spare_devices[device_index].pk},
+        "local_address": {"id": address.pk},
+        "local_asn": {"id": fabric.asns[0].pk},
+        "afi_safis": [{"afi_safi_name": "ipv4-unicast"}],
+    }
+
+
+def _bgp_session_payload(fabric, i):
+    addresses = fabric.new_addresses(2)
+    return {
+        "state": AssetStateChoices.STATE_PRODUCTION,
+        "peer_a": _device_bgp_session_payload(fabric, i, addresses[0]),
+        "peer_b": _device_bgp_session_payload(fabric, i + 1, addresses[1]),
+    }
+
+
+def _port_layout_payload(fabric, i):
+    return {
+        "device_type": {"id": fabric.device_type.pk},
+        "network_role": {"id": fabric.device_role.pk},
+        "name": f"new{i}",
+        "label_name": str(i),
+        "logical_name": f"New{i}",
+        "vendor_name": f"New{i}",
+        "vendor_short_name": f"New{i}",
+        "vendor_long_name": f"New{i}",
+    }
+
+
+def _route_policy_payload(fabric, i):
+    return {
+        "name": f"RP-NEW-{i}",
+        "device": {"id": fabric.devices[0].pk},
+        "terms": [
+            {
+                "sequence": (j + 1) * 5,
+                "decision": "permit",
+                "from_prefix_list": {"id": fabric.prefix_lists[0].pk},
+                "set_local_pref": 100 + j,
+            }
+            for j in range(fabric.sizes["policy_terms"])
+        ],
+    }
+
+
+# Payload of the i-th object created through each router prefix. Per-device singletons
+# (BGP global, SNMP, syslog, TACACS) are created on spare devices.
+PAYLOADS = {
+    "asns": lambda fabric, i: {
+        "number": ASN_BASE + 100000 + i,
+        "organization_name": f"{PREFIX}-new-{i}",
+    },
+    "bgp-global": lambda fabric, i: {
+        "device": {"id": fabric.spare_devices[i].pk},
+        "local_asn": {"id": fabric.asns[0].pk},
+        "graceful_restart": True,
+        "afi_safis": [{"afi_safi_name": "ipv4-unicast", "aggregates": [{"prefix": "10.0.0.0/8"}]}],
+    },
+    "bgp-sessions": _bgp_session_payload,
+    "device-bgp-sessions": lambda fabric, i: {
+        "device": {"id": fabric.devices[0].pk},
+        "local_address": {"id": fabric.new_addresses(1)[0].pk},
+        "local_asn": {"id": fabric.asns[0].pk},
+    },
+    "bgp-community-lists": lambda fabric, i: {
+        "name": f"CL-NEW-{i}",
+        "device": {"id": fabric.devices[0].pk},
+        "terms": [
+            {"sequence": (j + 1) * 5, "community": f"65000:{j}"}
+            for j in range(fabric.sizes["prefix_list_terms"])
+        ],
+    },
+    "device-interfaces": lambda fabric, i: {
+        "name": f"new{i}",
+        "device": {"id": fabric.devices[0].pk},
+    },
+    "logical-interfaces": lambda fabric, i: {
+        "index": 100 + i,
+        "parent_interface": {"id": fabric.interfaces[0].pk},
+        "type": "l3",
+        "vrf": {"id": fabric.vrfs[0].pk},
+    },
+    "links": lambda fabric, i: {
+        "interface_a": {"id": fabric.interfaces[-1 - 2 * i].pk},
+        "interface_b": {"id": fabric.interfaces[-2 - 2 * i].pk},
+    },
+    "peer-groups": lambda fabric, i: {
+        "name": f"PG-NEW-{i}",
+        "device": {"id": fabric.devices[0].pk},
+    },
+    "port-layouts": _port_layout_payload,
+    "prefix-lists": lambda fabric, i: {
+        "name": f"PL-NEW-{i}",
+        "device": {"id": fabric.devices[0].pk},
+        "ip_version": "ipv4",
+        "terms": [
+            {"sequence": (j + 1) * 5, "prefix": f"10.{j // 256}.{j % 256}.0/24"}
+            for j in range(fabric.sizes["prefix_list_terms"])
+        ],
+    },
+    "route-policies": _route_policy_payload,
+    "snmp": lambda fabric, i: {
+        "device": {"id": fabric.spare_devices[i].pk},
+        "location": PREFIX,
+        "contact": PREFIX,
+        "community_list": [fabric.snmp_community.pk],
+    },
+    "snmp-community": lambda fabric, i: {
+        "name": f"{PREFIX}-new-{i}",
+        "community": PREFIX,
+        "type": "readonly",
+    },
+    "vlans": lambda fabric, i: {"vid": 100 + i, "name": f"{PREFIX}-new-{i}"},
+    "vrfs": lambda fabric, i: {"name": f"{PREFIX}-new-{i}"},
+    "syslog": lambda fabric, i: {
+        "device": {"id": fabric.spare_devices[i].pk},
+        "server_list": [server.pk for server in fabric.syslog_servers],
+    },
+    "syslog-server": lambda fabric, i: {"server_address": f"192.0.2.{100 + i}"},
+    "tacacs": lambda fabric, i: {
+        "device": {"id": fabric.spare_devices[i].pk},
+        "passkey": "x" * MIN_TACACS_PASSKEY_LENGTH,
+        "server_list": [server.pk for server in fabric.tacacs_servers],
+    },
+    "tacacs-server": lambda fabric, i: {"server_address": f"198.51.100.{100 + i}"},
+}
+
+# Filtered list requests whose query plans are reported, by name: (router prefix, params)
+FILTERS = {
+    "bgp-sessions device": ("bgp-sessions", lambda fabric: {"device": fabric.devices[0].name}),
+    "bgp-sessions device pair": (
+        "bgp-sessions",
+        lambda fabric: {"device": [fabric.devices[0].name, fabric.devices[1].name]},
+    ),
+    "bgp-sessions site": ("bgp-sessions", lambda fabric: {"device__site__name": PREFIX}),
+    "bgp-sessions device type": (
+        "bgp-sessions",
+        lambda fabric: {"device__device_type_id": fabric.device_type.pk},
+    ),
+    "bgp-sessions search": ("bgp-sessions", lambda fabric: {"q": fabric.devices[0].name}),
+}
+
+
+def _request(client, method, url, payload=None, **headers):
+    if payload is None:
+        return getattr(client, method)(url, **headers)
+    return getattr(client, method)(
+        url, json.dumps(payload), content_type="application/json", **headers
+    )
+
+
+def measure(client, method, url, payloads, **headers):
+    """Send one request per payload (None for no body), return its measures.
+
+    Wall times are taken on all requests but the last one, which is sent with memory
+    tracing enabled to get the peak memory allocated while handling it, and whose queries
+    are counted.
+    """
+    times = []
+    for payload in payloads[:-1]:
+        start = time.perf_counter()
+        response = _request(client, method, url, payload, **headers)
+        times.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            response = _request(client, method, url, payloads[-1], **headers)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "status": response.status_code,
+        "queries": len(queries),
+        "peak_memory_kb": round(peak / 1024),
+    }
+    if times:
+        result["time_ms"] = {
+            "min": round(min(times), 2),
+            "median": round(statistics.median(times), 2),
+            "max": round(max(times), 2),
+        }
+    if response.status_code >= 400:
+        result["error"] = response.content.decode()[:500]
+    return result, response
+
+
+def explain(viewset, params):
+    """Return the lines of the query plan of a filtered list, without costs to be diffable."""
+    filterset = viewset.filterset_class(params, queryset=viewset.queryset)
+    return filterset.qs.explain(costs=False).splitlines()
+
+
+def run_filters(client, fabric, repeat=5, **headers):
+    """Benchmark the filtered list requests of FILTERS, with the query plan of each."""
+    viewsets = {prefix: (viewset, basename) for prefix, viewset, basename in router.registry}
+    filters = {}
+    for name, (prefix, params) in FILTERS.items():
+        viewset, basename = viewsets[prefix]
+        query = urlencode(params(fabric), doseq=True)
+        url = f"{reverse(f'plugins-api:netbox_cmdb-api:{basename}-list')}?{query}"
+        filters[name], _ = measure(client, "get", url, [None] * (repeat + 1), **headers)
+        filters[name]["plan"] = explain(viewset, QueryDict(query))
+    return filters
+
+
+def run_benchmark(client, fabric, repeat=5, **headers):
+    """Benchmark list, retrieve, create and update on every router registered viewset, and
+    the filtered lists of FILTERS."""
+    endpoints = {}
+    for prefix, viewset, basename in router.registry:
+        list_url = reverse(f"plugins-api:netbox_cmdb-api:{basename}-list")
+        obj = viewset.queryset.model.objects.order_by("pk").first()
+        report = {"count": viewset.queryset.model.objects.count()}
+
+        report["list"], _ = measure(client, "get", list_url, [None] * (repeat + 1), **headers)
+        if obj is not None:
+            detail_url = reverse(
+                f"plugins-api:netbox_cmdb-api:{basename}-detail", kwargs={"pk": obj.pk}
+            )
+            report["retrieve"], _ = measure(
+                client, "get", detail_url, [None] * (repeat + 1), **headers
+            )
+
+        if prefix not in PAYLOADS:
+            report["create"] = report["update"] = {"skipped": "no payload"}
+            endpoints[prefix] = report
+            continue
+
+        payloads = [PAYLOADS[prefix](fabric, i) for i in range(repeat + 1)]
+        report["create"], response = measure(client, "post", list_url, payloads, **headers)
+        if response.status_code == 201:
+            detail_url = reverse(
+                f"plugins-api:netbox_cmdb-api:{basename}-detail",
+                kwargs={"pk": response.json()["id"]},
+            )
+            report["update"], _ = measure(
+                client, "put", detail_url, [payloads[-1]] * (repeat + 1), **headers
+            )
+        else:
+            report["update"] = {"skipped": "create failed"}
+        endpoints[prefix] = report
+
+    return {
+        "fabric": fabric.sizes,
+        "repeat": repeat,
+        "endpoints": endpoints,
+        "filters": run_filters(client, fabric, repeat=repeat, **headers),
+    }
+
+
+def compare(previous, current):
+    """Return the lines describing the query count and query plan changes between two
+    reports."""
+    lines = []
+    for prefix, report in sorted(current["endpoints"].items()):
+        for operation, result in sorted(report.items()):
+            if not isinstance(result, dict) or "queries" not in result:
+                continue
+            before = previous.get("endpoints", {}).get(prefix, {}).get(operation, {})
+            if before.get("queries") is not None and before["queries"] != result["queries"]:
+                lines.append(
+                    f"{prefix} {operation}: {before['queries']} -> {result['queries']} queries"
+                )
+
+    for name, result in sorted(current.get("filters", {}).items()):
+        before = previous.get("filters", {}).get(name)
+        if before is None or before.get("plan") == result["plan"]:
+            continue
+        lines.append(f"{name}: query plan changed")
+        lines.extend(f"  - {line}" for line in before["plan"])
+        lines.extend(f"  + {line}" for line in result["plan"])
+    return lines
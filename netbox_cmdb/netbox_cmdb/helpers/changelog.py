@@ -0,0 +1,66 @@
+import json
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from extras.choices import ObjectChangeActionChoices
+from extras.models import ObjectChange
+from netbox.context import current_request
+
+
+def log_bulk_changes(request, objects, action=ObjectChangeActionChoices.ACTION_CREATE):
+    """Record the change log of objects written with bulk queryset operations.
+
+    bulk_create() and friends do not send the post_save signal NetBox relies on to log changes,
+    so the ObjectChange entries are built here and inserted in a single query.
+    """
+    changes = []
+    for obj in objects:
+        change = obj.to_objectchange(action)
+        change.user = request.user
+        change.user_name = request.user.username
+        change.request_id = request.id
+        changes.append(change)
+
+    ObjectChange.objects.bulk_create(changes)
+
+
+class _SnapshotEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            # netaddr objects and other values stored as strings by the NetBox serializer
+            return str(o)
+
+
+def is_logging_changes():
+    """Whether the current request records its changes, as NetBox signal handlers do."""
+    return current_request.get() is not None
+
+
+def log_raw_deletes(model, objects):
+    """Record the change log of objects deleted with raw queries.
+
+    `objects` are (pk, string representation, snapshot) tuples, the snapshot being the values
+    of the concrete fields of the object before its deletion.
+    """
+    request = current_request.get()
+    if request is None:
+        return
+
+    content_type = ContentType.objects.get_for_model(model)
+    ObjectChange.objects.bulk_create(
+        [
+            ObjectChange(
+                user=request.user,
+                user_name=request.user.username,
+                request_id=request.id,
+                action=ObjectChangeActionChoices.ACTION_DELETE,
+                changed_object_type=content_type,
+                changed_object_id=pk,
+                object_repr=label[:200],
+                prechange_data=json.loads(json.dumps(snapshot, cls=_SnapshotEncoder)),
+            )
+            for pk, label, snapshot in objects
+        ]
+    )
@@ -1,63 +1,221 @@
-from dcim.models import Location, Rack
+from dcim.models import Device, Location, Rack
+from django.db import connection, transaction
 from django.db.models import Q
 
-from netbox_cmdb.models.bgp import BGPPeerGroup, BGPSession, DeviceBGPSession
-from netbox_cmdb.models.bgp_community_list import BGPCommunityList
-from netbox_cmdb.models.prefix_list import PrefixList
-from netbox_cmdb.models.route_policy import RoutePolicy
+from netbox_cmdb.helpers import changelog, references
+from netbox_cmdb.models.bgp import AfiSafi, BGPPeerGroup, BGPSession, DeviceBGPSession
+from netbox_cmdb.models.bgp_community_list import BGPCommunityList, BGPCommunityListTerm
+from netbox_cmdb.models.prefix_list import PrefixList, PrefixListTerm
+from netbox_cmdb.models.route_policy import RoutePolicy, RoutePolicyTerm
 from netbox_cmdb.models.snmp import SNMP
 from netbox_cmdb.models.syslog import Syslog
 from netbox_cmdb.models.tacacs import Tacacs
 
 
-def clean_cmdb_for_devices(device_ids: list[int]):
-    deleted_objects = {
-        "bgp_sessions": [],
-        "device_bgp_sessions": [],
-        "bgp_peer_groups": [],
-        "route_policies": [],
-        "prefix_lists": [],
-        "bgp_community_lists": [],
-        "snmp": [],
-        "syslog": [],
-        "tacacs": [],
-    }
+def _device_bgp_session_label(device, local_asn, local_address):
+    return f"{device}--{local_asn}--{local_address}"
+
+
+DEVICE_BGP_SESSION_LABEL_FIELDS = ("device__name", "local_asn__number", "local_address__address")
+
+# CMDB objects attached to devices, in deletion order: an object is deleted before the objects
+# it references. Each kind is selected by its paths to the device, and its string
+# representation is rebuilt from label fields fetched in the same query.
+CLEANED_OBJECTS = [
+    (
+        "bgp_sessions",
+        BGPSession,
+        ("peer_a__device", "peer_b__device"),
+        tuple(f"peer_a__{field}" for field in DEVICE_BGP_SESSION_LABEL_FIELDS)
+        + tuple(f"peer_b__{field}" for field in DEVICE_BGP_SESSION_LABEL_FIELDS),
+        lambda *values: (
+            f"{_device_bgp_session_label(*values[:3])} <--> "
+            f"{_device_bgp_session_label(*values[3:])}"
+        ),
+    ),
+    (
+        "device_bgp_sessions",
+        DeviceBGPSession,
+        ("device",),
+        DEVICE_BGP_SESSION_LABEL_FIELDS,
+        _device_bgp_session_label,
+    ),
+    ("bgp_peer_groups", BGPPeerGroup, ("device",), ("device__name", "name"), "{}--{}".format),
+    ("route_policies", RoutePolicy, ("device",), ("device__name", "name"), "{}-{}".format),
+    ("prefix_lists", PrefixList, ("device",), ("device__name", "name"), "{}-{}".format),
+    (
+        "bgp_community_lists",
+        BGPCommunityList,
+        ("device",),
+        ("device__name", "name"),
+        "{}-{}".format,
+    ),
+    ("snmp", SNMP, ("device",), ("device__name",), "{}-SNMP".format),
+    ("syslog", Syslog, ("device",), ("device__name",), "{}-Syslog".format),
+    ("tacacs", Tacacs, ("device",), ("device__name",), "{}-Tacacs".format),
+]
+
+# Objects deleted along with their parent, given as (model, foreign key to the parent,
+# label fields, label).
+CLEANED_CHILDREN = {
+    DeviceBGPSession: [(AfiSafi, "device_bgp_session", ("afi_safi_name",), "{}".format)],
+    RoutePolicy: [
+        (
+            RoutePolicyTerm,
+            "route_policy",
+            ("route_policy__device__name", "route_policy__name", "sequence", "decision"),
+            "{}-{} seq:{} decision:{}".format,
+        )
+    ],
+    PrefixList: [
+        (
+            PrefixListTerm,
+            "prefix_list",
+            ("prefix_list__device__name", "prefix_list__name", "sequence"),
+            "{}-{} seq:{}".format,
+        )
+    ],
+    BGPCommunityList: [
+        (
+            BGPCommunityListTerm,
+            "bgp_community_list",
+            ("bgp_community_list__device__name", "bgp_community_list__name", "sequence"),
+            "{}-{} seq:{}".format,
+        )
+    ],
+}
+
+
+def _fetch(queryset, label_fields, label, with_labels, with_snapshots):
+    """Return the (pk, label, snapshot) of the objects of a queryset, in a single query."""
+    fields = [f for f in queryset.model._meta.concrete_fields if not f.primary_key]
+    columns = ["pk"]
+    if with_snapshots:
+        columns += [f.attname for f in fields]
+    if with_labels:
+        columns += label_fields
+
+    objects = []
+    for row in queryset.values_list(*columns):
+        snapshot = (
+            {f.name: row[i] for i, f in enumerate(fields, start=1)} if with_snapshots else None
+        )
+        objects.append(
+            (
+                row[0],
+                label(*row[len(columns) - len(label_fields) :]) if with_labels else None,
+                snapshot,
+            )
+        )
+    return objects
+
+
+def raw_delete(model, column, values):
+    """Delete the rows of `model` whose `column` is in `values`, in a single query.
+
+    Django's deletion collector and the delete signals are skipped: the rows must have no
+    dependent objects, and the change log and device references of the deleted objects are
+    left to the caller. Return the number of deleted rows.
+    """
+    if not values:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {model._meta.db_table} WHERE {column} = ANY(%s)",  # noqa: S608
+            [list(values)],
+        )
+        return cursor.rowcount
+
+
+def _delete_objects(model, objects, log_changes):
+    pks = [pk for pk, _, _ in objects]
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        raw_delete(through, through._meta.get_field(field.m2m_field_name()).column, pks)
+    raw_delete(model, model._meta.pk.column, pks)
+    references.forget_references(model, pks)
+    if log_changes:
+        changelog.log_raw_deletes(model, objects)
 
-    bgp_sessions = BGPSession.objects.filter(
-        Q(peer_a__device__id__in=device_ids) | Q(peer_b__device__id__in=device_ids)
-    )
-    device_bgp_sessions = DeviceBGPSession.objects.filter(device__id__in=device_ids)
-    bgp_peer_groups = BGPPeerGroup.objects.filter(device__id__in=device_ids)
-    route_policies = RoutePolicy.objects.filter(device__id__in=device_ids)
-    prefix_lists = PrefixList.objects.filter(device__id__in=device_ids)
-    bgp_community_lists = BGPCommunityList.objects.filter(device__id__in=device_ids)
-    snmp = SNMP.objects.filter(device__id__in=device_ids)
-    syslog = Syslog.objects.filter(device__id__in=device_ids)
-    tacacs = Tacacs.objects.filter(device__id__in=device_ids)
-
-    deleted_objects["bgp_sessions"] = [str(val) for val in list(bgp_sessions)]
-    deleted_objects["device_bgp_sessions"] = [str(val) for val in list(device_bgp_sessions)]
-    deleted_objects["bgp_peer_groups"] = [str(val) for val in list(bgp_peer_groups)]
-    deleted_objects["route_policies"] = [str(val) for val in list(route_policies)]
-    deleted_objects["prefix_lists"] = [str(val) for val in list(prefix_lists)]
-    deleted_objects["bgp_community_lists"] = [str(val) for val in list(bgp_community_lists)]
-    deleted_objects["snmp"] = [str(val) for val in list(snmp)]
-    deleted_objects["syslog"] = [str(val) for val in list(syslog)]
-    deleted_objects["tacacs"] = [str(val) for val in list(tacacs)]
-
-    bgp_sessions.delete()
-    device_bgp_sessions.delete()
-    bgp_peer_groups.delete()
-    route_policies.delete()
-    prefix_lists.delete()
-    bgp_community_lists.delete()
-    snmp.delete()
-    syslog.delete()
-    tacacs.delete()
+
+def clean_cmdb_for_devices(device_ids: list[int], counts_only=False):
+    """Delete the CMDB objects attached to devices and return them per kind.
+
+    Each kind of object is read with a single query and deleted with set-based queries,
+    bypassing Django's deletion collector, their change log is recorded in bulk.
+    With `counts_only`, only the number of deleted objects of each kind is returned.
+    """
+    log_changes = changelog.is_logging_changes()
+    with_labels = log_changes or not counts_only
+
+    deleted_objects = {}
+    for name, model, device_paths, label_fields, label in CLEANED_OBJECTS:
+        device_filter = Q()
+        for path in device_paths:
+            device_filter |= Q(**{f"{path}__in": device_ids})
+        objects = _fetch(
+            model.objects.filter(device_filter), label_fields, label, with_labels, log_changes
+        )
+
+        parent_pks = [pk for pk, _, _ in objects]
+        for child_model, parent_field, child_label_fields, child_label in CLEANED_CHILDREN.get(
+            model, []
+        ):
+            children = _fetch(
+                child_model.objects.filter(**{f"{parent_field}__in": parent_pks}),
+                child_label_fields,
+                child_label,
+                log_changes,
+                log_changes,
+            )
+            _delete_objects(child_model, children, log_changes)
+        _delete_objects(model, objects, log_changes)
+
+        deleted_objects[name] = (
+            len(objects) if counts_only else [object_label for _, object_label, _ in objects]
+        )
 
     return deleted_objects
 
 
+def _delete_devices(devices):
+    with transaction.atomic():
+        cleaned = clean_cmdb_for_devices([dev.id for dev in devices], counts_only=True)
+        Device.objects.filter(id__in=[dev.id for dev in devices]).delete()
+
+    return {
+        "deleted": [dev.name for dev in devices],
+        "failed": [],
+        "cmdb_objects": cleaned,
+    }
+
+
+def decommission_devices(devices, chunk_size):
+    """Delete devices and their CMDB objects, `chunk_size` devices per transaction.
+
+    Yield the outcome of each chunk. When a chunk cannot be deleted at once, its devices
+    are retried one by one so that a single failing device does not block the others.
+    """
+    for i in range(0, len(devices), chunk_size):
+        chunk = devices[i : i + chunk_size]
+        try:
+            result = _delete_devices(chunk)
+        except Exception:
+            result = {"deleted": [], "failed": [], "cmdb_objects": {}}
+            for dev in chunk:
+                try:
+                    device_result = _delete_devices([dev])
+                except Exception as e:
+                    result["failed"].append({"device": dev.name, "error": str(e)})
+                    continue
+
+                result["deleted"].append(dev.name)
+                for name, count in device_result["cmdb_objects"].items():
+                    result["cmdb_objects"][name] = result["cmdb_objects"].get(name, 0) + count
+        yield result
+
+
 def clean_site_topology(site):
     racks = Rack.objects.filter(site=site.id)
     racks.delete()
@@ -0,0 +1,151 @@
+"""Compression of prefix lists into fewer equivalent terms.
+
+A term `prefix ge X le Y` matches the routes inside `prefix` whose length is in a range:
+[X, Y] when both are set, [X, max] with ge only, [prefix length, Y] with le only, and the
+prefix length alone without any. Prefix lists only permit routes, so a list matches the
+union of its terms, whatever their order. The compression keeps that union and repeats,
+until nothing changes:
+
+- ranges of a same prefix are merged when they overlap or are adjacent;
+- two sibling prefixes with a same range are replaced by their parent with that range,
+  e.g. 10.0.0.0/24 and 10.0.1.0/24 by 10.0.0.0/23 ge 24 le 24;
+- ranges already covered by the ranges of a shorter prefix, found with a radix tree, are
+  removed.
+"""
+
+from netaddr import IPNetwork
+
+from netbox_cmdb.helpers.prefix_tree import MAX_PREFIX_LENGTHS, PrefixTree
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def _is_covered(low, high, ranges):
+    """Whether [low, high] is included in the union of merged ranges."""
+    return any(r_low <= low and high <= r_high for r_low, r_high in ranges)
+
+
+def term_range(length, ge, le, max_length):
+    """Return the lengths of the routes matched by a term, as a (low, high) tuple."""
+    if ge and le:
+        return ge, le
+    if ge:
+        return ge, max_length
+    if le:
+        return length, le
+    return length, length
+
+
+def range_term(length, low, high, max_length):
+    """Return the (ge, le) of a term matching the lengths in [low, high]."""
+    ge = low if low > length else None
+    le = high if high > length else None
+    if ge is not None and high == max_length:
+        le = None
+    return ge, le
+
+
+class PrefixListCompressor:
+    """Compress the terms of a prefix list of one IP version."""
+
+    def __init__(self, version):
+        self.version = version
+        self.max_length = MAX_PREFIX_LENGTHS[version]
+        # (length, network as int) -> merged ranges
+        self.ranges = {}
+
+    def add(self, prefix, ge=None, le=None):
+        prefix = IPNetwork(prefix)
+        key = (prefix.prefixlen, int(prefix.network))
+        self.ranges.setdefault(key, []).append(
+            term_range(prefix.prefixlen, ge, le, self.max_length)
+        )
+
+    def _merge_prefix_ranges(self):
+        changed = False
+        for key, ranges in self.ranges.items():
+            merged = _merge_ranges(ranges)
+            changed |= merged != ranges
+            self.ranges[key] = merged
+        return changed
+
+    def _merge_siblings(self):
+        """Move the ranges shared by two sibling prefixes to their parent."""
+        changed = False
+        by_length = {}
+        for length, key in self.ranges:
+            by_length.setdefault(length, set()).add(key)
+
+        # longest prefixes first, so that merged parents can merge with their own sibling
+        for length in range(self.max_length, 0, -1):
+            bit = 1 << (self.max_length - length)
+            for key in sorted(by_length.get(length, ())):
+                sibling = (length, key | bit)
+                if key & bit or sibling not in self.ranges:
+                    continue
+
+                shared = set(self.ranges[(length, key)]) & set(self.ranges[sibling])
+                if not shared:
+                    continue
+
+                for child in ((length, key), sibling):
+                    remaining = [r for r in self.ranges[child] if r not in shared]
+                    if remaining:
+                        self.ranges[child] = remaining
+                    else:
+                        del self.ranges[child]
+                parent = (length - 1, key)
+                self.ranges[parent] = _merge_ranges(self.ranges.get(parent, []) + list(shared))
+                by_length.setdefault(length - 1, set()).add(key)
+                changed = True
+        return changed
+
+    def _remove_covered(self):
+        """Remove the ranges included in the ranges of shorter prefixes."""
+        tree = PrefixTree(self.version)
+        for (length, key), ranges in self.ranges.items():
+            tree.insert(key, length, ranges)
+
+        changed = False
+        for key, length, (ranges,), covering_values in tree.walk():
+            if not covering_values:
+                continue
+
+            covering = _merge_ranges(r for (node_ranges,) in covering_values for r in node_ranges)
+            remaining = [r for r in ranges if not _is_covered(*r, covering)]
+            if len(remaining) != len(ranges):
+                changed = True
+                if remaining:
+                    self.ranges[(length, key)] = remaining
+                else:
+                    del self.ranges[(length, key)]
+        return changed
+
+    def compress(self):
+        """Return the compressed terms as (prefix, ge, le), in address order."""
+        self._merge_prefix_ranges()
+        while self._merge_siblings() | self._remove_covered() | self._merge_prefix_ranges():
+            pass
+
+        terms = []
+        for length, key in sorted(self.ranges, key=lambda k: (k[1], k[0])):
+            prefix = IPNetwork((key, length), version=self.version)
+            for low, high in self.ranges[(length, key)]:
+                terms.append((prefix, *range_term(length, low, high, self.max_length)))
+        return terms
+
+
+def compress_terms(terms, version):
+    """Compress (prefix, ge, le) terms of a prefix list of an IP version (4 or 6)."""
+    compressor = PrefixListCompressor(version)
+    for prefix, ge, le in terms:
+        compressor.add(prefix, ge, le)
+    return compressor.compress()
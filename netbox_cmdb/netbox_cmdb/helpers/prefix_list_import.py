@@ -0,0 +1,151 @@
+"""Import of large prefix lists, as generated by IRR tools like bgpq4.
+
+Terms are parsed and validated line by line while PostgreSQL COPY loads them, so the memory
+used does not depend on the size of the list.
+"""
+
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.utils import timezone
+from ipam.validators import prefix_validator
+from netaddr import AddrFormatError, IPNetwork
+
+from netbox_cmdb.models.prefix_list import PrefixListTerm
+
+FORMAT_TEXT = "text"
+FORMAT_NDJSON = "ndjson"
+
+# Validation errors reported at most: loading stops at the first one, not validation
+MAX_ERRORS = 100
+
+COPY_COLUMNS = ("prefix_list", "sequence", "prefix", "ge", "le", "created", "last_updated")
+
+
+def _parse_text(line):
+    """Parse a `prefix [ge X] [le Y]` line."""
+    tokens = line.split()
+    term = {"prefix": tokens[0], "ge": None, "le": None}
+    operators = tokens[1:]
+    if len(operators) % 2:
+        raise ValueError("expected `prefix [ge X] [le Y]`")
+
+    for i in range(0, len(operators), 2):
+        operator, value = operators[i].lower(), operators[i + 1]
+        if operator not in ("ge", "le") or term[operator] is not None:
+            raise ValueError(f"unexpected operator {operators[i]}")
+        term[operator] = int(value)
+    return term
+
+
+def _parse_ndjson(line):
+    """Parse a `{"prefix": ..., "ge": ..., "le": ...}` line."""
+    data = json.loads(line)
+    if not isinstance(data, dict) or "prefix" not in data:
+        raise ValueError("expected an object with a prefix")
+    if set(data) - {"prefix", "ge", "le"}:
+        raise ValueError(
+            f"unexpected keys: {', '.join(sorted(set(data) - {'prefix', 'ge', 'le'}))}"
+        )
+
+    term = {"prefix": data["prefix"], "ge": data.get("ge"), "le": data.get("le")}
+    for operator in ("ge", "le"):
+        if term[operator] is not None and not isinstance(term[operator], int):
+            raise ValueError(f"{operator} must be an integer")
+    return term
+
+
+PARSERS = {FORMAT_TEXT: _parse_text, FORMAT_NDJSON: _parse_ndjson}
+
+
+class TermImport:
+    """Validated terms of an import, fed to COPY as a file.
+
+    Blank lines and `#` comments are skipped. Sequences are assigned in the order of the
+    lines, from `sequence_start` by `sequence_step`.
+    """
+
+    def __init__(self, prefix_list, lines, fmt, sequence_start=5, sequence_step=5):
+        self.prefix_list = prefix_list
+        self.parse = PARSERS[fmt]
+        self.sequence_start = sequence_start
+        self.sequence_step = sequence_step
+        self.count = 0
+        self.errors = []
+        self._rows = self._generate(lines)
+        self._buffer = b""
+
+    def _generate(self, lines):
+        now = timezone.now().isoformat()
+        for line_number, raw_line in enumerate(lines, start=1):
+            line = raw_line.decode() if isinstance(raw_line, bytes) else raw_line
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+
+            try:
+                term = self.parse(line)
+                prefix = IPNetwork(term["prefix"])
+                # validators of the prefix field, run by full_clean() for single terms
+                prefix_validator(prefix)
+                PrefixListTerm.validate_prefix(
+                    prefix, term["ge"], term["le"], self.prefix_list.ip_version
+                )
+            except (ValueError, TypeError, AddrFormatError) as e:
+                self._error(line_number, str(e))
+            except ValidationError as e:
+                self._error(line_number, "; ".join(e.messages))
+
+            if self.errors:
+                # keep validating to report more errors, but stop loading
+                if len(self.errors) >= MAX_ERRORS:
+                    return
+                continue
+
+            sequence = self.sequence_start + self.count * self.sequence_step
+            self.count += 1
+            yield (
+                "\t".join(
+                    (
+                        str(self.prefix_list.pk),
+                        str(sequence),
+                        str(prefix),
+                        r"\N" if term["ge"] is None else str(term["ge"]),
+                        r"\N" if term["le"] is None else str(term["le"]),
+                        now,
+                        now,
+                    )
+                )
+                + "\n"
+            ).encode()
+
+    def _error(self, line_number, message):
+        self.errors.append({"line": line_number, "error": message})
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += row
+
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def copy(self):
+        """Load the terms with COPY, return the number of terms loaded.
+
+        When errors are found, some terms may have been loaded: the caller is expected to
+        roll back the transaction.
+        """
+        columns = ", ".join(PrefixListTerm._meta.get_field(name).column for name in COPY_COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {PrefixListTerm._meta.db_table} ({columns}) FROM STDIN",
+                self,
+            )
+        return self.count
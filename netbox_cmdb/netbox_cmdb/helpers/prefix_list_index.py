@@ -0,0 +1,91 @@
+"""In-memory index of the prefix list terms, to find the terms matching a route.
+
+Each process holds radix trees of all the terms, built on the first lookup. Term changes
+bump a version stored in the Django cache, shared by all processes, which rebuild their
+index on their next lookup. Bulk writes bypassing signals must call `invalidate()`.
+
+A rebuild is run by one thread at a time, the other threads of the process keep serving the
+previous trees meanwhile: lookups during a rebuild may miss the latest term changes.
+"""
+
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from netaddr import IPNetwork
+
+from netbox_cmdb.helpers.prefix_list_compression import term_range
+from netbox_cmdb.helpers.prefix_tree import MAX_PREFIX_LENGTHS, PrefixTree
+from netbox_cmdb.models.prefix_list import PrefixListTerm
+
+VERSION_CACHE_KEY = "netbox_cmdb.prefix_list_index.version"
+
+BUILD_CHUNK_SIZE = 10000
+
+
+def _bump_version():
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate():
+    """Mark the index of every process as outdated, once the current transaction commits."""
+    transaction.on_commit(_bump_version)
+
+
+class PrefixListIndex:
+    """Radix trees of the prefix list terms, one per IP version."""
+
+    def __init__(self):
+        self.version = None
+        self.trees = None
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_CACHE_KEY)
+        return version
+
+    def _build(self):
+        trees = {version: PrefixTree(version) for version in MAX_PREFIX_LENGTHS}
+        terms = PrefixListTerm.objects.values_list("pk", "prefix", "ge", "le").iterator(
+            chunk_size=BUILD_CHUNK_SIZE
+        )
+        for pk, prefix, ge, le in terms:
+            low, high = term_range(prefix.prefixlen, ge, le, MAX_PREFIX_LENGTHS[prefix.version])
+            trees[prefix.version].insert(int(prefix.network), prefix.prefixlen, (low, high, pk))
+        return trees
+
+    def get_trees(self):
+        """Return the radix trees, rebuilt first when terms changed since they were built.
+
+        Only the first build is waited for, the previous trees are returned while another
+        thread rebuilds them.
+        """
+        version = self._current_version()
+        if self.version != version and self._lock.acquire(blocking=self.trees is None):
+            try:
+                if self.version != version:
+                    # a change during the build bumps the version again: no change is missed
+                    trees = self._build()
+                    self.trees, self.version = trees, version
+            finally:
+                self._lock.release()
+        return self.trees
+
+    def match(self, route):
+        """Return the ids of the terms matching a route, given as a prefix."""
+        route = IPNetwork(route)
+        tree = self.get_trees()[route.version]
+        length = route.prefixlen
+        return [
+            pk
+            for _, _, values in tree.covering(int(route.network), length)
+            for low, high, pk in values
+            if low <= length <= high
+        ]
+
+
+index = PrefixListIndex()
@@ -0,0 +1,112 @@
+"""Radix tree of IP prefixes.
+
+A path-compressed binary trie (patricia tree): each node is a prefix holding values, and
+only prefixes with values or with two branches below them are stored. Looking up the
+prefixes covering a given one walks at most one node per prefix length.
+"""
+
+MAX_PREFIX_LENGTHS = {4: 32, 6: 128}
+
+
+class _Node:
+    __slots__ = ("key", "length", "values", "children")
+
+    def __init__(self, key, length):
+        self.key = key
+        self.length = length
+        self.values = None
+        self.children = [None, None]
+
+
+class PrefixTree:
+    """Values indexed by prefixes of one IP version, given as (network as int, length)."""
+
+    def __init__(self, version):
+        self.max_length = MAX_PREFIX_LENGTHS[version]
+        self.root = _Node(0, 0)
+        self.size = 0
+
+    def _mask(self, key, length):
+        return key & ~((1 << (self.max_length - length)) - 1)
+
+    def _bit(self, key, length):
+        """Return the bit of `key` following its first `length` bits."""
+        return (key >> (self.max_length - length - 1)) & 1
+
+    def insert(self, key, length, value):
+        """Add a value to a prefix."""
+        key = self._mask(key, length)
+        max_length = self.max_length
+        node = self.root
+        # the hot loop of tree building, helpers are inlined
+        while node.length != length:
+            bit = (key >> (max_length - node.length - 1)) & 1
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(key, length)
+                node = node.children[bit]
+                break
+
+            common = max_length - (child.key ^ key).bit_length()
+            if common >= child.length and length >= child.length:
+                node = child
+                continue
+
+            # the new prefix is an ancestor of the child, or they part ways below a new node
+            common = min(common, child.length, length)
+            parent = _Node(self._mask(key, common), common)
+            parent.children[self._bit(child.key, common)] = child
+            node.children[bit] = parent
+            node = parent
+            if common != length:
+                node = parent.children[self._bit(key, common)] = _Node(key, length)
+            break
+
+        if node.values is None:
+            node.values = []
+        node.values.append(value)
+        self.size += 1
+
+    def covering(self, key, length):
+        """Yield the (key, length, values) of the prefixes covering a prefix, itself included.
+
+        Prefixes are yielded from the shortest to the longest.
+        """
+        key = self._mask(key, length)
+        node = self.root
+        while node is not None and node.length <= length:
+            if self._mask(key, node.length) != node.key:
+                return
+            if node.values:
+                yield node.key, node.length, node.values
+            if node.length == length:
+                return
+            node = node.children[self._bit(key, node.length)]
+
+    def walk(self):
+        """Yield the (key, length, values, covering values) of all prefixes, in address order.
+
+        The covering values are the values of the shorter prefixes covering the prefix, from
+        the shortest to the longest.
+        """
+        stack = [(self.root, ())]
+        while stack:
+            node, covering = stack.pop()
+            if node.values:
+                yield node.key, node.length, node.values, covering
+                covering = covering + (node.values,)
+            stack.extend(
+                (child, covering) for child in reversed(node.children) if child is not None
+            )
+
+    def __iter__(self):
+        """Yield the (key, length, values) of all prefixes, in address order."""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.values:
+                yield node.key, node.length, node.values
+            stack.extend(child for child in reversed(node.children) if child is not None)
+
+    def __len__(self):
+        return self.size
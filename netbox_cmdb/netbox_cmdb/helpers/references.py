@@ -0,0 +1,225 @@
+"""Index of the CMDB objects referencing each device.
+
+The DeviceReference table answers "what does the CMDB hold for these devices" with a single
+indexed lookup instead of a scan of every CMDB table. It is kept up to date by the signals
+of the indexed models. Objects inserted with bulk_create are indexed by their creator with
+`index_created`; other writes bypassing signals (QuerySet.update, raw SQL) are caught up by
+the `cmdb_device_references` management command.
+"""
+
+from functools import lru_cache
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count
+
+# Indexed models with their paths to the device. Children objects (terms, AFI/SAFIs...) are
+# reachable through their parent and not indexed.
+DEVICE_REFERENCES = {
+    "netbox_cmdb.BGPGlobal": ("device",),
+    "netbox_cmdb.BGPPeerGroup": ("device",),
+    "netbox_cmdb.DeviceBGPSession": ("device",),
+    "netbox_cmdb.BGPSession": ("peer_a__device", "peer_b__device"),
+    "netbox_cmdb.RoutePolicy": ("device",),
+    "netbox_cmdb.PrefixList": ("device",),
+    "netbox_cmdb.BGPCommunityList": ("device",),
+    "netbox_cmdb.SNMP": ("device",),
+    "netbox_cmdb.Syslog": ("device",),
+    "netbox_cmdb.Tacacs": ("device",),
+    "netbox_cmdb.DeviceInterface": ("device",),
+    "netbox_cmdb.Link": ("interface_a__device", "interface_b__device"),
+}
+
+BATCH_SIZE = 1000
+
+
+def _reference_model(apps):
+    return apps.get_model("netbox_cmdb", "DeviceReference")
+
+
+def _object_type(apps, model):
+    return apps.get_model("contenttypes", "ContentType").objects.get_for_model(model)
+
+
+@lru_cache(maxsize=None)
+def get_dependents(model):
+    """Return the (indexed model, relation) pairs whose references go through `model`.
+
+    A DeviceBGPSession moved to another device moves the BGP sessions built on it: they
+    are found with `BGPSession.objects.filter(peer_a=...)`.
+    """
+    dependents = []
+    for label, paths in DEVICE_REFERENCES.items():
+        dependent = global_apps.get_model(label)
+        for path in paths:
+            relation, _, _ = path.rpartition("__")
+            if relation and dependent._meta.get_field(relation).related_model is model:
+                dependents.append((dependent, relation))
+    return dependents
+
+
+def _compute(queryset, paths):
+    """Return the ids and the (object_id, kind, device_id) references of a queryset objects."""
+    object_ids, wanted = set(), set()
+    for row in queryset.values_list("pk", *paths):
+        object_ids.add(row[0])
+        for i, path in enumerate(paths, start=1):
+            if row[i] is not None:
+                wanted.add((row[0], path, row[i]))
+    return object_ids, wanted
+
+
+def _apply(object_type, wanted, existing):
+    """Write the difference between the wanted and existing references, return if any."""
+    DeviceReference = _reference_model(global_apps)
+    stale = [pk for key, pk in existing.items() if key not in wanted]
+    missing = wanted - existing.keys()
+    if stale:
+        DeviceReference.objects.filter(pk__in=stale).delete()
+    if missing:
+        DeviceReference.objects.bulk_create(
+            DeviceReference(
+                object_type=object_type, object_id=object_id, kind=kind, device_id=device_id
+            )
+            for object_id, kind, device_id in missing
+        )
+    return bool(stale or missing)
+
+
+def _existing(object_type, object_ids):
+    return {
+        (object_id, kind, device_id): pk
+        for pk, object_id, kind, device_id in _reference_model(global_apps)
+        .objects.filter(object_type=object_type, object_id__in=object_ids)
+        .values_list("pk", "object_id", "kind", "device_id")
+    }
+
+
+def update_references(instance, created=False):
+    """Update the references of a saved object, return whether they changed.
+
+    References through a direct foreign key are read on the instance: the creation of such
+    an object costs a single insert, its update a single lookup when the device is kept.
+    """
+    model = type(instance)
+    paths = DEVICE_REFERENCES[model._meta.label]
+    object_type = _object_type(global_apps, model)
+
+    if all("__" not in path for path in paths):
+        wanted = set()
+        for path in paths:
+            device_id = getattr(instance, model._meta.get_field(path).attname)
+            if device_id is not None:
+                wanted.add((instance.pk, path, device_id))
+    else:
+        _, wanted = _compute(model.objects.filter(pk=instance.pk), paths)
+
+    existing = {} if created else _existing(object_type, [instance.pk])
+    return _apply(object_type, wanted, existing)
+
+
+def refresh_references(model, queryset):
+    """Recompute the references of the objects of a queryset of an indexed model."""
+    paths = DEVICE_REFERENCES[model._meta.label]
+    object_type = _object_type(global_apps, model)
+    object_ids, wanted = _compute(queryset, paths)
+    return _apply(object_type, wanted, _existing(object_type, object_ids))
+
+
+def index_created(model, objects):
+    """Index objects of an indexed model inserted with bulk_create, which sends no signal."""
+    object_ids = [obj.pk for obj in objects]
+    if not object_ids:
+        return False
+    return refresh_references(model, model.objects.filter(pk__in=object_ids))
+
+
+def forget_references(model, object_ids):
+    """Delete the references of deleted objects, for deletions bypassing signals."""
+    if model._meta.label not in DEVICE_REFERENCES or not object_ids:
+        return
+
+    _reference_model(global_apps).objects.filter(
+        object_type=_object_type(global_apps, model), object_id__in=object_ids
+    ).delete()
+
+
+def _source_references(apps):
+    """Yield the label, object type and references of each indexed model, from its table."""
+    for label, paths in DEVICE_REFERENCES.items():
+        model = apps.get_model(label)
+        _, wanted = _compute(model.objects.all(), paths)
+        yield label, _object_type(apps, model), wanted
+
+
+def verify(apps=global_apps):
+    """Compare the index with the CMDB tables, return the missing and stale references."""
+    DeviceReference = _reference_model(apps)
+    report = {}
+    for label, object_type, wanted in _source_references(apps):
+        indexed = set(
+            DeviceReference.objects.filter(object_type=object_type).values_list(
+                "object_id", "kind", "device_id"
+            )
+        )
+        report[label] = {
+            "missing": len(wanted - indexed),
+            "stale": len(indexed - wanted),
+        }
+    return report
+
+
+def rebuild(apps=global_apps):
+    """Rebuild the whole index from the CMDB tables, return the number of references."""
+    DeviceReference = _reference_model(apps)
+    count = 0
+    with transaction.atomic():
+        DeviceReference.objects.all().delete()
+        for _, object_type, wanted in _source_references(apps):
+            DeviceReference.objects.bulk_create(
+                (
+                    DeviceReference(
+                        object_type=object_type,
+                        object_id=object_id,
+                        kind=kind,
+                        device_id=device_id,
+                    )
+                    for object_id, kind, device_id in wanted
+                ),
+                batch_size=BATCH_SIZE,
+            )
+            count += len(wanted)
+    return count
+
+
+def get_device_references(devices, model=None):
+    """Return the references of devices, given as a list of ids, instances or a QuerySet."""
+    references = _reference_model(global_apps).objects.filter(device__in=devices)
+    if model is not None:
+        references = references.filter(object_type=_object_type(global_apps, model))
+    return references
+
+
+def get_referencing_ids(model, devices):
+    """Return the ids of the objects of `model` referencing devices, as a subquery."""
+    return get_device_references(devices, model).values("object_id")
+
+
+def count_device_objects(devices):
+    """Return the number of CMDB objects held for devices per model, in a single query.
+
+    An object referencing several of the devices, like a BGP session, is counted once.
+    """
+    ContentType = global_apps.get_model("contenttypes", "ContentType")
+    counts = (
+        get_device_references(devices)
+        .values_list("object_type")
+        .annotate(count=Count("object_id", distinct=True))
+        .order_by("object_type")
+    )
+    return {
+        ContentType.objects.get_for_id(object_type_id)
+        .model_class()
+        ._meta.verbose_name_plural: (count)
+        for object_type_id, count in counts
+    }
@@ -0,0 +1,156 @@
+"""Background jobs, run by NetBox RQ workers."""
+
+from dcim.models import Device, Site
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from extras.choices import JobResultStatusChoices
+from extras.context_managers import change_logging
+from extras.models import JobResult
+from utilities.utils import NetBoxFakeRequest
+
+from netbox_cmdb.helpers import cleaning
+
+
+def _cancel_requested(job_result, lock=False):
+    job_results = JobResult.objects.filter(pk=job_result.pk)
+    if lock:
+        job_results = job_results.select_for_update()
+    data = job_results.values_list("data", flat=True).first()
+    return bool(data and data.get("cancel_requested"))
+
+
+def _save_progress(job_result, status=None):
+    # the row is locked until the save, a cancellation requested meanwhile waits for it and is
+    # not overwritten
+    with transaction.atomic():
+        if _cancel_requested(job_result, lock=True):
+            job_result.data["cancel_requested"] = True
+        if status:
+            job_result.set_status(status)
+        job_result.save()
+
+
+def request_cancel(job_result):
+    """Flag a job for cancellation, return it updated, or None when it is already finished.
+
+    The row is locked like by `_save_progress`, so that neither write overwrites the other.
+    """
+    with transaction.atomic():
+        job_result = JobResult.objects.select_for_update().get(pk=job_result.pk)
+        if job_result.status in JobResultStatusChoices.TERMINAL_STATE_CHOICES:
+            return None
+        job_result.data = {**(job_result.data or {}), "cancel_requested": True}
+        job_result.save(update_fields=["data"])
+    return job_result
+
+
+def get_site_decommissioning_jobs():
+    """Return the site decommissioning jobs, named after their site."""
+    return JobResult.objects.filter(obj_type=ContentType.objects.get_for_model(Site))
+
+
+def get_site_decommissioning_in_progress(site):
+    """Return the pending or running decommissioning job of a site, None if there is none."""
+    return (
+        get_site_decommissioning_jobs()
+        .filter(
+            name=site.name,
+            status__in=[
+                JobResultStatusChoices.STATUS_PENDING,
+                JobResultStatusChoices.STATUS_RUNNING,
+            ],
+        )
+        .first()
+    )
+
+
+def enqueue_site_decommissioning(site, user, chunk_size):
+    """Queue the decommissioning of a site, return its JobResult."""
+    return JobResult.enqueue_job(
+        decommission_site,
+        site.name,
+        ContentType.objects.get_for_model(Site),
+        user,
+        site_id=site.pk,
+        chunk_size=chunk_size,
+    )
+
+
+def decommission_site(job_result, site_id, chunk_size, **kwargs):
+    """Delete the devices of a site chunk by chunk, then its topology.
+
+    Progress is saved in the job data after each chunk and a cancellation is checked
+    before the next one. Deleted devices are committed chunk by chunk, so a cancelled
+    or failed job can be resumed by queuing a new job for the same site.
+
+    Workers run outside of any request: like NetBox scripts, the job runs within a fake
+    request of its user for its deletions to be change logged, under the job id.
+    """
+    request = NetBoxFakeRequest(
+        {
+            "META": {},
+            "POST": {},
+            "GET": {},
+            "FILES": {},
+            "user": job_result.user,
+            "path": "",
+            "id": job_result.job_id,
+        }
+    )
+    with change_logging(request):
+        _decommission_site(job_result, site_id, chunk_size)
+
+
+def _decommission_site(job_result, site_id, chunk_size):
+    site = Site.objects.get(pk=site_id)
+    job_result.data = {
+        "site_id": site.pk,
+        "site": site.name,
+        "total_devices": Device.objects.filter(site=site).count(),
+        "deleted_devices": 0,
+        "failed": [],
+        "chunks": [],
+        "topology_cleaned": False,
+        "cancel_requested": False,
+    }
+    _save_progress(job_result, JobResultStatusChoices.STATUS_RUNNING)
+
+    failed_ids = set()
+    try:
+        while True:
+            if _cancel_requested(job_result):
+                job_result.data["message"] = "cancelled"
+                _save_progress(job_result, JobResultStatusChoices.STATUS_FAILED)
+                return
+
+            devices = list(
+                Device.objects.filter(site=site)
+                .exclude(id__in=failed_ids)
+                .order_by("pk")[:chunk_size]
+            )
+            if not devices:
+                break
+
+            for result in cleaning.decommission_devices(devices, chunk_size):
+                failed_names = {failure["device"] for failure in result["failed"]}
+                failed_ids.update(dev.id for dev in devices if dev.name in failed_names)
+                job_result.data["deleted_devices"] += len(result["deleted"])
+                job_result.data["failed"].extend(result["failed"])
+                job_result.data["chunks"].append(
+                    {"chunk": len(job_result.data["chunks"]) + 1, **result}
+                )
+            _save_progress(job_result)
+
+        if failed_ids:
+            job_result.data["message"] = f"{len(failed_ids)} devices could not be deleted"
+            _save_progress(job_result, JobResultStatusChoices.STATUS_FAILED)
+            return
+
+        with transaction.atomic():
+            cleaning.clean_site_topology(site)
+        job_result.data["topology_cleaned"] = True
+        job_result.data["message"] = f"site {site.name} has been deleted successfully"
+        _save_progress(job_result, JobResultStatusChoices.STATUS_COMPLETED)
+    except Exception as e:
+        job_result.data["message"] = str(e)
+        _save_progress(job_result, JobResultStatusChoices.STATUS_ERRORED)
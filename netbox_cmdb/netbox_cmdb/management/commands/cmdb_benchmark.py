@@ -0,0 +1,72 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from users.models import Token
+
+from netbox_cmdb.helpers import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure query count, wall time and peak memory of the CMDB API on a synthetic "
+        "fabric. Everything is created in a transaction rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--devices", type=int, default=20)
+        parser.add_argument("--sessions-per-device", type=int, default=10)
+        parser.add_argument("--policy-terms", type=int, default=10)
+        parser.add_argument("--prefix-list-terms", type=int, default=10)
+        parser.add_argument("--interfaces", type=int, default=10)
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Number of timed requests per operation"
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument(
+            "--compare", help="Print the query count changes against a previous report"
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(options["repeat"], 1)
+        with transaction.atomic():
+            fabric = benchmark.seed_fabric(
+                devices=options["devices"],
+                sessions_per_device=options["sessions_per_device"],
+                policy_terms=options["policy_terms"],
+                prefix_list_terms=options["prefix_list_terms"],
+                interfaces=options["interfaces"],
+                # creations need one fresh device per request, two for BGP sessions
+                spares=repeat + 2,
+            )
+            user = get_user_model().objects.create(
+                username=f"{benchmark.PREFIX}-user", is_superuser=True
+            )
+            token = Token.objects.create(user=user)
+
+            host = next((h for h in settings.ALLOWED_HOSTS if h != "*"), "testserver")
+            client = Client(HTTP_HOST=host.lstrip("."))
+            report = benchmark.run_benchmark(
+                client,
+                fabric,
+                repeat=repeat,
+                HTTP_AUTHORIZATION=f"Token {token.key}",
+                HTTP_ACCEPT="application/json",
+            )
+            transaction.set_rollback(True)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                previous = json.load(f)
+            for line in benchmark.compare(previous, report) or ["no query count change"]:
+                self.stderr.write(line)
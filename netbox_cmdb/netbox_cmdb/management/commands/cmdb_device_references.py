@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from netbox_cmdb.helpers import references
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify the index of the CMDB objects referencing devices against the CMDB tables, "
+        "or rebuild it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true", help="Rebuild the index instead of verifying it"
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            count = references.rebuild()
+            self.stdout.write(f"{count} device references indexed")
+            return
+
+        report = references.verify()
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+        if any(diff["missing"] or diff["stale"] for diff in report.values()):
+            raise CommandError("the device references index is out of date, run with --rebuild")
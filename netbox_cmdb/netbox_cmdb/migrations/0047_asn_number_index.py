@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netbox_cmdb', '0046_tacacsserver_tacacs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asn',
+            index=models.Index(fields=['number'], name='netbox_cmdb_asn_number_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Frozen copy of netbox_cmdb.helpers.references.DEVICE_REFERENCES at this migration
+DEVICE_REFERENCES = {
+    'BGPGlobal': ('device',),
+    'BGPPeerGroup': ('device',),
+    'DeviceBGPSession': ('device',),
+    'BGPSession': ('peer_a__device', 'peer_b__device'),
+    'RoutePolicy': ('device',),
+    'PrefixList': ('device',),
+    'BGPCommunityList': ('device',),
+    'SNMP': ('device',),
+    'Syslog': ('device',),
+    'Tacacs': ('device',),
+    'DeviceInterface': ('device',),
+    'Link': ('interface_a__device', 'interface_b__device'),
+}
+
+
+def build_device_references(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    DeviceReference = apps.get_model('netbox_cmdb', 'DeviceReference')
+    for model_name, paths in DEVICE_REFERENCES.items():
+        model = apps.get_model('netbox_cmdb', model_name)
+        object_type, _ = ContentType.objects.get_or_create(
+            app_label='netbox_cmdb', model=model._meta.model_name
+        )
+        DeviceReference.objects.bulk_create(
+            (
+                DeviceReference(
+                    object_type=object_type, object_id=row[0], kind=path, device_id=row[i]
+                )
+                for row in model.objects.values_list('pk', *paths).iterator()
+                for i, path in enumerate(paths, start=1)
+                if row[i] is not None
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('dcim', '0161_cabling_cleanup'),
+        ('netbox_cmdb', '0047_asn_number_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('kind', models.CharField(max_length=100)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dcim.device')),
+                ('object_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='devicereference',
+            index=models.Index(fields=['device', 'object_type'], name='netbox_cmdb_devref_device_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='devicereference',
+            constraint=models.UniqueConstraint(fields=('object_type', 'object_id', 'kind'), name='netbox_cmdb_devicereference_unique_object'),
+        ),
+        migrations.RunPython(build_device_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netbox_cmdb', '0048_devicereference'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='devicebgpsession',
+            index=models.Index(fields=['device', 'id'], name='netbox_cmdb_dbgps_device_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bgpsession',
+            index=models.Index(fields=['peer_a', 'id'], name='netbox_cmdb_bgps_peer_a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bgpsession',
+            index=models.Index(fields=['peer_b', 'id'], name='netbox_cmdb_bgps_peer_b_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_endpoints(apps, schema_editor):
+    BGPSession = apps.get_model('netbox_cmdb', 'BGPSession')
+    sessions = []
+    for pk, *peers in BGPSession.objects.values_list(
+        'pk',
+        'peer_a__device',
+        'peer_a__local_address',
+        'peer_b__device',
+        'peer_b__local_address',
+    ).iterator():
+        (low_device, low_address), (high_device, high_address) = sorted(
+            [tuple(peers[:2]), tuple(peers[2:])]
+        )
+        sessions.append(
+            BGPSession(
+                pk=pk,
+                low_device_id=low_device,
+                high_device_id=high_device,
+                low_address_id=low_address,
+                high_address_id=high_address,
+            )
+        )
+    BGPSession.objects.bulk_update(
+        sessions,
+        ['low_device', 'high_device', 'low_address', 'high_address'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dcim', '0161_cabling_cleanup'),
+        ('ipam', '0060_alter_l2vpn_slug'),
+        ('netbox_cmdb', '0049_bgpsession_peer_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bgpsession',
+            name='low_device',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dcim.device'),
+        ),
+        migrations.AddField(
+            model_name='bgpsession',
+            name='high_device',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dcim.device'),
+        ),
+        migrations.AddField(
+            model_name='bgpsession',
+            name='low_address',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='ipam.ipaddress'),
+        ),
+        migrations.AddField(
+            model_name='bgpsession',
+            name='high_address',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='ipam.ipaddress'),
+        ),
+        migrations.RunPython(set_endpoints, migrations.RunPython.noop),
+    ]
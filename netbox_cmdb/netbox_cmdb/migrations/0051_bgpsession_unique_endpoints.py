@@ -0,0 +1,57 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.constraints
+import django.db.models.deletion
+
+
+def check_duplicate_sessions(apps, schema_editor):
+    BGPSession = apps.get_model('netbox_cmdb', 'BGPSession')
+    sessions = defaultdict(list)
+    for pk, *endpoints in BGPSession.objects.values_list(
+        'pk', 'low_device', 'high_device', 'low_address', 'high_address'
+    ).order_by('pk').iterator():
+        sessions[tuple(endpoints)].append(pk)
+
+    duplicates = [pks for pks in sessions.values() if len(pks) > 1]
+    if duplicates:
+        raise RuntimeError(
+            'BGP sessions between the same devices and addresses must be deleted or merged '
+            'before sessions are made unique, duplicate session ids: '
+            + '; '.join(', '.join(str(pk) for pk in pks) for pks in duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netbox_cmdb', '0050_bgpsession_endpoints'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_sessions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bgpsession',
+            name='low_device',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dcim.device'),
+        ),
+        migrations.AlterField(
+            model_name='bgpsession',
+            name='high_device',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dcim.device'),
+        ),
+        migrations.AlterField(
+            model_name='bgpsession',
+            name='low_address',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='ipam.ipaddress'),
+        ),
+        migrations.AlterField(
+            model_name='bgpsession',
+            name='high_address',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='ipam.ipaddress'),
+        ),
+        migrations.AddConstraint(
+            model_name='bgpsession',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('low_device', 'high_device', 'low_address', 'high_address'), name='netbox_cmdb_bgpsession_unique_endpoints'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dcim', '0161_cabling_cleanup'),
+        ('netbox_cmdb', '0051_bgpsession_unique_endpoints'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='asn',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['organization_name'], name='netbox_cmdb_asn_org_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='bgppeergroup',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='netbox_cmdb_bgppg_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='devicebgpsession',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['description'], name='netbox_cmdb_dbgps_descr_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='deviceinterface',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='netbox_cmdb_devif_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='logicalinterface',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['description'], name='netbox_cmdb_logif_descr_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='routepolicy',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='netbox_cmdb_rp_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        # every search goes through the name of the devices, a NetBox table
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS netbox_cmdb_device_name_trgm ON dcim_device USING gin (name gin_trgm_ops)',
+            'DROP INDEX IF EXISTS netbox_cmdb_device_name_trgm',
+        ),
+    ]
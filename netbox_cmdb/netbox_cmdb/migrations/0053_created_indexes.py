@@ -0,0 +1,123 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netbox_cmdb', '0052_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='afisafi',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_afisafi_created'),
+        ),
+        migrations.AddIndex(
+            model_name='aggregate',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_aggregate_created'),
+        ),
+        migrations.AddIndex(
+            model_name='asn',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_asn_created'),
+        ),
+        migrations.AddIndex(
+            model_name='bgpcommunitylist',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_bgpcl_created'),
+        ),
+        migrations.AddIndex(
+            model_name='bgpcommunitylistterm',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_bgpclt_created'),
+        ),
+        migrations.AddIndex(
+            model_name='bgpglobal',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_bgpg_created'),
+        ),
+        migrations.AddIndex(
+            model_name='bgppeergroup',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_bgppg_created'),
+        ),
+        migrations.AddIndex(
+            model_name='bgpsession',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_bgps_created'),
+        ),
+        migrations.AddIndex(
+            model_name='circuit',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_circuit_created'),
+        ),
+        migrations.AddIndex(
+            model_name='devicebgpsession',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_dbgps_created'),
+        ),
+        migrations.AddIndex(
+            model_name='deviceinterface',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_devif_created'),
+        ),
+        migrations.AddIndex(
+            model_name='globalafisafi',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_gafisafi_created'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_link_created'),
+        ),
+        migrations.AddIndex(
+            model_name='logicalinterface',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_logif_created'),
+        ),
+        migrations.AddIndex(
+            model_name='portlayout',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_portlayout_created'),
+        ),
+        migrations.AddIndex(
+            model_name='prefixlist',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_pl_created'),
+        ),
+        migrations.AddIndex(
+            model_name='prefixlistterm',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_plt_created'),
+        ),
+        migrations.AddIndex(
+            model_name='redistributednetwork',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_rednet_created'),
+        ),
+        migrations.AddIndex(
+            model_name='routepolicy',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_rp_created'),
+        ),
+        migrations.AddIndex(
+            model_name='routepolicyterm',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_rpt_created'),
+        ),
+        migrations.AddIndex(
+            model_name='snmp',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_snmp_created'),
+        ),
+        migrations.AddIndex(
+            model_name='snmpcommunity',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_snmpcomm_created'),
+        ),
+        migrations.AddIndex(
+            model_name='syslog',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_syslog_created'),
+        ),
+        migrations.AddIndex(
+            model_name='syslogserver',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_syslogsrv_created'),
+        ),
+        migrations.AddIndex(
+            model_name='tacacs',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_tacacs_created'),
+        ),
+        migrations.AddIndex(
+            model_name='tacacsserver',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_tacacssrv_created'),
+        ),
+        migrations.AddIndex(
+            model_name='vlan',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_vlan_created'),
+        ),
+        migrations.AddIndex(
+            model_name='vrf',
+            index=models.Index(fields=['created', 'id'], name='netbox_cmdb_vrf_created'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netbox_cmdb', '0053_created_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asn',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.comparison.Cast('number', output_field=models.TextField()), name='gin_trgm_ops'), name='netbox_cmdb_asn_number_trgm'),
+        ),
+    ]
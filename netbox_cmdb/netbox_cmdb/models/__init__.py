@@ -1,6 +1,7 @@
 from netbox_cmdb.models.bgp import *
 from netbox_cmdb.models.bgp_community_list import *
 from netbox_cmdb.models.circuit import *
+from netbox_cmdb.models.device_reference import *
 from netbox_cmdb.models.interface import *
 from netbox_cmdb.models.prefix_list import *
 from netbox_cmdb.models.route_policy import *
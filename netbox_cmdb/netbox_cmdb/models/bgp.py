@@ -1,8 +1,9 @@
 from dcim.models.devices import Device
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import Q
+from django.db import connection, models
+from django.db.models.functions import Cast
 from django.urls import reverse
 from ipam.fields import IPNetworkField
 from netbox.models import ChangeLoggedModel
@@ -55,6 +56,9 @@ class BGPGlobal(ChangeLoggedModel):
 
     class Meta:
         verbose_name = "BGP global configuration"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_bgpg_created"),
+        ]
 
 
 class AfiSafiChoices(ChoiceSet):
@@ -93,6 +97,9 @@ class GlobalAfiSafi(ChangeLoggedModel):
 
     class Meta:
         unique_together = ("bgp_global", "afi_safi_name")
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_gafisafi_created"),
+        ]
 
 
 class Aggregate(ChangeLoggedModel):
@@ -107,6 +114,9 @@ class Aggregate(ChangeLoggedModel):
 
     class Meta:
         unique_together = ("global_afi_safi", "prefix")
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_aggregate_created"),
+        ]
 
 
 class RedistributedNetwork(ChangeLoggedModel):
@@ -121,6 +131,9 @@ class RedistributedNetwork(ChangeLoggedModel):
 
     class Meta:
         unique_together = ("global_afi_safi", "prefix")
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_rednet_created"),
+        ]
 
 
 class AfiSafi(ChangeLoggedModel):
@@ -185,6 +198,9 @@ class AfiSafi(ChangeLoggedModel):
 
     class Meta:
         unique_together = ("device_bgp_session", "afi_safi_name")
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_afisafi_created"),
+        ]
 
 
 class ASN(ChangeLoggedModel):
@@ -206,18 +222,66 @@ class ASN(ChangeLoggedModel):
 
     class Meta:
         verbose_name_plural = "AS Numbers"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_asn_created"),
+            models.Index(fields=["number"], name="netbox_cmdb_asn_number_idx"),
+            # trigram indexes serve the substring searches of the `q` filters
+            GinIndex(
+                fields=["organization_name"],
+                name="netbox_cmdb_asn_org_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                OpClass(Cast("number", output_field=models.TextField()), name="gin_trgm_ops"),
+                name="netbox_cmdb_asn_number_trgm",
+            ),
+        ]
 
     def get_absolute_url(self):
         return reverse("plugins:netbox_cmdb:asn", args=[self.pk])
 
-    def get_available_asns(self, min_asn, max_asn):
+    def get_available_asn_ranges(self, min_asn, max_asn):
         """
-        Return all available ASNs in a given range.
+        Return the (first, last) ranges of available ASNs in a given range, in ascending order.
+
+        Gaps between allocated numbers are computed by the database with a window function,
+        so the cost depends on the number of ASNs allocated in the range, not on its size.
+        """
+        query = f"""
+            WITH bounds AS (
+                SELECT %(min_asn)s - 1 AS number
+                UNION
+                SELECT number FROM {self._meta.db_table}
+                WHERE number BETWEEN %(min_asn)s AND %(max_asn)s
+                UNION
+                SELECT %(max_asn)s + 1
+            ), gaps AS (
+                SELECT
+                    number + 1 AS gap_start,
+                    LEAD(number) OVER (ORDER BY number) - 1 AS gap_end
+                FROM bounds
+            )
+            SELECT gap_start, gap_end FROM gaps WHERE gap_end >= gap_start ORDER BY gap_start
+        """  # noqa: S608 (the table name is not user input)
+        with connection.cursor() as cursor:
+            cursor.execute(query, {"min_asn": min_asn, "max_asn": max_asn})
+            return cursor.fetchall()
+
+    def get_available_asns(self, min_asn, max_asn, limit):
         """
-        available_asns = set(range(min_asn, max_asn + 1))
-        available_asns -= set(self.__class__.objects.all().values_list("number", flat=True))
+        Return at most `limit` available ASNs in a given range, in ascending order.
+
+        A range can hold billions of ASNs, callers must ask for the number of ASNs they need.
+        """
+        available_asns = []
+        for first, last in self.get_available_asn_ranges(min_asn, max_asn):
+            available_asns.extend(
+                range(first, min(last, first + limit - len(available_asns) - 1) + 1)
+            )
+            if len(available_asns) >= limit:
+                break
 
-        return sorted(available_asns)
+        return available_asns
 
 
 class BGPSessionCommon(ChangeLoggedModel):
@@ -280,6 +344,12 @@ class BGPPeerGroup(BGPSessionCommon):
     class Meta:
         verbose_name_plural = "BGP Peer Groups"
         unique_together = ("device", "name")
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_bgppg_created"),
+            GinIndex(
+                fields=["name"], name="netbox_cmdb_bgppg_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ]
 
     def get_absolute_url(self):
         return reverse("plugins:netbox_cmdb:bgppeergroup", args=[self.pk])
@@ -357,6 +427,48 @@ class DeviceBGPSession(BGPSessionCommon):
 
     class Meta:
         verbose_name_plural = "Device BGP Sessions"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_dbgps_created"),
+            # the peers of devices are searched by session filters, without reading the table
+            models.Index(fields=["device", "id"], name="netbox_cmdb_dbgps_device_idx"),
+            GinIndex(
+                fields=["description"],
+                name="netbox_cmdb_dbgps_descr_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
+
+# Endpoint columns of BGPSession, in the order of its unique constraint
+ENDPOINT_FIELDS = ["low_device", "high_device", "low_address", "high_address"]
+
+
+def session_endpoints(peer_a, peer_b):
+    """Return the endpoint columns of a session between 2 (device id, address id) peers.
+
+    Peers are sorted, so that a session has the same endpoints whatever their orientation.
+    """
+    low, high = sorted([peer_a, peer_b])
+    return {
+        "low_device_id": low[0],
+        "high_device_id": high[0],
+        "low_address_id": low[1],
+        "high_address_id": high[1],
+    }
+
+
+class BGPSessionQuerySet(RestrictedQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # save() is not called: the endpoints are set from the peers here
+        objs = list(objs)
+        for obj in objs:
+            obj.set_endpoints()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def between(self, device_a, device_b):
+        """Return the sessions between 2 devices, given as instances or ids."""
+        device_ids = sorted(getattr(device, "pk", device) for device in (device_a, device_b))
+        return self.filter(low_device=device_ids[0], high_device=device_ids[1])
 
 
 class BGPSession(ChangeLoggedModel):
@@ -393,25 +505,59 @@ class BGPSession(ChangeLoggedModel):
     )
     tenant = models.ForeignKey(to="tenancy.Tenant", on_delete=models.PROTECT, blank=True, null=True)
 
+    # Devices and local addresses of the peers, sorted by (device, address): denormalized from
+    # the peers on save, so that the sessions of a device pair are found with a single index.
+    low_device = models.ForeignKey(
+        to="dcim.Device", on_delete=models.CASCADE, related_name="+", editable=False
+    )
+    high_device = models.ForeignKey(
+        to="dcim.Device", on_delete=models.CASCADE, related_name="+", editable=False
+    )
+    low_address = models.ForeignKey(
+        to="ipam.IPAddress", on_delete=models.PROTECT, related_name="+", editable=False
+    )
+    high_address = models.ForeignKey(
+        to="ipam.IPAddress", on_delete=models.PROTECT, related_name="+", editable=False
+    )
+
+    objects = BGPSessionQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "BGP Sessions"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_bgps_created"),
+            # the sessions of peers are searched by filters, one side at a time
+            models.Index(fields=["peer_a", "id"], name="netbox_cmdb_bgps_peer_a_idx"),
+            models.Index(fields=["peer_b", "id"], name="netbox_cmdb_bgps_peer_b_idx"),
+        ]
+        constraints = [
+            # one session per device/IP pair; checked at commit, as updating the peers of a
+            # session one at a time goes through intermediate endpoints
+            models.UniqueConstraint(
+                fields=ENDPOINT_FIELDS,
+                name="netbox_cmdb_bgpsession_unique_endpoints",
+                deferrable=models.Deferrable.DEFERRED,
+            ),
+        ]
+
+    def get_endpoints(self):
+        """Return the endpoint columns computed from the peers."""
+        return session_endpoints(
+            (self.peer_a.device_id, self.peer_a.local_address_id),
+            (self.peer_b.device_id, self.peer_b.local_address_id),
+        )
+
+    def set_endpoints(self):
+        for field, value in self.get_endpoints().items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        self.set_endpoints()
+        super().save(*args, **kwargs)
 
     def validate_unique(self, exclude=None):
         # Check for a duplicate BGP session (same devices / ips).
-        if BGPSession.objects.exclude(pk=self.pk).filter(
-            Q(
-                peer_a__device__name=self.peer_a.device.name,
-                peer_a__local_address=self.peer_a.local_address,
-                peer_b__device__name=self.peer_b.device.name,
-                peer_b__local_address=self.peer_b.local_address,
-            )
-            | Q(
-                peer_a__device__name=self.peer_b.device.name,
-                peer_a__local_address=self.peer_b.local_address,
-                peer_b__device__name=self.peer_a.device.name,
-                peer_b__local_address=self.peer_a.local_address,
-            )
-        ):
+        if BGPSession.objects.exclude(pk=self.pk).filter(**self.get_endpoints()).exists():
             raise ValidationError(
                 {
                     "peer_a": "A BGP session already exists between these 2 devices and IPs.",
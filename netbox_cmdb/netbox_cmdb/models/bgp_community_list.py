@@ -23,6 +23,9 @@ class BGPCommunityList(ChangeLoggedModel):
     class Meta:
         unique_together = ("name", "device")
         verbose_name_plural = "BGP community lists"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_bgpcl_created"),
+        ]
 
 
 class BGPCommunityListTerm(ChangeLoggedModel):
@@ -41,3 +44,6 @@ class BGPCommunityListTerm(ChangeLoggedModel):
         unique_together = ("bgp_community_list", "sequence")
         verbose_name_plural = "BGP community list terms"
         ordering = ["sequence"]
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_bgpclt_created"),
+        ]
@@ -6,3 +6,8 @@ class Circuit(ChangeLoggedModel):
     """Simple circuits."""
 
     name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_circuit_created"),
+        ]
@@ -0,0 +1,31 @@
+"""Index of the CMDB objects referencing devices."""
+
+from django.db import models
+
+
+class DeviceReference(models.Model):
+    """A CMDB object referencing a device, maintained by signals.
+
+    `kind` is the path from the object to the device, e.g. "device" or "peer_a__device".
+    """
+
+    device = models.ForeignKey(to="dcim.Device", on_delete=models.CASCADE, related_name="+")
+    object_type = models.ForeignKey(
+        to="contenttypes.ContentType", on_delete=models.CASCADE, related_name="+"
+    )
+    object_id = models.PositiveBigIntegerField()
+    kind = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["object_type", "object_id", "kind"],
+                name="netbox_cmdb_devicereference_unique_object",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["device", "object_type"], name="netbox_cmdb_devref_device_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.object_type.model} {self.object_id} --{self.kind}--> {self.device_id}"
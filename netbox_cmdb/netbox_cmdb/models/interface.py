@@ -1,3 +1,4 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.urls import reverse
@@ -78,6 +79,12 @@ class DeviceInterface(ChangeLoggedModel):
 
     class Meta:
         unique_together = ("device", "name")
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_devif_created"),
+            GinIndex(
+                fields=["name"], name="netbox_cmdb_devif_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ]
 
 
 @protect.from_ip_address_change("ipv4_address", "ipv6_address")
@@ -185,6 +192,14 @@ class LogicalInterface(ChangeLoggedModel):
 
     class Meta:
         unique_together = ("index", "parent_interface")
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_logif_created"),
+            GinIndex(
+                fields=["description"],
+                name="netbox_cmdb_logif_descr_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
 
 class Link(ChangeLoggedModel):
@@ -225,6 +240,11 @@ class Link(ChangeLoggedModel):
     def get_absolute_url(self):
         return reverse("plugins:netbox_cmdb:link", args=[self.pk])
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_link_created"),
+        ]
+
 
 class PortLayout(ChangeLoggedModel):
     """A port layout configuration on a Network device."""
@@ -272,3 +292,8 @@ class PortLayout(ChangeLoggedModel):
 
     def get_absolute_url(self):
         return reverse("plugins:netbox_cmdb:portlayout", args=[self.pk])
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_portlayout_created"),
+        ]
@@ -45,6 +45,9 @@ class PrefixList(ChangeLoggedModel):
 
     class Meta:
         unique_together = ("name", "device")
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_pl_created"),
+        ]
 
 
 class PrefixListTerm(ChangeLoggedModel):
@@ -67,42 +70,43 @@ class PrefixListTerm(ChangeLoggedModel):
             return False
         return True
 
-    def clean(self):
-        super().clean()
+    @classmethod
+    def validate_prefix(cls, prefix, ge, le, ip_version):
+        """Validate a term of a prefix list of the given IP version, without any query."""
+        prefix_mask_len = prefix.netmask.netmask_bits()
 
-        prefix_mask_len = self.prefix.netmask.netmask_bits()
-
-        if self.prefix_list.ip_version == PrefixListIPVersionChoices.IPV4:
+        if ip_version == PrefixListIPVersionChoices.IPV4:
             max_prefix_len = 32
-            ip_version = 4
+            version = 4
         else:
             max_prefix_len = 128
-            ip_version = 6
+            version = 6
 
         # we ensure that the IP prefix matches the version of the parent prefix list.
-        if self.prefix.version != ip_version:
+        if prefix.version != version:
             raise ValidationError(
                 "Invalid IP prefix, IP version mismatch: IPv{} instead of IPv{}".format(
-                    self.prefix.version, ip_version
+                    prefix.version, version
                 )
             )
 
         # ge can't be lower than the prefix netmask, and greater than the IP version maximum prefix length.
-        if self.ge and not self._is_mask_len_operator_valid(
-            self.ge, prefix_mask_len, max_prefix_len
-        ):
+        if ge and not cls._is_mask_len_operator_valid(ge, prefix_mask_len, max_prefix_len):
             raise ValidationError("Invalid ge value")
 
         # le can't be lower than the prefix netmask, and greater than the IP version maximum prefix length.
-        if self.le and not self._is_mask_len_operator_valid(
-            self.le, prefix_mask_len, max_prefix_len
-        ):
+        if le and not cls._is_mask_len_operator_valid(le, prefix_mask_len, max_prefix_len):
             raise ValidationError("Invalid le value")
 
         # le must be a value lower than ge
-        if self.le and self.ge and self.le < self.ge:
+        if le and ge and le < ge:
             raise ValidationError("Invalid values for le and ge, le should be lower than ge")
 
+    def clean(self):
+        super().clean()
+
+        self.validate_prefix(self.prefix, self.ge, self.le, self.prefix_list.ip_version)
+
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
@@ -110,3 +114,6 @@ class PrefixListTerm(ChangeLoggedModel):
     class Meta:
         unique_together = ("prefix_list", "sequence")
         ordering = ["sequence"]
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_plt_created"),
+        ]
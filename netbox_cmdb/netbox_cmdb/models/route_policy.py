@@ -1,3 +1,4 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.urls import reverse
@@ -40,6 +41,10 @@ class RoutePolicy(ChangeLoggedModel):
     class Meta:
         verbose_name_plural = "Route Policies"
         unique_together = ["device", "name"]
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_rp_created"),
+            GinIndex(fields=["name"], name="netbox_cmdb_rp_name_trgm", opclasses=["gin_trgm_ops"]),
+        ]
 
 
 class RoutePolicyTerm(ChangeLoggedModel):
@@ -137,3 +142,6 @@ class RoutePolicyTerm(ChangeLoggedModel):
         unique_together = ("route_policy", "sequence")
         verbose_name_plural = "Route Policy terms"
         ordering = ["sequence"]
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_rpt_created"),
+        ]
@@ -22,6 +22,9 @@ class SNMPCommunity(ChangeLoggedModel):
 
     class Meta:
         verbose_name_plural = "SNMP Communities"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_snmpcomm_created"),
+        ]
 
 
 @protect.from_device_name_change("device")
@@ -42,6 +45,9 @@ class SNMP(ChangeLoggedModel):
 
     class Meta:
         verbose_name_plural = "SNMP"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_snmp_created"),
+        ]
 
     def __str__(self):
         return f"{self.device.name}-SNMP"
@@ -11,6 +11,9 @@ class SyslogServer(ChangeLoggedModel):
 
     class Meta:
         verbose_name_plural = "Syslog Servers"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_syslogsrv_created"),
+        ]
 
     def __str__(self):
         return f"{self.server_address}"
@@ -34,6 +37,9 @@ class Syslog(ChangeLoggedModel):
 
     class Meta:
         verbose_name_plural = "Syslog"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_syslog_created"),
+        ]
 
     def __str__(self):
         return f"{self.device.name}-Syslog"
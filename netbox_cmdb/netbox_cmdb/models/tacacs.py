@@ -28,6 +28,9 @@ class TacacsServer(ChangeLoggedModel):
 
     class Meta:
         verbose_name_plural = "Tacacs Servers"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_tacacssrv_created"),
+        ]
 
     def __str__(self):
         return f"{self.server_address} (prio {self.priority}, port {self.tcp_port})"
@@ -56,6 +59,9 @@ class Tacacs(ChangeLoggedModel):
 
     class Meta:
         verbose_name_plural = "Tacacs"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_tacacs_created"),
+        ]
 
     def clean(self):
         """Validate the passkey for every ModelForm based surface (plugin UI and Django admin).
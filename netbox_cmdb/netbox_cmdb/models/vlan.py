@@ -34,3 +34,6 @@ class VLAN(ChangeLoggedModel):
         unique_together = ("vid", "name")
         verbose_name = "VLAN"
         verbose_name_plural = "VLANs"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_vlan_created"),
+        ]
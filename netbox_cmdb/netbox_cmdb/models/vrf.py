@@ -27,3 +27,6 @@ class VRF(ChangeLoggedModel):
         unique_together = ("tenant", "name")
         verbose_name = "VRF"
         verbose_name_plural = "VRFs"
+        indexes = [
+            models.Index(fields=["created", "id"], name="netbox_cmdb_vrf_created"),
+        ]
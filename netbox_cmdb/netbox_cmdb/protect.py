@@ -1,3 +1,6 @@
+from django.db import models
+from django.db.models import CharField, Value
+
 MODELS_LINKED_TO_DEVICE = {}
 MODELS_LINKED_TO_IP_ADDRESS = {}
 
@@ -42,3 +45,27 @@ def from_ip_address_change(*fields):
         return cls
 
     return decorator
+
+
+def find_linked_models(models_linked, instances):
+    """Return the models of `models_linked` holding a reference to one of `instances`.
+
+    `instances` is a model instance, a list of instances or a QuerySet. All (model, field)
+    pairs are checked in a single UNION query, each part stopping at the first matching row.
+    """
+    if isinstance(instances, models.Model):
+        instances = [instances]
+
+    querysets = [
+        model.objects.filter(**{f"{field}__in": instances})
+        .order_by()
+        .annotate(linked_model=Value(model._meta.label, output_field=CharField()))
+        .values_list("linked_model", flat=True)[:1]
+        for model, fields in models_linked.items()
+        for field in sorted(fields)
+    ]
+    if not querysets:
+        return []
+
+    labels = set(querysets[0].union(*querysets[1:], all=True))
+    return [model for model in models_linked if model._meta.label in labels]
@@ -1,11 +1,14 @@
 from dcim.models import Device
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_delete, pre_save
+from django.db.models import Q, QuerySet
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 from ipam.models import IPAddress
 
 from netbox_cmdb import protect
-from netbox_cmdb.models.bgp import BGPSession
+from netbox_cmdb.helpers import prefix_list_index, references
+from netbox_cmdb.models.bgp import ENDPOINT_FIELDS, BGPSession, DeviceBGPSession
+from netbox_cmdb.models.prefix_list import PrefixListTerm
 
 
 @receiver(post_delete, sender=BGPSession)
@@ -19,6 +22,33 @@ def clean_device_bgp_sessions(sender, instance, **kwargs):
         b.delete()
 
 
+@receiver(post_save, sender=DeviceBGPSession)
+def update_bgp_session_endpoints(sender, instance, created=False, raw=False, **kwargs):
+    """Keep the endpoints of the BGP sessions of a peer in line with its device and address."""
+    if created or raw:
+        return
+
+    # the sessions whose endpoints still match the peer, the usual case, are not loaded
+    sessions = list(
+        BGPSession.objects.filter(Q(peer_a=instance) | Q(peer_b=instance))
+        .exclude(low_device=instance.device_id, low_address=instance.local_address_id)
+        .exclude(high_device=instance.device_id, high_address=instance.local_address_id)
+        .select_related("peer_a", "peer_b")
+    )
+    for session in sessions:
+        session.set_endpoints()
+    BGPSession.objects.bulk_update(sessions, ENDPOINT_FIELDS)
+
+
+@receiver(post_init, sender=Device)
+@receiver(post_save, sender=Device)
+def track_device_name(sender, instance, **kwargs):
+    """Remember the name of a Device as stored in database, to detect renames without a query."""
+    # a deferred name is not loaded, it will be fetched when needed
+    if "name" in instance.__dict__:
+        instance._cmdb_stored_name = instance.name
+
+
 @receiver(pre_save, sender=Device)
 def protect_from_device_name_change(sender, instance, **kwargs):
     """Prevents any name changes for dcim.Device if there is a CMDB object linked to it.
@@ -31,21 +61,36 @@ def protect_from_device_name_change(sender, instance, **kwargs):
     if not instance.pk:
         return
 
-    current = Device.objects.get(pk=instance.pk)
+    if hasattr(instance, "_cmdb_stored_name"):
+        stored_name = instance._cmdb_stored_name
+    else:
+        stored_name = Device.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
 
-    if current.name == instance.name:
+    if stored_name == instance.name:
         return
 
-    for model, fields in protect.MODELS_LINKED_TO_DEVICE.items():
-        if not fields:
-            continue
+    linked_models = protect.find_linked_models(protect.MODELS_LINKED_TO_DEVICE, instance)
+    if linked_models:
+        raise ValidationError(
+            f"Device name cannot be changed because it is linked to: {linked_models[0]}."
+        )
+
 
-        for field in fields:
-            filter = {field: instance}
-            if model.objects.filter(**filter).exists():
-                raise ValidationError(
-                    f"Device name cannot be changed because it is linked to: {model}."
-                )
+@receiver(post_init, sender=IPAddress)
+@receiver(post_save, sender=IPAddress)
+def track_ip_address(sender, instance, **kwargs):
+    """Remember the IP of an IPAddress as stored in database, to detect changes without a query."""
+    # a deferred address is not loaded, it will be fetched when needed
+    if "address" in instance.__dict__ and instance.address is not None:
+        instance._cmdb_stored_ip = instance.address.ip
+
+
+def _ip_address_changed(instance):
+    if hasattr(instance, "_cmdb_stored_ip"):
+        return instance._cmdb_stored_ip != instance.address.ip
+
+    stored = IPAddress.objects.filter(pk=instance.pk).values_list("address", flat=True).first()
+    return stored is None or stored.ip != instance.address.ip
 
 
 @receiver(pre_save, sender=IPAddress)
@@ -59,18 +104,60 @@ def protect_from_ip_address_change(sender, instance, **kwargs):
     if not instance.pk:
         return
 
-    current = IPAddress.objects.get(pk=instance.pk)
+    # status, description... edits cost no query
+    if not _ip_address_changed(instance):
+        return
+
+    _protect_linked_ip_addresses([instance])
+
 
-    if current.address.ip == instance.address.ip:
+def check_ip_address_changes(ip_addresses):
+    """Prevent the address change of IP addresses linked to the CMDB, in a single query.
+
+    This is the bulk counterpart of protect_from_ip_address_change, for QuerySet.update()
+    and bulk_update() which send no pre_save signal: pass the QuerySet about to be updated
+    with a new address, or the instances about to be saved with bulk_update(), in which case
+    only the ones whose address changed are checked.
+    """
+    if not isinstance(ip_addresses, QuerySet):
+        ip_addresses = [ip for ip in ip_addresses if ip.pk and _ip_address_changed(ip)]
+        if not ip_addresses:
+            return
+
+    _protect_linked_ip_addresses(ip_addresses)
+
+
+def _protect_linked_ip_addresses(ip_addresses):
+    linked_models = protect.find_linked_models(protect.MODELS_LINKED_TO_IP_ADDRESS, ip_addresses)
+    if linked_models:
+        raise ValidationError(
+            f"IP address cannot be changed because it is linked to: {linked_models[0]}."
+        )
+
+
+def update_device_references(sender, instance, created=False, raw=False, **kwargs):
+    """Keep the index of the CMDB objects referencing devices up to date."""
+    if raw:
         return
 
-    for model, fields in protect.MODELS_LINKED_TO_IP_ADDRESS.items():
-        if not fields:
-            continue
+    # objects referencing the device through this one only move with it
+    if references.update_references(instance, created) and not created:
+        for dependent, relation in references.get_dependents(sender):
+            references.refresh_references(
+                dependent, dependent.objects.filter(**{relation: instance})
+            )
+
+
+def forget_device_references(sender, instance, **kwargs):
+    references.forget_references(sender, [instance.pk])
+
+
+for label in references.DEVICE_REFERENCES:
+    post_save.connect(update_device_references, sender=label)
+    post_delete.connect(forget_device_references, sender=label)
+
 
-        for field in fields:
-            filter = {field: instance}
-            if model.objects.filter(**filter).exists():
-                raise ValidationError(
-                    f"IP address cannot be changed because it is linked to: {model}."
-                )
+@receiver(post_save, sender=PrefixListTerm)
+@receiver(post_delete, sender=PrefixListTerm)
+def invalidate_prefix_list_index(sender, **kwargs):
+    prefix_list_index.invalidate()
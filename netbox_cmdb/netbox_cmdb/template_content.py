@@ -1,7 +1,7 @@
-from django.db.models import Q
 from extras.plugins import PluginTemplateExtension
 from utilities.ordering import naturalize_interface
 
+from netbox_cmdb.helpers import references
 from netbox_cmdb.models.interface import DeviceInterface, Link
 
 
@@ -24,7 +24,7 @@ class SiteDecommissioning(DecommissioningBase):
 
 
 class DeviceCMDBOverview(PluginTemplateExtension):
-    """Shows CMDB interfaces and links related to the device on its detail page."""
+    """Shows CMDB objects, interfaces and links related to the device on its detail page."""
 
     model = "dcim.device"
 
@@ -36,7 +36,7 @@ class DeviceCMDBOverview(PluginTemplateExtension):
             key=lambda interface: naturalize_interface(interface.name.lower(), max_length=100),
         )
         links = (
-            Link.objects.filter(Q(interface_a__device=device) | Q(interface_b__device=device))
+            Link.objects.filter(pk__in=references.get_referencing_ids(Link, [device.pk]))
             .select_related("interface_a__device", "interface_b__device")
             .order_by("interface_a__device__name", "interface_a__name")
         )
@@ -44,6 +44,7 @@ class DeviceCMDBOverview(PluginTemplateExtension):
         return self.render(
             "netbox_cmdb/inc/device_cmdb_overview.html",
             extra_context={
+                "cmdb_objects": references.count_device_objects([device.pk]),
                 "cmdb_interfaces": interfaces,
                 "cmdb_links": links,
             },
@@ -0,0 +1,295 @@
+from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
+from dcim.models.sites import Site
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from extras.models import ObjectChange
+from ipam.models.ip import IPAddress
+from rest_framework import status
+from utilities.testing import APITestCase
+
+from netbox_cmdb.helpers import references
+from netbox_cmdb.models.bgp import (
+    ASN,
+    AfiSafi,
+    BGPPeerGroup,
+    BGPSession,
+    DeviceBGPSession,
+)
+from netbox_cmdb.models.route_policy import RoutePolicy
+
+
+class BGPSessionAPIQueryCountTestCase(APITestCase):
+    user_permissions = ("netbox_cmdb.view_bgpsession",)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.url = reverse("plugins-api:netbox_cmdb-api:bgpsession-list")
+        cls.session_count = 20
+
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        devices = [
+            Device.objects.create(
+                name=f"router{i}", device_role=device_role, device_type=device_type, site=site
+            )
+            for i in range(2)
+        ]
+        asn = ASN.objects.create(number=65000, organization_name="test")
+        route_policies = [RoutePolicy.objects.create(name="RP", device=dev) for dev in devices]
+        peer_groups = [BGPPeerGroup.objects.create(name="PG", device=dev) for dev in devices]
+
+        for i in range(cls.session_count):
+            peers = []
+            for j, device in enumerate(devices):
+                peer = DeviceBGPSession.objects.create(
+                    device=device,
+                    local_address=IPAddress.objects.create(address=f"10.{j}.{i}.1/32"),
+                    local_asn=asn,
+                    peer_group=peer_groups[j],
+                    route_policy_in=route_policies[j],
+                    route_policy_out=route_policies[j],
+                )
+                for afi_safi_name in ["ipv4-unicast", "ipv6-unicast"]:
+                    AfiSafi.objects.create(
+                        device_bgp_session=peer,
+                        afi_safi_name=afi_safi_name,
+                        route_policy_in=route_policies[j],
+                        route_policy_out=route_policies[j],
+                    )
+                peers.append(peer)
+            BGPSession.objects.create(peer_a=peers[0], peer_b=peers[1])
+
+    def _count_queries(self, limit):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"{self.url}?limit={limit}", format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), limit)
+        return len(queries)
+
+    def test_query_count_independent_of_page_size(self):
+        self.assertEqual(self._count_queries(1), self._count_queries(self.session_count))
+
+
+class BGPSessionBulkAPITestCase(APITestCase):
+    user_permissions = (
+        "netbox_cmdb.add_bgpsession",
+        "netbox_cmdb.change_bgpsession",
+        "netbox_cmdb.view_bgpsession",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.url = reverse("plugins-api:netbox_cmdb-api:bgpsession-bulk-create")
+
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        cls.devices = [
+            Device.objects.create(
+                name=f"router{i}", device_role=device_role, device_type=device_type, site=site
+            )
+            for i in range(2)
+        ]
+        cls.asn = ASN.objects.create(number=65000, organization_name="test")
+        cls.route_policies = [
+            RoutePolicy.objects.create(name="RP", device=dev) for dev in cls.devices
+        ]
+        cls.addresses = [
+            [IPAddress.objects.create(address=f"10.{j}.{i}.1/32") for j in range(2)]
+            for i in range(3)
+        ]
+
+    def _session(self, i, route_policy_a=None):
+        return {
+            "state": "production",
+            "peer_a": {
+                "device": self.devices[0].pk,
+                "local_address": self.addresses[i][0].pk,
+                "local_asn": self.asn.pk,
+                "afi_safis": [
+                    {
+                        "afi_safi_name": "ipv4-unicast",
+                        "route_policy_in": (route_policy_a or self.route_policies[0]).pk,
+                    }
+                ],
+            },
+            "peer_b": {
+                "device": self.devices[1].pk,
+                "local_address": self.addresses[i][1].pk,
+                "local_asn": self.asn.pk,
+            },
+        }
+
+    def test_bulk_create(self):
+        data = [self._session(i) for i in range(3)]
+        response = self.client.post(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(BGPSession.objects.count(), 3)
+        self.assertEqual(DeviceBGPSession.objects.count(), 6)
+        self.assertEqual(AfiSafi.objects.count(), 3)
+        self.assertEqual(
+            ObjectChange.objects.filter(changed_object_type__model="bgpsession").count(), 3
+        )
+
+    def test_bulk_create_indexes_references(self):
+        data = [self._session(i) for i in range(3)]
+        response = self.client.post(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+        self.assertFalse(
+            any(diff["missing"] or diff["stale"] for diff in references.verify().values())
+        )
+        self.assertEqual(references.get_device_references(self.devices, BGPSession).count(), 6)
+
+    def test_bulk_create_duplicate(self):
+        response = self.client.post(self.url, [self._session(0)], format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+
+        # The existing session is detected whatever the orientation of the peers
+        session = self._session(0)
+        session["peer_a"], session["peer_b"] = session["peer_b"], session["peer_a"]
+        response = self.client.post(
+            self.url, [self._session(1), session], format="json", **self.header
+        )
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data["errors"]), ["1"])
+        self.assertEqual(len(response.data["errors"]["1"]), 1)
+        self.assertEqual(BGPSession.objects.count(), 1)
+
+    def test_bulk_create_device_mismatch(self):
+        data = [self._session(0, route_policy_a=self.route_policies[1])]
+        response = self.client.post(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["errors"]["0"], ["route_policy_in is not on the same device"]
+        )
+        self.assertEqual(BGPSession.objects.count(), 0)
+
+    def _create_sessions(self, count):
+        data = [self._session(i) for i in range(count)]
+        response = self.client.post(self.url, data, format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+        return [session["id"] for session in response.data]
+
+    def test_bulk_update(self):
+        pks = self._create_sessions(2)
+        data = [
+            {
+                "id": pks[0],
+                "state": "maintenance",
+                "peer_a": {
+                    "description": "updated",
+                    "afi_safis": [{"afi_safi_name": "ipv6-unicast"}],
+                },
+            },
+            {"id": pks[1], "password": "secret"},
+        ]
+        response = self.client.patch(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        session = BGPSession.objects.get(pk=pks[0])
+        self.assertEqual(session.state, "maintenance")
+        self.assertEqual(session.peer_a.description, "updated")
+        self.assertEqual(
+            list(session.peer_a.afi_safis.values_list("afi_safi_name", flat=True)),
+            ["ipv6-unicast"],
+        )
+        self.assertEqual(BGPSession.objects.get(pk=pks[1]).password, "secret")
+        changes = ObjectChange.objects.filter(action="update")
+        self.assertEqual(changes.filter(changed_object_type__model="bgpsession").count(), 2)
+        self.assertEqual(changes.filter(changed_object_type__model="devicebgpsession").count(), 1)
+        self.assertEqual(
+            ObjectChange.objects.filter(
+                action="delete", changed_object_type__model="afisafi"
+            ).count(),
+            1,
+        )
+
+    def test_bulk_update_endpoints(self):
+        pks = self._create_sessions(1)
+        data = [{"id": pks[0], "peer_b": {"local_address": self.addresses[1][1].pk}}]
+        response = self.client.patch(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["errors"]["0"],
+            ["peer_b.local_address: cannot be changed by a bulk update."],
+        )
+
+    def test_bulk_update_device_mismatch(self):
+        pks = self._create_sessions(1)
+        data = [{"id": pks[0], "peer_a": {"route_policy_out": self.route_policies[1].pk}}]
+        response = self.client.patch(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["errors"]["0"], ["route_policy_out is not on the same device"]
+        )
+        self.assertIsNone(BGPSession.objects.get(pk=pks[0]).peer_a.route_policy_out)
+
+    def test_bulk_update_unknown_session(self):
+        pks = self._create_sessions(1)
+        data = [{"id": pks[0], "state": "staging"}, {"id": pks[0] + 1000, "state": "staging"}]
+        response = self.client.patch(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data["errors"]), ["1"])
+        self.assertEqual(BGPSession.objects.get(pk=pks[0]).state, "production")
+
+
+class AvailableASNsAPITestCase(APITestCase):
+    user_permissions = ("netbox_cmdb.add_asn", "netbox_cmdb.view_asn")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.url = reverse("plugins-api:netbox_cmdb-api:asns-available-asns")
+        for number in [65000, 65001, 65003, 65006]:
+            ASN.objects.create(number=number, organization_name=f"org{number}")
+
+    def test_get_available_asns(self):
+        self.assertEqual(
+            ASN().get_available_asn_ranges(65000, 65010),
+            [(65002, 65002), (65004, 65005), (65007, 65010)],
+        )
+        self.assertEqual(ASN().get_available_asns(65000, 65006, limit=10), [65002, 65004, 65005])
+        self.assertEqual(
+            ASN().get_available_asns(65000, 4294967294, limit=3), [65002, 65004, 65005]
+        )
+        self.assertEqual(ASN().get_available_asns(65000, 65001, limit=1), [])
+
+    def test_bulk_allocate(self):
+        data = {"min_asn": 65000, "max_asn": 65010, "organization_names": ["a", "b", "c", "d"]}
+        response = self.client.post(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+        self.assertEqual([asn["number"] for asn in response.data], [65002, 65004, 65005, 65007])
+        self.assertEqual(ObjectChange.objects.filter(changed_object_type__model="asn").count(), 4)
+
+    def test_bulk_allocate_range_exhausted(self):
+        data = {"min_asn": 65000, "max_asn": 65004, "organization_names": ["a", "b", "c"]}
+        response = self.client.post(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ASN.objects.count(), 4)
+
+    def test_bulk_allocate_existing_organization_name(self):
+        data = {"min_asn": 65000, "max_asn": 65010, "organization_names": ["a", "org65000"]}
+        response = self.client.post(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("organization_names", response.data)
+        self.assertEqual(ASN.objects.count(), 4)
@@ -5,7 +5,7 @@ from ipam.models.ip import IPAddress
 from netbox.filtersets import NetBoxModelFilterSet
 from tenancy.models.tenants import Tenant
 
-from netbox_cmdb.filtersets import BGPSessionFilterSet
+from netbox_cmdb.filtersets import ASNFilterSet, BGPSessionFilterSet
 from netbox_cmdb.models.bgp import ASN, BGPSession, DeviceBGPSession
 
 
@@ -117,3 +117,51 @@ class BGPSessionTestCase(TestCase, NetBoxModelFilterSet):
         self.assertEqual(self.filterset(params, self.queryset).qs.count(), 2)
         params = {"tenant_id": [tenant.pk]}
         self.assertEqual(self.filterset(params, self.queryset).qs.count(), 2)
+
+    def test_device_location(self):
+        params = {"device__site__name": ["SiteTest"]}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 5)
+        params = {"device__site__name": ["other-site"]}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 0)
+
+    def test_device_type(self):
+        device_type = DeviceType.objects.get(slug="model-test")
+        params = {"device__device_type_id": [device_type.pk]}
+        qs = self.filterset(params, self.queryset).qs
+        self.assertEqual(qs.count(), 5)
+        self.assertFalse(qs.query.distinct)
+
+    def test_search(self):
+        params = {"q": "router3"}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 2)
+        params = {"q": "ROUTER3"}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 2)
+        # LIKE wildcards are searched as such
+        params = {"q": "router_"}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 0)
+
+
+class ASNTestCase(TestCase):
+    queryset = ASN.objects.all()
+    filterset = ASNFilterSet
+
+    @classmethod
+    def setUpTestData(cls):
+        ASN.objects.bulk_create(
+            [
+                ASN(number=65000, organization_name="Acme"),
+                ASN(number=65001, organization_name="Transit of AS65000"),
+                ASN(number=4200000000, organization_name="Private"),
+            ]
+        )
+
+    def test_search(self):
+        params = {"q": "acme"}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 1)
+        # numbers and organization names are both searched by substring
+        params = {"q": "65000"}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 2)
+        params = {"q": "6500"}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 2)
+        params = {"q": "4200000000"}
+        self.assertEqual(self.filterset(params, self.queryset).qs.count(), 1)
@@ -1,5 +1,7 @@
 from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
 from dcim.models.sites import Site
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
 from django.db.utils import IntegrityError
 from django.test import TestCase
 from ipam.models.ip import IPAddress
@@ -286,6 +288,77 @@ class BGPSessionSerializerUpdate(BaseTestCase):
             code="invalid",
         )
 
+    def test_bgp_session_add__existing_session_reversed(self):
+        """Adding a BGP session already existing, with peer_a and peer_b swapped."""
+        data = {
+            "peer_a": {
+                "local_address": self.ip_address2.pk,
+                "device": self.device2.pk,
+                "local_asn": self.asn2.pk,
+            },
+            "peer_b": {
+                "local_address": self.ip_address1.pk,
+                "device": self.device1.pk,
+                "local_asn": self.asn1.pk,
+            },
+            "state": "production",
+        }
+        bgp_session_serializer = BGPSessionSerializer(data=data)
+        assert bgp_session_serializer.is_valid() is False
+        assert "already exists" in bgp_session_serializer.errors["errors"][0]
+
+    def test_bgp_session_unique_endpoints(self):
+        """The database refuses a duplicate session, whatever the orientation of its peers."""
+        bgp_session = BGPSession(
+            peer_a=DeviceBGPSession.objects.create(
+                device=self.device2, local_asn=self.asn2, local_address=self.ip_address2
+            ),
+            peer_b=DeviceBGPSession.objects.create(
+                device=self.device1, local_asn=self.asn1, local_address=self.ip_address1
+            ),
+        )
+        with self.assertRaises(ValidationError):
+            bgp_session.validate_unique()
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            bgp_session.save()
+            # the constraint is deferred to the commit
+            with connection.cursor() as cursor:
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def test_bgp_session_endpoints(self):
+        """Endpoints are sorted, and follow the changes of the peers."""
+        bgp_session = BGPSession.objects.get(pk=self.bgp_session.pk)
+        low, high = sorted(
+            [(self.device1.pk, self.ip_address1.pk), (self.device2.pk, self.ip_address2.pk)]
+        )
+        assert (bgp_session.low_device_id, bgp_session.low_address_id) == low
+        assert (bgp_session.high_device_id, bgp_session.high_address_id) == high
+        assert list(BGPSession.objects.between(self.device2, self.device1)) == [bgp_session]
+
+        ip_address3 = IPAddress.objects.create(address="10.0.0.3/32")
+        data = {
+            "peer_a": {
+                "local_address": self.ip_address1.pk,
+                "device": self.device1.pk,
+                "local_asn": self.asn1.pk,
+            },
+            "peer_b": {
+                "local_address": ip_address3.pk,
+                "device": self.device2.pk,
+                "local_asn": self.asn2.pk,
+            },
+            "state": "production",
+        }
+        bgp_session_serializer = BGPSessionSerializer(instance=self.bgp_session, data=data)
+        assert bgp_session_serializer.is_valid() is True
+        bgp_session_serializer.save()
+
+        bgp_session.refresh_from_db()
+        endpoints = {bgp_session.low_address_id, bgp_session.high_address_id}
+        assert endpoints == {self.ip_address1.pk, ip_address3.pk}
+        assert "low_device" not in bgp_session_serializer.data
+
     def test_bgp_session_update__state_and_password(self):
         """Adding ipv4-unicast afisafi to an existing session."""
         data = {
@@ -0,0 +1,234 @@
+import json
+
+from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
+from dcim.models.sites import Site
+from django.urls import reverse
+from rest_framework import status
+from utilities.testing import APITestCase
+
+from netbox_cmdb.helpers import prefix_list_index
+from netbox_cmdb.models.prefix_list import PrefixList, PrefixListTerm
+
+
+def create_prefix_list():
+    site = Site.objects.create(name="SiteTest", slug="site-test")
+    manufacturer = Manufacturer.objects.create(name="test", slug="test")
+    device_type = DeviceType.objects.create(
+        manufacturer=manufacturer, model="model-test", slug="model-test"
+    )
+    device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+    device = Device.objects.create(
+        name="router-test", device_role=device_role, device_type=device_type, site=site
+    )
+    prefix_list = PrefixList.objects.create(name="PF-TEST", device=device)
+    PrefixListTerm.objects.create(prefix_list=prefix_list, sequence=5, prefix="10.0.0.0/8")
+    return prefix_list
+
+
+def import_url(prefix_list):
+    return reverse(
+        "plugins-api:netbox_cmdb-api:prefixlist-import-terms", kwargs={"pk": prefix_list.pk}
+    )
+
+
+class PrefixListImportAPITestCase(APITestCase):
+    user_permissions = (
+        "netbox_cmdb.add_prefixlist",
+        "netbox_cmdb.change_prefixlist",
+        "netbox_cmdb.view_prefixlist",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.prefix_list = create_prefix_list()
+        cls.url = import_url(cls.prefix_list)
+
+    def _terms(self):
+        return list(
+            PrefixListTerm.objects.filter(prefix_list=self.prefix_list)
+            .order_by("sequence")
+            .values_list("sequence", "prefix", "ge", "le")
+        )
+
+    def test_import_text(self):
+        body = "# generated by bgpq4\n192.0.2.0/24\n\n198.51.100.0/22 ge 23 le 24\n203.0.113.0/24 le 32\n"
+        response = self.client.post(
+            f"{self.url}?sequence_start=10&sequence_step=10",
+            body,
+            content_type="text/plain",
+            **self.header,
+        )
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response.data["deleted"], 1)
+        self.assertEqual(response.data["imported"], 3)
+        self.assertEqual(
+            [(seq, str(prefix), ge, le) for seq, prefix, ge, le in self._terms()],
+            [
+                (10, "192.0.2.0/24", None, None),
+                (20, "198.51.100.0/22", 23, 24),
+                (30, "203.0.113.0/24", None, 32),
+            ],
+        )
+
+    def test_import_ndjson(self):
+        body = "\n".join(
+            json.dumps(term)
+            for term in [{"prefix": "192.0.2.0/24"}, {"prefix": "198.51.100.0/22", "le": 24}]
+        )
+        response = self.client.post(
+            self.url, body, content_type="application/x-ndjson", **self.header
+        )
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response.data["imported"], 2)
+        self.assertEqual([term[0] for term in self._terms()], [5, 10])
+
+    def test_import_invalid_lines(self):
+        body = "192.0.2.0/24\n2001:db8::/32\n192.0.2.0/24 le 16\nnot-a-prefix\n192.0.2.0/24 ge\n"
+        response = self.client.post(self.url, body, content_type="text/plain", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [2, 3, 4, 5])
+        # nothing is changed
+        self.assertEqual([str(term[1]) for term in self._terms()], ["10.0.0.0/8"])
+
+    def test_import_host_bits(self):
+        body = "192.0.2.0/24\n10.0.0.1/8\n"
+        response = self.client.post(self.url, body, content_type="text/plain", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [2])
+        self.assertIn("10.0.0.1/8 is not a valid prefix", response.data["errors"][0]["error"])
+        self.assertEqual([str(term[1]) for term in self._terms()], ["10.0.0.0/8"])
+
+    def test_import_empty(self):
+        response = self.client.post(
+            self.url, "# nothing\n", content_type="text/plain", **self.header
+        )
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(self._terms()), 1)
+
+
+class PrefixListImportPermissionAPITestCase(APITestCase):
+    user_permissions = ("netbox_cmdb.add_prefixlist", "netbox_cmdb.view_prefixlist")
+
+    def test_import_without_change_permission(self):
+        response = self.client.post(
+            import_url(create_prefix_list()),
+            "192.0.2.0/24\n",
+            content_type="text/plain",
+            **self.header,
+        )
+
+        self.assertHttpStatus(response, status.HTTP_403_FORBIDDEN)
+
+
+class PrefixListCompressAPITestCase(APITestCase):
+    user_permissions = (
+        "netbox_cmdb.add_prefixlist",
+        "netbox_cmdb.change_prefixlist",
+        "netbox_cmdb.view_prefixlist",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.prefix_list = create_prefix_list()
+        for i in range(4):
+            PrefixListTerm.objects.create(
+                prefix_list=cls.prefix_list, sequence=10 + i, prefix=f"10.{i}.0.0/16", le=24
+            )
+        cls.url = reverse(
+            "plugins-api:netbox_cmdb-api:prefixlist-compress", kwargs={"pk": cls.prefix_list.pk}
+        )
+
+    def test_compress_report(self):
+        response = self.client.get(self.url, **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertFalse(response.data["applied"])
+        self.assertEqual(response.data["original_terms"], 5)
+        self.assertEqual(
+            response.data["terms"],
+            [
+                {"sequence": 5, "prefix": "10.0.0.0/8", "ge": None, "le": None},
+                {"sequence": 10, "prefix": "10.0.0.0/14", "ge": 16, "le": 24},
+            ],
+        )
+        self.assertEqual(PrefixListTerm.objects.filter(prefix_list=self.prefix_list).count(), 5)
+
+    def test_compress_apply(self):
+        response = self.client.post(self.url, **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertTrue(response.data["applied"])
+        self.assertEqual(
+            [
+                (str(prefix), ge, le)
+                for prefix, ge, le in PrefixListTerm.objects.filter(
+                    prefix_list=self.prefix_list
+                ).values_list("prefix", "ge", "le")
+            ],
+            [("10.0.0.0/8", None, None), ("10.0.0.0/14", 16, 24)],
+        )
+
+
+class PrefixListMatchAPITestCase(APITestCase):
+    user_permissions = ("netbox_cmdb.view_prefixlist",)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.prefix_list = create_prefix_list()
+        PrefixListTerm.objects.create(
+            prefix_list=cls.prefix_list, sequence=10, prefix="192.0.2.0/24", ge=25, le=26
+        )
+        PrefixListTerm.objects.create(
+            prefix_list=cls.prefix_list, sequence=15, prefix="2001:db8::/32", le=48
+        )
+        cls.url = reverse("plugins-api:netbox_cmdb-api:prefixlist-match")
+
+    def setUp(self):
+        super().setUp()
+        # the terms were created in a transaction never committed, which did not invalidate
+        prefix_list_index.index.version = None
+
+    def _match(self, prefix):
+        response = self.client.get(self.url, {"prefix": prefix}, **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        return [term["sequence"] for term in response.data]
+
+    def test_match(self):
+        self.assertEqual(self._match("10.0.0.0/8"), [5])
+        self.assertEqual(self._match("10.1.0.0/16"), [])
+        self.assertEqual(self._match("192.0.2.128/25"), [10])
+        self.assertEqual(self._match("192.0.2.0/24"), [])
+        self.assertEqual(self._match("2001:db8:1::/48"), [15])
+
+    def test_match_after_term_change(self):
+        self.assertEqual(self._match("10.1.0.0/16"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            term = PrefixListTerm.objects.get(prefix_list=self.prefix_list, sequence=5)
+            term.le = 16
+            term.save()
+
+        self.assertEqual(self._match("10.1.0.0/16"), [5])
+
+    def test_match_during_rebuild(self):
+        self.assertEqual(self._match("10.1.0.0/16"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            term = PrefixListTerm.objects.get(prefix_list=self.prefix_list, sequence=5)
+            term.le = 16
+            term.save()
+
+        # the previous trees are served while another thread rebuilds them
+        with prefix_list_index.index._lock:
+            self.assertEqual(self._match("10.1.0.0/16"), [])
+        self.assertEqual(self._match("10.1.0.0/16"), [5])
+
+    def test_match_invalid_prefix(self):
+        response = self.client.get(self.url, {"prefix": "not-a-prefix"}, **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
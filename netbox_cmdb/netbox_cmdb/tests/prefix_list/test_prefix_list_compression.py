@@ -0,0 +1,77 @@
+from django.test import SimpleTestCase
+from netaddr import IPNetwork
+
+from netbox_cmdb.helpers.prefix_list_compression import compress_terms, term_range
+from netbox_cmdb.helpers.prefix_tree import PrefixTree
+
+
+def matches(terms, route, max_length=32):
+    route = IPNetwork(route)
+    for prefix, ge, le in terms:
+        prefix = IPNetwork(prefix)
+        low, high = term_range(prefix.prefixlen, ge, le, max_length)
+        if route in prefix and low <= route.prefixlen <= high:
+            return True
+    return False
+
+
+def compressed(terms, version=4):
+    return [(str(prefix), ge, le) for prefix, ge, le in compress_terms(terms, version)]
+
+
+class PrefixTreeTestCase(SimpleTestCase):
+    def test_covering(self):
+        tree = PrefixTree(4)
+        for prefix in ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "10.2.0.0/16", "0.0.0.0/0"]:
+            network = IPNetwork(prefix)
+            tree.insert(int(network.network), network.prefixlen, prefix)
+
+        network = IPNetwork("10.1.2.128/25")
+        self.assertEqual(
+            [values[0] for _, _, values in tree.covering(int(network.network), 25)],
+            ["0.0.0.0/0", "10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24"],
+        )
+        self.assertEqual(
+            [values[0] for _, _, values in tree],
+            ["0.0.0.0/0", "10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "10.2.0.0/16"],
+        )
+
+
+class PrefixListCompressionTestCase(SimpleTestCase):
+    def test_siblings(self):
+        terms = [(f"10.0.{i}.0/24", None, None) for i in range(4)]
+
+        self.assertEqual(compressed(terms), [("10.0.0.0/22", 24, 24)])
+
+    def test_covered(self):
+        terms = [("10.0.0.0/8", None, 32), ("10.1.0.0/16", None, None), ("10.0.0.0/8", None, None)]
+
+        self.assertEqual(compressed(terms), [("10.0.0.0/8", None, 32)])
+
+    def test_adjacent_ranges(self):
+        terms = [("10.0.0.0/16", None, 20), ("10.0.0.0/16", 21, 24), ("10.0.0.0/16", 26, None)]
+
+        self.assertEqual(compressed(terms), [("10.0.0.0/16", None, 24), ("10.0.0.0/16", 26, None)])
+
+    def test_equivalent(self):
+        terms = [
+            ("192.0.2.0/25", None, None),
+            ("192.0.2.128/25", None, None),
+            ("192.0.2.0/24", None, None),
+            ("192.0.2.0/26", 27, 28),
+            ("192.0.2.64/26", 27, 28),
+            ("198.51.100.0/24", 25, None),
+            ("198.51.100.0/25", None, 26),
+        ]
+        result = compress_terms(terms, 4)
+
+        self.assertLess(len(result), len(terms))
+        for prefix in ["192.0.2.0/24", "198.51.100.0/24"]:
+            for length in range(24, 33):
+                for subnet in list(IPNetwork(prefix).subnet(length))[:8]:
+                    self.assertEqual(matches(terms, subnet), matches(result, subnet), subnet)
+
+    def test_ipv6(self):
+        terms = [("2001:db8::/33", None, 48), ("2001:db8:8000::/33", None, 48)]
+
+        self.assertEqual(compressed(terms, 6), [("2001:db8::/32", 33, 48)])
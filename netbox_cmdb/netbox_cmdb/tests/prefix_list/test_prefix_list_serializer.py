@@ -1,6 +1,8 @@
 from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
 from dcim.models.sites import Site
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.serializers import ValidationError
 
 from netbox_cmdb.api.prefix_list.serializers import PrefixListSerializer
@@ -225,3 +227,42 @@ class PrefixListSerializerUpdate(BaseTestCase):
             "input is not valid, you must have at least one term in your prefix-list.",
         ):
             pf_serializer.save()
+
+    def test_prefix_list_update_invalid_terms(self):
+        data = {
+            "name": "PF-TEST",
+            "device": {"name": "router-test"},
+            "ip_version": "ipv4",
+            "terms": [
+                {"sequence": 5, "prefix": "10.0.0.0/24", "le": 16},
+                {"sequence": 10, "prefix": "2001:db8::/32"},
+                {"sequence": 10, "prefix": "192.168.1.0/24"},
+            ],
+        }
+        pf_serializer = PrefixListSerializer(instance=self.prefix_list, data=data)
+        assert pf_serializer.is_valid() is True
+
+        with self.assertRaises(ValidationError) as cm:
+            pf_serializer.save()
+        assert set(cm.exception.detail["terms"]) == {"5", "10"}
+        assert PrefixListTerm.objects.get(prefix_list=self.prefix_list, sequence=5).le == 32
+
+    def test_prefix_list_update_many_terms(self):
+        data = {
+            "name": "PF-TEST",
+            "device": {"name": "router-test"},
+            "ip_version": "ipv4",
+            "terms": [
+                {"sequence": 10 + i, "prefix": f"10.{i // 256}.{i % 256}.0/24", "le": 32}
+                for i in range(2000)
+            ],
+        }
+        pf_serializer = PrefixListSerializer(instance=self.prefix_list, data=data)
+        assert pf_serializer.is_valid() is True
+
+        with CaptureQueriesContext(connection) as queries:
+            pf_serializer.save()
+
+        # terms are written in batches, not one by one
+        assert len(queries) < 15
+        validate(self.device, data)
@@ -0,0 +1,128 @@
+from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
+from dcim.models.sites import Site
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from utilities.testing import APITestCase
+
+from netbox_cmdb.models.bgp import ASN
+from netbox_cmdb.models.bgp_community_list import BGPCommunityList
+from netbox_cmdb.models.prefix_list import PrefixList, PrefixListTerm
+from netbox_cmdb.models.route_policy import RoutePolicy, RoutePolicyTerm
+
+
+def create_device():
+    site = Site.objects.create(name="SiteTest", slug="site-test")
+    manufacturer = Manufacturer.objects.create(name="test", slug="test")
+    device_type = DeviceType.objects.create(
+        manufacturer=manufacturer, model="model-test", slug="model-test"
+    )
+    device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+    return Device.objects.create(
+        name="router-test", device_role=device_role, device_type=device_type, site=site
+    )
+
+
+class RoutePolicyListAPITestCase(APITestCase):
+    user_permissions = ("netbox_cmdb.view_routepolicy",)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = create_device()
+        cls.prefix_list = PrefixList.objects.create(name="PF-TEST", device=cls.device)
+        cls.community_list = BGPCommunityList.objects.create(name="CL-TEST", device=cls.device)
+        cls.asn = ASN.objects.create(number=65000, organization_name="test")
+        cls.url = reverse("plugins-api:netbox_cmdb-api:routepolicy-list")
+
+    def _create_route_policies(self, count):
+        for i in range(count):
+            route_policy = RoutePolicy.objects.create(name=f"RM-TEST-{i}", device=self.device)
+            for sequence in range(5, 25, 5):
+                RoutePolicyTerm.objects.create(
+                    route_policy=route_policy,
+                    sequence=sequence,
+                    from_prefix_list=self.prefix_list,
+                    from_bgp_community_list=self.community_list,
+                    set_as_path_prepend_asn=self.asn,
+                )
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_list_queries_do_not_depend_on_policies(self):
+        self._create_route_policies(2)
+        queries = self._count_list_queries()
+
+        self._create_route_policies(10)
+        self.assertEqual(self._count_list_queries(), queries)
+
+
+class RoutePolicyEvaluateAPITestCase(APITestCase):
+    user_permissions = ("netbox_cmdb.view_routepolicy",)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = create_device()
+        cls.prefix_list = PrefixList.objects.create(name="PF-TEST", device=cls.device)
+        PrefixListTerm.objects.create(
+            prefix_list=cls.prefix_list, sequence=5, prefix="10.0.0.0/8", le=24
+        )
+        cls.route_policy = RoutePolicy.objects.create(name="RM-TEST", device=cls.device)
+        RoutePolicyTerm.objects.create(
+            route_policy=cls.route_policy,
+            sequence=10,
+            from_prefix_list=cls.prefix_list,
+            set_local_pref=200,
+        )
+        cls.url = reverse(
+            "plugins-api:netbox_cmdb-api:routepolicy-evaluate", kwargs={"pk": cls.route_policy.pk}
+        )
+
+    def test_evaluate(self):
+        routes = [{"prefix": "10.1.0.0/16", "local_pref": 100}, {"prefix": "192.0.2.0/24"}]
+        response = self.client.post(self.url, {"routes": routes}, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(
+            [(result["decision"], result["sequence"]) for result in response.data["results"]],
+            [("permit", 10), ("deny", None)],
+        )
+        self.assertEqual(response.data["results"][0]["attributes"]["local_pref"], 200)
+        self.assertEqual(response.data["summary"]["permitted"], 1)
+
+    def test_evaluate_read_only_token(self):
+        self.token.write_enabled = False
+        self.token.save()
+        response = self.client.post(
+            self.url, {"routes": [{"prefix": "10.1.0.0/16"}]}, format="json", **self.header
+        )
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response.data["summary"]["permitted"], 1)
+
+    def test_evaluate_candidate_terms(self):
+        data = {
+            "routes": [{"prefix": "10.1.0.0/16"}, {"prefix": "192.0.2.0/24"}],
+            "terms": [
+                {"sequence": 10, "decision": "deny", "from_prefix_list": self.prefix_list.pk}
+            ],
+        }
+        response = self.client.post(f"{self.url}?results=false", data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertNotIn("results", response.data)
+        self.assertEqual(response.data["summary"]["denied"], 2)
+        self.assertEqual(
+            RoutePolicyTerm.objects.get(route_policy=self.route_policy).decision, "permit"
+        )
+
+    def test_evaluate_invalid_routes(self):
+        data = {"routes": [{"prefix": "10.0.0.0/8"}, {"prefix": "not-a-prefix"}]}
+        response = self.client.post(self.url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["route"] for error in response.data["errors"]], [1])
@@ -0,0 +1,126 @@
+from django.test import SimpleTestCase
+
+from netbox_cmdb.helpers.route_policy_evaluation import (
+    CompiledRoutePolicy,
+    parse_prefix,
+    summarize,
+)
+from netbox_cmdb.models.bgp import ASN
+from netbox_cmdb.models.route_policy import RoutePolicyTerm
+
+PREFIX_LIST_TERMS = [
+    (1, "10.0.0.0/8", None, 32),
+    (2, "0.0.0.0/0", 8, 24),
+    (2, "2001:db8::/32", None, 48),
+    (3, "192.0.2.0/24", None, None),
+]
+COMMUNITY_LIST_TERMS = [(1, "65000:100"), (1, "65000:200")]
+
+
+class RoutePolicyEvaluationTestCase(SimpleTestCase):
+    def setUp(self):
+        terms = [
+            RoutePolicyTerm(
+                sequence=30, from_prefix_list_id=2, from_source_protocol="bgp", set_metric=10
+            ),
+            RoutePolicyTerm(sequence=5, decision="deny", from_prefix_list_id=1),
+            RoutePolicyTerm(
+                sequence=10,
+                from_bgp_community_list_id=1,
+                from_route_type="ebgp",
+                set_local_pref=200,
+                set_community="65000:1",
+            ),
+            RoutePolicyTerm(
+                sequence=20,
+                from_bgp_community="65000:300",
+                set_as_path_prepend_asn=ASN(number=65000),
+                set_as_path_prepend_repeat=2,
+            ),
+        ]
+        self.policy = CompiledRoutePolicy(terms, PREFIX_LIST_TERMS, COMMUNITY_LIST_TERMS)
+
+    def _decisions(self, routes):
+        results, errors = self.policy.evaluate(routes)
+        self.assertEqual(errors, [])
+        return [(result["decision"], result["sequence"]) for result in results]
+
+    def test_first_matching_term_decides(self):
+        self.assertEqual(
+            self._decisions(
+                [
+                    {"prefix": "10.1.0.0/16", "communities": ["65000:100"], "route_type": "ebgp"},
+                    {"prefix": "1.0.0.0/24", "communities": ["65000:100"], "route_type": "ebgp"},
+                    {"prefix": "1.0.0.0/24", "communities": ["65000:100"], "route_type": "ibgp"},
+                    {"prefix": "1.0.0.0/25", "communities": ["65000:300"]},
+                    {"prefix": "1.0.0.0/24"},
+                    {"prefix": "2001:db8:1::/48"},
+                    {"prefix": "1.0.0.0/25"},
+                    {"prefix": "192.0.2.0/24", "protocol": "static"},
+                ]
+            ),
+            [
+                ("deny", 5),
+                ("permit", 10),
+                ("permit", 30),
+                ("permit", 20),
+                ("permit", 30),
+                ("permit", 30),
+                ("deny", None),
+                ("deny", None),
+            ],
+        )
+
+    def test_set_actions(self):
+        results, _ = self.policy.evaluate(
+            [
+                {
+                    "prefix": "1.0.0.0/24",
+                    "communities": ["65000:200"],
+                    "route_type": "ebgp",
+                    "local_pref": 100,
+                    "as_path": [64512],
+                },
+                {"prefix": "1.0.0.0/25", "communities": ["65000:300"], "as_path": [64512]},
+            ]
+        )
+
+        self.assertEqual(results[0]["attributes"]["local_pref"], 200)
+        self.assertEqual(results[0]["attributes"]["communities"], ["65000:200", "65000:1"])
+        self.assertEqual(results[0]["attributes"]["as_path"], [64512])
+        self.assertEqual(results[1]["attributes"]["as_path"], [65000, 65000, 64512])
+        self.assertIsNone(results[1]["attributes"]["local_pref"])
+
+    def test_denied_routes_have_no_attributes(self):
+        results, _ = self.policy.evaluate([{"prefix": "10.0.0.0/8"}])
+
+        self.assertIsNone(results[0]["attributes"])
+
+    def test_invalid_routes(self):
+        _, errors = self.policy.evaluate(
+            [
+                {"prefix": "10.0.0.0/8"},
+                {"prefix": "not-a-prefix"},
+                {"prefix": "10.0.0.0/33"},
+                {"communities": []},
+                {"prefix": "10.0.0.0/8", "communities": "65000:100"},
+                "10.0.0.0/8",
+            ]
+        )
+
+        self.assertEqual([error["route"] for error in errors], [1, 2, 3, 4, 5])
+
+    def test_summary(self):
+        results, _ = self.policy.evaluate(
+            [{"prefix": "10.0.0.0/8"}, {"prefix": "1.0.0.0/24"}, {"prefix": "1.0.0.0/25"}]
+        )
+
+        self.assertEqual(
+            summarize(results),
+            {"routes": 3, "permitted": 1, "denied": 2, "unmatched": 1, "terms": {5: 1, 30: 1}},
+        )
+
+    def test_parse_prefix(self):
+        self.assertEqual(parse_prefix("10.0.0.1/8"), (4, 0x0A000001, 8))
+        self.assertEqual(parse_prefix("192.0.2.1"), (4, 0xC0000201, 32))
+        self.assertEqual(parse_prefix("2001:db8::/32"), (6, 0x20010DB8 << 96, 32))
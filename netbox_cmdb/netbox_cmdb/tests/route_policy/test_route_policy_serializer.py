@@ -1,6 +1,8 @@
 from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
 from dcim.models.sites import Site
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from netaddr import IPNetwork
 from rest_framework.exceptions import ErrorDetail
 from rest_framework.serializers import ValidationError
@@ -363,3 +365,83 @@ class WritableRoutePolicySerializerUpdate(BaseTestCase):
             "input is not valid, you must have at least one term in your route policy.",
         ):
             route_policy_serializer.save()
+
+    def test_route_policy_update_term_changes(self):
+        data = {
+            "name": "RM-TEST",
+            "device": {"name": "router-test"},
+            "terms": [
+                {
+                    "sequence": 5,
+                    "decision": "permit",
+                    "from_bgp_community_list": self.bgp_community_list.pk,
+                    "set_local_pref": 100,
+                },
+                {"sequence": 15, "decision": "deny", "from_prefix_list": self.prefix_list.pk},
+                {"sequence": 20, "decision": "permit", "set_local_pref": 300},
+            ],
+        }
+        route_policy_serializer = WritableRoutePolicySerializer(
+            instance=self.route_policy, data=data
+        )
+        assert route_policy_serializer.is_valid() is True
+        route_policy_serializer.save()
+
+        assert route_policy_serializer.data["term_changes"] == {
+            "created": [15, 20],
+            "changed": [],
+            "unchanged": [5],
+            "removed": [10],
+        }
+        validate(self.device, data)
+
+    def test_route_policy_update_many_terms(self):
+        data = {
+            "name": "RM-TEST",
+            "device": {"name": "router-test"},
+            "terms": [
+                {
+                    "sequence": 5,
+                    "decision": "deny",
+                    "from_bgp_community_list": self.bgp_community_list.pk,
+                },
+                *(
+                    {
+                        "sequence": 10 + i,
+                        "decision": "permit",
+                        "from_prefix_list": self.prefix_list.pk,
+                        "set_local_pref": 100 + i,
+                    }
+                    for i in range(500)
+                ),
+            ],
+        }
+        route_policy_serializer = WritableRoutePolicySerializer(
+            instance=self.route_policy, data=data
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            assert route_policy_serializer.is_valid() is True
+            route_policy_serializer.save()
+
+        # referenced lists are fetched and terms are written in batches, not one by one
+        assert len(queries) < 20
+        assert route_policy_serializer.data["term_changes"]["changed"] == [5, 10]
+        validate(self.device, data)
+
+    def test_route_policy_update_duplicate_sequences(self):
+        data = {
+            "name": "RM-TEST",
+            "device": {"name": "router-test"},
+            "terms": [
+                {"sequence": 5, "decision": "permit"},
+                {"sequence": 5, "decision": "deny"},
+            ],
+        }
+        route_policy_serializer = WritableRoutePolicySerializer(
+            instance=self.route_policy, data=data
+        )
+        assert not route_policy_serializer.is_valid()
+        assert route_policy_serializer.errors["errors"][0] == ErrorDetail(
+            string="duplicate sequence 5", code="invalid"
+        )
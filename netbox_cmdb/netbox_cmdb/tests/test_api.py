@@ -1,12 +1,27 @@
+import json
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
 from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
-from dcim.models.sites import Site
+from dcim.models.racks import Rack
+from dcim.models.sites import Location, Site
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from extras.choices import JobResultStatusChoices, ObjectChangeActionChoices
+from extras.models import JobResult, ObjectChange
 from netbox.config import get_config
 from rest_framework import status
 from utilities.testing import APITestCase
 
-from netbox_cmdb.models.prefix_list import PrefixList
+from netbox_cmdb import jobs
+from netbox_cmdb.api.pagination import CustomLimitOffsetPagination
+from netbox_cmdb.api.viewsets import CustomNetBoxModelViewSet
+from netbox_cmdb.helpers import changelog, cleaning
+from netbox_cmdb.models.prefix_list import PrefixList, PrefixListTerm
 
 # Test cases taken from unmerged PR https://github.com/netbox-community/netbox/pull/10764/
 # except that we test it against a view from the CMDB
@@ -136,3 +151,585 @@ class APICursorPaginationTestCase(APITestCase):
             self.initial_record_count + 1,
         )
         self.assertIsNone(page_2_response.data["next"])
+
+
+class APIKeysetPaginationTestCase(APITestCase):
+    user_permissions = ("netbox_cmdb.view_prefixlist",)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.url = reverse("plugins-api:netbox_cmdb-api:prefixlist-list") + "?pagination_mode=keyset"
+
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        device = Device.objects.create(
+            name="router-test",
+            device_role=device_role,
+            device_type=device_type,
+            site=site,
+        )
+        PrefixList.objects.bulk_create(
+            [PrefixList(name=f"PF-{i}", device=device) for i in range(1, 101)]
+        )
+
+    def _walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url, format="json", **self.header)
+            self.assertHttpStatus(response, status.HTTP_200_OK)
+            self.assertIsNone(response.data["previous"])
+            ids += [result["id"] for result in response.data["results"]]
+            url = response.data["next"]
+        return ids
+
+    def test_walk_by_created(self):
+        # ties of creation times are ordered by id
+        PrefixList.objects.filter(name__in=["PF-10", "PF-20", "PF-30"]).update(
+            created=PrefixList.objects.get(name="PF-50").created
+        )
+        expected = list(PrefixList.objects.order_by("created", "id").values_list("id", flat=True))
+        self.assertEqual(self._walk(f"{self.url}&limit=7"), expected)
+
+    def test_walk_by_id(self):
+        expected = list(PrefixList.objects.order_by("id").values_list("id", flat=True))
+        self.assertEqual(self._walk(f"{self.url}&pagination_key=id&limit=30"), expected)
+
+    def test_walk_without_created(self):
+        PrefixList.objects.filter(name__in=["PF-1", "PF-2"]).update(created=None)
+        expected = list(
+            PrefixList.objects.exclude(created=None)
+            .order_by("created", "id")
+            .values_list("id", flat=True)
+        ) + list(
+            PrefixList.objects.filter(created=None).order_by("id").values_list("id", flat=True)
+        )
+        self.assertEqual(self._walk(f"{self.url}&limit=9"), expected)
+
+    def test_walk_tie_group(self):
+        PrefixList.objects.update(created=PrefixList.objects.get(name="PF-1").created)
+
+        ids, query_counts = [], []
+        url = f"{self.url}&limit=10"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, format="json", **self.header)
+            self.assertHttpStatus(response, status.HTTP_200_OK)
+            ids += [result["id"] for result in response.data["results"]]
+            query_counts.append(len(queries))
+            url = response.data["next"]
+
+        self.assertEqual(ids, list(PrefixList.objects.order_by("id").values_list("id", flat=True)))
+        # deep pages of the tie group cost the same as the first one, the last page also
+        # reads the objects without creation time
+        self.assertEqual(len(query_counts), 10)
+        self.assertEqual(set(query_counts[:-1]), {query_counts[0]})
+        self.assertEqual(query_counts[-1], query_counts[0] + 1)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f"{self.url}&cursor=invalid", format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data["detail"], "Invalid cursor")
+
+
+class APICountTestCase(APITestCase):
+    user_permissions = ("netbox_cmdb.view_prefixlist",)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.url = reverse("plugins-api:netbox_cmdb-api:prefixlist-list")
+
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        device = Device.objects.create(
+            name="router-test",
+            device_role=device_role,
+            device_type=device_type,
+            site=site,
+        )
+        PrefixList.objects.bulk_create(
+            [PrefixList(name=f"PF-{i}", device=device) for i in range(1, 101)]
+        )
+
+    def _get(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"{self.url}?{params}", format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        counted = any("COUNT(" in query["sql"] for query in queries.captured_queries)
+        return response, counted
+
+    def test_exact(self):
+        response, counted = self._get("limit=10")
+        self.assertEqual(response.data["count"], 100)
+        self.assertTrue(counted)
+
+    def test_none(self):
+        response, counted = self._get("count=none&limit=30")
+        self.assertIsNone(response.data["count"])
+        self.assertFalse(counted)
+        self.assertEqual(len(response.data["results"]), 30)
+        self.assertIn("offset=30", response.data["next"])
+
+        response, _ = self._get("count=none&limit=30&offset=90")
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertIsNone(response.data["next"])
+        self.assertIn("offset=60", response.data["previous"])
+
+    def test_estimate(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {PrefixList._meta.db_table}")
+
+        with mock.patch.object(CustomLimitOffsetPagination, "min_estimated_count", 0):
+            response, counted = self._get("count=estimate&limit=10")
+            self.assertEqual(response.data["count"], 100)
+            self.assertFalse(counted)
+
+            # filtered lists are counted
+            response, counted = self._get("count=estimate&limit=10&name=PF-1")
+            self.assertEqual(response.data["count"], 1)
+            self.assertTrue(counted)
+
+        # small tables are counted
+        response, counted = self._get("count=estimate&limit=10")
+        self.assertEqual(response.data["count"], 100)
+        self.assertTrue(counted)
+
+
+class APIStreamingTestCase(APITestCase):
+    user_permissions = ("netbox_cmdb.view_prefixlist",)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.url = reverse("plugins-api:netbox_cmdb-api:prefixlist-list")
+        cls.initial_record_count = 100
+
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        cls.device = Device.objects.create(
+            name="router-test",
+            device_role=device_role,
+            device_type=device_type,
+            site=site,
+        )
+        PrefixList.objects.bulk_create(
+            [
+                PrefixList(name=f"PF-{i}", device=cls.device)
+                for i in range(1, 1 + cls.initial_record_count)
+            ]
+        )
+
+    def _stream(self, params):
+        response = self.client.get(f"{self.url}?stream=true&{params}", format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    @mock.patch.object(CustomNetBoxModelViewSet, "stream_chunk_size", 7)
+    def test_stream_all_objects(self):
+        objects = self._stream("")
+
+        self.assertEqual(len(objects), self.initial_record_count)
+        self.assertEqual(len({obj["id"] for obj in objects}), self.initial_record_count)
+
+    def test_stream_filtered(self):
+        objects = self._stream("name=PF-42")
+
+        self.assertEqual([obj["name"] for obj in objects], ["PF-42"])
+
+
+class DeviceCMDBBundleTestCase(APITestCase):
+    user_permissions = ("dcim.view_device", "netbox_cmdb.view_prefixlist")
+
+    @classmethod
+    def setUpTestData(cls):
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        cls.devices = [
+            Device.objects.create(
+                name=f"router-test{i}",
+                device_role=device_role,
+                device_type=device_type,
+                site=site,
+            )
+            for i in range(4)
+        ]
+        for device in cls.devices:
+            prefix_list = PrefixList.objects.create(name="PF-TEST", device=device)
+            PrefixListTerm.objects.create(prefix_list=prefix_list, sequence=5, prefix="10.0.0.0/8")
+
+    def test_bundle(self):
+        url = reverse(
+            "plugins-api:netbox_cmdb-api:device-cmdb-bundle", kwargs={"device": "router-test0"}
+        )
+        response = self.client.get(url, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response.data["device"]["id"], self.devices[0].pk)
+        self.assertEqual(len(response.data["prefix_lists"]), 1)
+        self.assertEqual(len(response.data["prefix_lists"][0]["terms"]), 1)
+        self.assertIsNone(response.data["snmp"])
+
+    def test_bundle_not_found(self):
+        url = reverse(
+            "plugins-api:netbox_cmdb-api:device-cmdb-bundle", kwargs={"device": "unknown"}
+        )
+        response = self.client.get(url, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_404_NOT_FOUND)
+
+    def test_bundles(self):
+        url = reverse("plugins-api:netbox_cmdb-api:device-cmdb-bundles")
+        data = {"devices": ["router-test0", str(self.devices[1].pk), "unknown"]}
+        response = self.client.post(url, data, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0]["device"]["name"], "router-test0")
+        self.assertEqual(lines[1]["device"]["name"], "router-test1")
+        self.assertEqual(len(lines[1]["prefix_lists"]), 1)
+        self.assertEqual(lines[2], {"device": "unknown", "error": "device not found"})
+
+    def _count_queries(self, devices):
+        url = reverse("plugins-api:netbox_cmdb-api:device-cmdb-bundles")
+        data = {"devices": [device.name for device in devices]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format="json", **self.header)
+            lines = b"".join(response.streaming_content).splitlines()
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(len(lines), len(devices))
+        return len(queries)
+
+    def test_bundles_query_count(self):
+        for device in self.devices[1:]:
+            for i in range(3):
+                prefix_list = PrefixList.objects.create(name=f"PF-{i}", device=device)
+                PrefixListTerm.objects.bulk_create(
+                    [
+                        PrefixListTerm(
+                            prefix_list=prefix_list, sequence=j * 5, prefix=f"10.{j}.0.0/16"
+                        )
+                        for j in range(1, 5)
+                    ]
+                )
+
+        # the objects of all the devices are fetched together
+        self.assertEqual(self._count_queries(self.devices[:1]), self._count_queries(self.devices))
+
+
+class CMDBChangesTestCase(APITestCase):
+    user_permissions = ("extras.view_objectchange",)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.url = reverse("plugins-api:netbox_cmdb-api:changes")
+
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        cls.device = Device.objects.create(
+            name="router-test",
+            device_role=device_role,
+            device_type=device_type,
+            site=site,
+        )
+
+    def _log(self, objects, action):
+        request = SimpleNamespace(user=self.user, id=uuid.uuid4())
+        changelog.log_bulk_changes(request, objects, action)
+
+    def test_changes(self):
+        response = self.client.get(self.url, format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        cursor = response.data["cursor"]
+
+        prefix_list = PrefixList.objects.create(name="PF-TEST", device=self.device)
+        term = PrefixListTerm.objects.create(
+            prefix_list=prefix_list, sequence=5, prefix="10.0.0.0/8"
+        )
+        self._log([prefix_list, term], ObjectChangeActionChoices.ACTION_CREATE)
+        term_pk = term.pk
+        term.snapshot()
+        self._log([term], ObjectChangeActionChoices.ACTION_DELETE)
+        term.delete()
+
+        response = self.client.get(f"{self.url}?since={cursor}", format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertFalse(response.data["more"])
+        self.assertNotEqual(response.data["cursor"], cursor)
+        self.assertEqual(
+            response.data["models"],
+            {
+                "netbox_cmdb.prefixlist": {"upserted": [prefix_list.pk], "deleted": []},
+                "netbox_cmdb.prefixlistterm": {"upserted": [], "deleted": [term_pk]},
+            },
+        )
+        device_changes = response.data["devices"][self.device.pk]
+        self.assertEqual(device_changes["netbox_cmdb.prefixlist"]["upserted"], [prefix_list.pk])
+        self.assertEqual(device_changes["netbox_cmdb.prefixlistterm"]["deleted"], [term_pk])
+
+        # nothing changed since the returned cursor
+        response = self.client.get(
+            f"{self.url}?since={response.data['cursor']}", format="json", **self.header
+        )
+        self.assertEqual(response.data["models"], {})
+
+    def test_late_commit(self):
+        response = self.client.get(self.url, format="json", **self.header)
+        cursor = response.data["cursor"]
+
+        prefix_lists = [
+            PrefixList.objects.create(name=f"PF-{i}", device=self.device) for i in range(3)
+        ]
+        self._log(prefix_lists, ObjectChangeActionChoices.ACTION_CREATE)
+        # the change of the second prefix list is committed after the others are read
+        late_change = ObjectChange.objects.get(
+            changed_object_type__model="prefixlist", changed_object_id=prefix_lists[1].pk
+        )
+        late_change.delete()
+
+        response = self.client.get(f"{self.url}?since={cursor}", format="json", **self.header)
+        self.assertEqual(
+            response.data["models"]["netbox_cmdb.prefixlist"]["upserted"],
+            [prefix_lists[0].pk, prefix_lists[2].pk],
+        )
+
+        late_change.save(force_insert=True)
+        response = self.client.get(
+            f"{self.url}?since={response.data['cursor']}", format="json", **self.header
+        )
+        self.assertEqual(
+            response.data["models"],
+            {"netbox_cmdb.prefixlist": {"upserted": [prefix_lists[1].pk], "deleted": []}},
+        )
+
+        response = self.client.get(
+            f"{self.url}?since={response.data['cursor']}", format="json", **self.header
+        )
+        self.assertEqual(response.data["models"], {})
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f"{self.url}?since=invalid", format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+
+
+class DevicesDecommissioningTestCase(APITestCase):
+    user_permissions = ("dcim.delete_device",)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.url = reverse("plugins-api:netbox_cmdb-api:devices-decommissioning")
+        sites = [Site.objects.create(name=f"site{i}", slug=f"site{i}") for i in range(2)]
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        for i in range(5):
+            device = Device.objects.create(
+                name=f"router-test{i}",
+                device_role=device_role,
+                device_type=device_type,
+                site=sites[i % 2],
+            )
+            PrefixList.objects.create(name="PF-TEST", device=device)
+
+    def _decommission(self, data):
+        response = self.client.delete(self.url, data, format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_decommission_devices(self):
+        lines = self._decommission(
+            {
+                "devices": ["router-test0", "router-test1", "router-test2", "unknown"],
+                "chunk_size": 2,
+            }
+        )
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0]["deleted"], ["router-test0", "router-test1"])
+        self.assertEqual(lines[0]["cmdb_objects"]["prefix_lists"], 2)
+        self.assertEqual(lines[1]["deleted"], ["router-test2"])
+        self.assertEqual(lines[2]["deleted"], 3)
+        self.assertEqual(lines[2]["failed"], [{"device": "unknown", "error": "device not found"}])
+        self.assertEqual(Device.objects.count(), 2)
+        self.assertEqual(PrefixList.objects.count(), 2)
+
+    def test_decommission_site(self):
+        lines = self._decommission({"site": "site0"})
+
+        self.assertEqual(lines[0]["deleted"], ["router-test0", "router-test2", "router-test4"])
+        self.assertFalse(Device.objects.filter(site__name="site0").exists())
+        self.assertEqual(Device.objects.count(), 2)
+
+    def test_devices_or_filter_required(self):
+        response = self.client.delete(self.url, {}, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+
+    def test_decommission_rack(self):
+        site = Site.objects.get(name="site0")
+        rack = Rack.objects.create(name="R01", site=site)
+        Rack.objects.create(name="R01", site=Site.objects.get(name="site1"))
+        Device.objects.filter(name__in=["router-test0", "router-test2"]).update(rack=rack)
+
+        lines = self._decommission({"site": "site0", "rack": "R01"})
+
+        self.assertEqual(lines[0]["deleted"], ["router-test0", "router-test2"])
+        self.assertEqual(Device.objects.count(), 3)
+
+    def test_rack_requires_site(self):
+        response = self.client.delete(self.url, {"rack": "R01"}, format="json", **self.header)
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+
+    def test_ambiguous_rack(self):
+        site = Site.objects.get(name="site0")
+        for name in ("loc1", "loc2"):
+            location = Location.objects.create(name=name, slug=name, site=site)
+            Rack.objects.create(name="R01", site=site, location=location)
+
+        response = self.client.delete(
+            self.url, {"site": "site0", "rack": "R01"}, format="json", **self.header
+        )
+
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Device.objects.count(), 5)
+
+
+class SiteDecommissioningJobTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        for i in range(3):
+            device = Device.objects.create(
+                name=f"router-test{i}",
+                device_role=device_role,
+                device_type=device_type,
+                site=cls.site,
+            )
+            PrefixList.objects.create(name="PF-TEST", device=device)
+
+    def _job_result(self):
+        return JobResult.objects.create(
+            name=self.site.name,
+            obj_type=ContentType.objects.get_for_model(Site),
+            user=self.user,
+            job_id=uuid.uuid4(),
+        )
+
+    def _job_url(self, job_result):
+        return reverse(
+            "plugins-api:netbox_cmdb-api:site-decommissioning-job",
+            kwargs={"job_id": job_result.job_id},
+        )
+
+    def test_enqueue(self):
+        url = reverse("plugins-api:netbox_cmdb-api:site-decommissioning-jobs")
+        with mock.patch.object(JobResult, "enqueue_job", return_value=self._job_result()):
+            response = self.client.post(
+                url, {"site_name": "SiteTest"}, format="json", **self.header
+            )
+        self.assertHttpStatus(response, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], JobResultStatusChoices.STATUS_PENDING)
+
+        # a site is decommissioned by one job at a time
+        response = self.client.post(url, {"site_name": "SiteTest"}, format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_409_CONFLICT)
+
+    def test_decommission_site(self):
+        job_result = self._job_result()
+        jobs.decommission_site(job_result, site_id=self.site.pk, chunk_size=2)
+
+        response = self.client.get(self._job_url(job_result), format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], JobResultStatusChoices.STATUS_COMPLETED)
+        progress = response.data["progress"]
+        self.assertEqual(progress["deleted_devices"], 3)
+        self.assertEqual(
+            [chunk["deleted"] for chunk in progress["chunks"]],
+            [["router-test0", "router-test1"], ["router-test2"]],
+        )
+        self.assertTrue(progress["topology_cleaned"])
+        self.assertFalse(Site.objects.filter(pk=self.site.pk).exists())
+        self.assertEqual(PrefixList.objects.count(), 0)
+
+        response = self.client.get(
+            f"{self._job_url(job_result)}?since_chunk=1", format="json", **self.header
+        )
+        self.assertEqual(len(response.data["progress"]["chunks"]), 1)
+
+    def test_decommission_site_change_log(self):
+        job_result = self._job_result()
+        jobs.decommission_site(job_result, site_id=self.site.pk, chunk_size=2)
+
+        deletions = ObjectChange.objects.filter(
+            request_id=job_result.job_id,
+            user=self.user,
+            action=ObjectChangeActionChoices.ACTION_DELETE,
+        )
+        self.assertEqual(deletions.filter(changed_object_type__model="device").count(), 3)
+        self.assertEqual(deletions.filter(changed_object_type__model="prefixlist").count(), 3)
+        self.assertEqual(deletions.filter(changed_object_type__model="site").count(), 1)
+
+    def test_cancel(self):
+        job_result = self._job_result()
+        response = self.client.delete(self._job_url(job_result), format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_202_ACCEPTED)
+
+        jobs.decommission_site(job_result, site_id=self.site.pk, chunk_size=2)
+
+        job_result.refresh_from_db()
+        self.assertEqual(job_result.status, JobResultStatusChoices.STATUS_FAILED)
+        self.assertEqual(job_result.data["message"], "cancelled")
+        self.assertEqual(Device.objects.filter(site=self.site).count(), 3)
+
+        response = self.client.delete(self._job_url(job_result), format="json", **self.header)
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+
+    def test_cancel_during_chunk(self):
+        job_result = self._job_result()
+        decommission_devices = cleaning.decommission_devices
+
+        def cancel_during_chunk(devices, chunk_size):
+            response = self.client.delete(self._job_url(job_result), format="json", **self.header)
+            self.assertHttpStatus(response, status.HTTP_202_ACCEPTED)
+            return decommission_devices(devices, chunk_size)
+
+        with mock.patch.object(cleaning, "decommission_devices", side_effect=cancel_during_chunk):
+            jobs.decommission_site(job_result, site_id=self.site.pk, chunk_size=2)
+
+        # the chunk in progress is done, the progress saved after it keeps the cancellation
+        job_result.refresh_from_db()
+        self.assertEqual(job_result.status, JobResultStatusChoices.STATUS_FAILED)
+        self.assertEqual(job_result.data["message"], "cancelled")
+        self.assertEqual(job_result.data["deleted_devices"], 2)
+        self.assertEqual(Device.objects.filter(site=self.site).count(), 1)
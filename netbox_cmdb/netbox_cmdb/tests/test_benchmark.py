@@ -0,0 +1,48 @@
+from utilities.testing import APITestCase
+
+from netbox_cmdb.api.urls import router
+from netbox_cmdb.helpers import benchmark
+
+
+class BenchmarkTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_superuser = True
+        self.user.save()
+
+    def test_every_viewset_has_a_payload(self):
+        self.assertEqual(
+            sorted(prefix for prefix, _, _ in router.registry), sorted(benchmark.PAYLOADS)
+        )
+
+    def test_run_benchmark(self):
+        fabric = benchmark.seed_fabric(
+            devices=3,
+            sessions_per_device=2,
+            policy_terms=2,
+            prefix_list_terms=2,
+            interfaces=2,
+            spares=3,
+        )
+        report = benchmark.run_benchmark(self.client, fabric, repeat=1, **self.header)
+
+        self.assertEqual(report["fabric"]["devices"], 3)
+        models = {prefix: viewset.queryset.model for prefix, viewset, _ in router.registry}
+        for prefix, endpoint in report["endpoints"].items():
+            with self.subTest(prefix=prefix):
+                self.assertEqual(endpoint["list"]["status"], 200)
+                self.assertEqual(endpoint["retrieve"]["status"], 200)
+                self.assertEqual(
+                    endpoint["create"].get("status"), 201, endpoint["create"].get("error")
+                )
+                self.assertEqual(
+                    endpoint["update"].get("status"), 200, endpoint["update"].get("error")
+                )
+                # the benchmark deletes nothing: both created objects are still there
+                self.assertGreaterEqual(models[prefix].objects.count(), endpoint["count"] + 2)
+                self.assertGreater(endpoint["list"]["queries"], 0)
+                self.assertIn("median", endpoint["list"]["time_ms"])
+        for name, result in report["filters"].items():
+            with self.subTest(name=name):
+                self.assertEqual(result["status"], 200)
+                self.assertTrue(result["plan"])
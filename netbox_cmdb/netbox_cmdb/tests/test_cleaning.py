@@ -0,0 +1,102 @@
+import uuid
+from types import SimpleNamespace
+
+from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
+from dcim.models.sites import Site
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from extras.models import ObjectChange
+from ipam.models.ip import IPAddress
+from netbox.context import current_request
+
+from netbox_cmdb.helpers.cleaning import clean_cmdb_for_devices
+from netbox_cmdb.models.bgp import ASN, AfiSafi, BGPSession, DeviceBGPSession
+from netbox_cmdb.models.prefix_list import PrefixList, PrefixListTerm
+from netbox_cmdb.models.route_policy import RoutePolicy, RoutePolicyTerm
+from netbox_cmdb.models.snmp import SNMP, SNMPCommunity
+
+
+class CleanCMDBForDevicesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        cls.devices = [
+            Device.objects.create(
+                name=f"router{i}", device_role=device_role, device_type=device_type, site=site
+            )
+            for i in range(2)
+        ]
+        asn = ASN.objects.create(number=65000, organization_name="test")
+
+        peers = []
+        for i, device in enumerate(cls.devices):
+            route_policy = RoutePolicy.objects.create(name="RP", device=device)
+            prefix_list = PrefixList.objects.create(name="PF", device=device)
+            PrefixListTerm.objects.create(prefix_list=prefix_list, sequence=5, prefix="10.0.0.0/8")
+            RoutePolicyTerm.objects.create(
+                route_policy=route_policy, sequence=10, from_prefix_list=prefix_list
+            )
+            peer = DeviceBGPSession.objects.create(
+                device=device,
+                local_address=IPAddress.objects.create(address=f"10.0.0.{i}/32"),
+                local_asn=asn,
+            )
+            AfiSafi.objects.create(
+                device_bgp_session=peer, afi_safi_name="ipv4-unicast", route_policy_in=route_policy
+            )
+            peers.append(peer)
+
+            snmp = SNMP.objects.create(device=device)
+            snmp.community_list.add(SNMPCommunity.objects.create(name=f"com{i}", community="c"))
+        BGPSession.objects.create(peer_a=peers[0], peer_b=peers[1])
+
+    def test_clean(self):
+        expected = {
+            "bgp_sessions": [str(session) for session in BGPSession.objects.all()],
+            "device_bgp_sessions": [str(DeviceBGPSession.objects.get(device=self.devices[0]))],
+            "route_policies": [str(RoutePolicy.objects.get(device=self.devices[0]))],
+            "prefix_lists": [str(PrefixList.objects.get(device=self.devices[0]))],
+            "snmp": [str(SNMP.objects.get(device=self.devices[0]))],
+        }
+
+        deleted = clean_cmdb_for_devices([self.devices[0].pk])
+
+        for name, labels in expected.items():
+            self.assertEqual(deleted[name], labels)
+        self.assertEqual(deleted["bgp_peer_groups"], [])
+        self.assertEqual(BGPSession.objects.count(), 0)
+        self.assertEqual(DeviceBGPSession.objects.count(), 1)
+        self.assertEqual(AfiSafi.objects.count(), 1)
+        self.assertEqual(RoutePolicyTerm.objects.count(), 1)
+        self.assertEqual(PrefixListTerm.objects.count(), 1)
+        self.assertEqual(SNMP.community_list.through.objects.count(), 1)
+        self.assertEqual(SNMPCommunity.objects.count(), 2)
+
+    def test_clean_counts_only(self):
+        deleted = clean_cmdb_for_devices([dev.pk for dev in self.devices], counts_only=True)
+
+        self.assertEqual(deleted["bgp_sessions"], 1)
+        self.assertEqual(deleted["device_bgp_sessions"], 2)
+        self.assertEqual(deleted["route_policies"], 2)
+        self.assertEqual(deleted["snmp"], 2)
+        self.assertEqual(RoutePolicy.objects.count(), 0)
+        self.assertEqual(PrefixList.objects.count(), 0)
+
+    def test_clean_logs_changes(self):
+        user = get_user_model().objects.create(username="test")
+        token = current_request.set(SimpleNamespace(user=user, id=uuid.uuid4()))
+        try:
+            clean_cmdb_for_devices([self.devices[0].pk], counts_only=True)
+        finally:
+            current_request.reset(token)
+
+        changes = ObjectChange.objects.filter(changed_object_type__app_label="netbox_cmdb")
+        self.assertEqual(changes.filter(changed_object_type__model="prefixlistterm").count(), 1)
+        change = changes.get(changed_object_type__model="prefixlist")
+        self.assertEqual(change.object_repr, "router0-PF")
+        self.assertEqual(change.prechange_data["device"], self.devices[0].pk)
@@ -0,0 +1,90 @@
+from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
+from dcim.models.sites import Site
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from ipam.models.ip import IPAddress
+
+from netbox_cmdb.helpers import references
+from netbox_cmdb.helpers.cleaning import clean_cmdb_for_devices
+from netbox_cmdb.models.bgp import ASN, BGPSession, DeviceBGPSession
+from netbox_cmdb.models.device_reference import DeviceReference
+from netbox_cmdb.models.prefix_list import PrefixList
+from netbox_cmdb.models.route_policy import RoutePolicy
+
+
+class DeviceReferenceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        cls.devices = [
+            Device.objects.create(
+                name=f"router{i}", device_role=device_role, device_type=device_type, site=site
+            )
+            for i in range(3)
+        ]
+        asn = ASN.objects.create(number=65000, organization_name="test")
+        cls.peers = [
+            DeviceBGPSession.objects.create(
+                device=device,
+                local_address=IPAddress.objects.create(address=f"10.0.0.{i}/32"),
+                local_asn=asn,
+            )
+            for i, device in enumerate(cls.devices[:2])
+        ]
+        cls.session = BGPSession.objects.create(peer_a=cls.peers[0], peer_b=cls.peers[1])
+        PrefixList.objects.create(name="PF", device=cls.devices[0])
+
+    def test_index_maintained(self):
+        self.assertEqual(
+            references.count_device_objects([self.devices[0].pk]),
+            {"BGP Sessions": 1, "Device BGP Sessions": 1, "prefix lists": 1},
+        )
+        self.assertEqual(
+            references.count_device_objects(self.devices),
+            {"BGP Sessions": 1, "Device BGP Sessions": 2, "prefix lists": 1},
+        )
+
+    def test_creation_costs_one_query(self):
+        ContentType.objects.get_for_model(RoutePolicy)
+        with self.assertNumQueries(2):
+            RoutePolicy.objects.create(name="RP", device=self.devices[0])
+
+    def test_move_updates_dependents(self):
+        self.peers[1].device = self.devices[2]
+        self.peers[1].save()
+
+        sessions = references.get_referencing_ids(BGPSession, [self.devices[2].pk])
+        self.assertEqual([ref["object_id"] for ref in sessions], [self.session.pk])
+        self.assertFalse(
+            references.get_device_references([self.devices[1].pk], BGPSession).exists()
+        )
+
+    def test_delete(self):
+        self.session.delete()
+
+        self.assertFalse(references.get_device_references(self.devices, BGPSession).exists())
+
+    def test_clean_forgets_references(self):
+        clean_cmdb_for_devices([self.devices[0].pk], counts_only=True)
+
+        self.assertFalse(DeviceReference.objects.filter(device=self.devices[0]).exists())
+        self.assertFalse(
+            DeviceReference.objects.filter(device=self.devices[1], kind="peer_b__device").exists()
+        )
+
+    def test_verify_and_rebuild(self):
+        self.assertFalse(
+            any(diff["missing"] or diff["stale"] for diff in references.verify().values())
+        )
+
+        # bulk writes bypass signals
+        PrefixList.objects.filter(device=self.devices[0]).update(device=self.devices[1])
+        self.assertEqual(references.verify()["netbox_cmdb.PrefixList"], {"missing": 1, "stale": 1})
+
+        self.assertEqual(references.rebuild(), 5)
+        self.assertEqual(references.verify()["netbox_cmdb.PrefixList"], {"missing": 0, "stale": 0})
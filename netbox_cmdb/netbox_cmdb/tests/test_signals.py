@@ -0,0 +1,119 @@
+from dcim.models.devices import Device, DeviceRole, DeviceType, Manufacturer
+from dcim.models.sites import Site
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from ipam.models.ip import IPAddress
+
+from netbox_cmdb.models.bgp import ASN, DeviceBGPSession
+from netbox_cmdb.models.prefix_list import PrefixList
+from netbox_cmdb.signals import (
+    check_ip_address_changes,
+    protect_from_device_name_change,
+    protect_from_ip_address_change,
+)
+
+
+class DeviceNameProtectionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        for name in ["linked", "unlinked"]:
+            Device.objects.create(
+                name=name, device_role=device_role, device_type=device_type, site=site
+            )
+        PrefixList.objects.create(name="PF-TEST", device=Device.objects.get(name="linked"))
+
+    def test_unchanged_name_costs_no_query(self):
+        device = Device.objects.get(name="linked")
+        device.serial = "1234"
+
+        with self.assertNumQueries(0):
+            protect_from_device_name_change(Device, device)
+
+    def test_rename_checked_in_one_query(self):
+        device = Device.objects.get(name="linked")
+        device.name = "renamed"
+
+        with self.assertNumQueries(1), self.assertRaises(ValidationError):
+            protect_from_device_name_change(Device, device)
+
+    def test_rename_unlinked_device(self):
+        device = Device.objects.get(name="unlinked")
+        device.name = "renamed"
+        device.save()
+
+        # the name as saved is the new reference
+        device.name = "unlinked"
+        device.save()
+        self.assertTrue(Device.objects.filter(name="unlinked").exists())
+
+    def test_rename_deferred_name(self):
+        device = Device.objects.only("pk").get(name="linked")
+        device.name = "renamed"
+
+        with self.assertRaises(ValidationError):
+            protect_from_device_name_change(Device, device)
+
+
+class IPAddressProtectionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site = Site.objects.create(name="SiteTest", slug="site-test")
+        manufacturer = Manufacturer.objects.create(name="test", slug="test")
+        device_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model="model-test", slug="model-test"
+        )
+        device_role = DeviceRole.objects.create(name="role-test", slug="role-test")
+        device = Device.objects.create(
+            name="router", device_role=device_role, device_type=device_type, site=site
+        )
+        DeviceBGPSession.objects.create(
+            device=device,
+            local_address=IPAddress.objects.create(address="10.0.0.1/32"),
+            local_asn=ASN.objects.create(number=65000, organization_name="test"),
+        )
+        IPAddress.objects.create(address="10.0.0.2/32")
+
+    def test_status_change_costs_no_query(self):
+        ip = IPAddress.objects.get(address="10.0.0.1/32")
+        ip.description = "loopback"
+        ip.address = "10.0.0.1/31"
+
+        with self.assertNumQueries(0):
+            protect_from_ip_address_change(IPAddress, ip)
+
+    def test_address_change_checked_in_one_query(self):
+        ip = IPAddress.objects.get(address="10.0.0.1/32")
+        ip.address = "10.0.0.3/32"
+
+        with self.assertNumQueries(1), self.assertRaises(ValidationError):
+            protect_from_ip_address_change(IPAddress, ip)
+
+    def test_address_change_unlinked(self):
+        ip = IPAddress.objects.get(address="10.0.0.2/32")
+        ip.address = "10.0.0.3/32"
+        ip.save()
+
+        ip.address = "10.0.0.2/32"
+        ip.save()
+        self.assertTrue(IPAddress.objects.filter(address="10.0.0.2/32").exists())
+
+    def test_bulk_queryset(self):
+        with self.assertNumQueries(1), self.assertRaises(ValidationError):
+            check_ip_address_changes(IPAddress.objects.all())
+
+        check_ip_address_changes(IPAddress.objects.filter(address="10.0.0.2/32"))
+
+    def test_bulk_instances(self):
+        ips = list(IPAddress.objects.order_by("address"))
+        ips[1].address = "10.0.0.3/32"
+        check_ip_address_changes(ips)
+
+        ips[0].address = "10.0.0.4/32"
+        with self.assertNumQueries(1), self.assertRaises(ValidationError):
+            check_ip_address_changes(ips)
@@ -1,14 +1,15 @@
 """Views."""
 
-import math
 from datetime import datetime
 
 from dcim.models import Device, DeviceRole, DeviceType, Site
 from django.db import transaction
 from django.db.models import Count, Q
 from django.shortcuts import get_object_or_404, render
+from django.utils.html import escape, format_html, format_html_join
 from django.views.generic import View
 from django_tables2 import RequestConfig
+from extras.choices import JobResultStatusChoices
 from netbox.views.generic import (
     ObjectDeleteView,
     ObjectEditView,
@@ -21,6 +22,7 @@ from utilities.paginator import EnhancedPaginator, get_paginate_count
 from utilities.utils import count_related
 from utilities.views import ObjectPermissionRequiredMixin
 
+from netbox_cmdb import jobs
 from netbox_cmdb.filtersets import (
     ASNFilterSet,
     BGPPeerGroupFilterSet,
@@ -52,7 +54,7 @@ from netbox_cmdb.forms import (
     TacacsForm,
     TacacsServerForm,
 )
-from netbox_cmdb.helpers import cleaning
+from netbox_cmdb.helpers import cleaning, references
 from netbox_cmdb.models.bgp import (
     ASN,
     AfiSafi,
@@ -110,6 +112,7 @@ class DeviceDecommissioningView(DecommissioningBaseView):
                 "object": device,
                 "object_type": "device",
                 "form": form,
+                "cmdb_objects": references.count_device_objects([device.pk]),
                 "return_url": self.get_return_url(request, device),
                 **self.get_extra_context(request, device),
             },
@@ -140,6 +143,8 @@ class DeviceDecommissioningView(DecommissioningBaseView):
 class SiteDecommissioningView(DecommissioningBaseView):
     base_form_url = "/plugins/cmdb/decommissioning/site"
     queryset = Site.objects.all()
+    # Devices deleted per transaction by the decommissioning job
+    CHUNK_SIZE = 20
 
     def get(self, request, *args, **kwargs):
         site = self.get_object(**kwargs)
@@ -152,43 +157,33 @@ class SiteDecommissioningView(DecommissioningBaseView):
                 "object": site,
                 "object_type": "site",
                 "form": form,
+                "cmdb_objects": references.count_device_objects(
+                    Device.objects.filter(site=site).values("pk")
+                ),
                 "return_url": self.get_return_url(request, site),
                 **self.get_extra_context(request, site),
             },
         )
 
     def post(self, request, *args, **kwargs):
-        # Fetch the device to delete
-        site = self.get_object(**kwargs)
-        devices = Device.objects.filter(site=site.id)
-
-        # Get list of devices to delete
-        CHUNK_SIZE = 20
-        device_ids = [dev.id for dev in devices]
-        remaining_chunks = math.ceil(len(device_ids) / CHUNK_SIZE)
+        """Queue the decommissioning job of the site, then render its progress.
 
-        # We avoid an infinite loop if we fail to delete devices
-        if request.POST.get("chunks"):
-            previously_remaining_chunks = int(request.POST["chunks"])
-            if remaining_chunks >= previously_remaining_chunks:
-                return render(
-                    request,
-                    self.site_template_name,
-                    context={
-                        "object": site,
-                        "object_type": "site",
-                        "status": '<span class="badge bg-danger">Failed</span>',
-                        "error": "devices are not being deleted, stopping here",
-                        "chunks": remaining_chunks,
-                        "stop": True,
-                    },
-                )
+        The rendered form posts back the job id and the number of chunks already shown, for
+        the page to poll the job until it is finished.
+        """
+        site = self.get_object(**kwargs)
 
-        if not device_ids:
+        if "job" in request.POST:
             try:
-                with transaction.atomic():
-                    cleaning.clean_site_topology(site)
-            except Exception as error:
+                job_result = (
+                    jobs.get_site_decommissioning_jobs()
+                    .filter(pk=int(request.POST["job"]), name=site.name)
+                    .first()
+                )
+                since_chunk = max(int(request.POST.get("since_chunk", 0)), 0)
+            except ValueError:
+                job_result = None
+            if job_result is None:
                 return render(
                     request,
                     self.site_template_name,
@@ -196,64 +191,59 @@ class SiteDecommissioningView(DecommissioningBaseView):
                         "object": site,
                         "object_type": "site",
                         "status": '<span class="badge bg-danger">Failed</span>',
-                        "error": f"Topology cleaning failure: {error}",
-                        "chunks": remaining_chunks,
+                        "error": "decommissioning job not found",
                         "stop": True,
                     },
                 )
-
-        chunk = device_ids[0:CHUNK_SIZE]
-
-        try:
-            with transaction.atomic():
-                cleaning.clean_cmdb_for_devices(chunk)
-                device_names = [dev.name for dev in devices[0:CHUNK_SIZE]]
-                for dev in devices[0:CHUNK_SIZE]:
-                    dev.delete()
-
-        except Exception as error:
-            return render(
-                request,
-                self.site_template_name,
-                context={
-                    "object": site,
-                    "object_type": "site",
-                    "status": '<span class="badge bg-danger">Failed</span>',
-                    "error": f"Device cleaning failure: {error}",
-                    "chunks": remaining_chunks,
-                    "stop": True,
-                },
+        else:
+            # a decommissioning in progress is followed instead of being queued twice
+            job_result = jobs.get_site_decommissioning_in_progress(site)
+            if job_result is None:
+                job_result = jobs.enqueue_site_decommissioning(site, request.user, self.CHUNK_SIZE)
+            since_chunk = 0
+
+        progress = job_result.data or {}
+        chunks = progress.get("chunks", [])
+        messages = [
+            format_html(
+                '<div class="mb-3 alert alert-secondary"><b>{}</b> - deleted: {}</div>',
+                datetime.now().strftime("%H:%M:%S"),
+                chunk["deleted"],
             )
-
-        # Tell the client to continue requesting deletion
-        if remaining_chunks:
-            status = f"Number of devices to delete: {len(device_ids) - len(chunk)}"
-            message = f'<div class="mb-3 alert alert-secondary"><b>{datetime.now().strftime("%H:%M:%S")}</b> - deleted: {device_names}</div>'
-
-            return render(
-                request,
-                self.site_template_name,
-                context={
-                    "object": site,
-                    "object_type": "site",
-                    "status": status,
-                    "message": message,
-                    "chunks": remaining_chunks,
-                },
+            for chunk in chunks[since_chunk:]
+        ]
+        context = {
+            "object": site,
+            "object_type": "site",
+            "job": job_result.pk,
+            "since_chunk": len(chunks),
+        }
+
+        if job_result.status == JobResultStatusChoices.STATUS_COMPLETED:
+            context["status"] = '<span class="badge bg-success">Success</span>'
+            messages.append(
+                format_html(
+                    '<div class="mb-3 alert alert-success">{}: site, racks, locations, devices '
+                    "and CMDB deleted</div>",
+                    site.name,
+                )
             )
-
-        return render(
-            request,
-            self.site_template_name,
-            context={
-                "object": site,
-                "object_type": "site",
-                "status": '<span class="badge bg-success">Success</span>',
-                "message": f'<div class="mb-3 alert alert-success">{site.name}: site, racks, locations, devices and CMDB deleted</div>',
-                "chunks": remaining_chunks,
-                "stop": True,
-            },
+            context["stop"] = True
+        elif job_result.status in JobResultStatusChoices.TERMINAL_STATE_CHOICES:
+            context["status"] = '<span class="badge bg-danger">Failed</span>'
+            context["error"] = escape(progress.get("message", job_result.status))
+            context["stop"] = True
+        elif "total_devices" in progress:
+            remaining = progress["total_devices"] - progress["deleted_devices"]
+            context["status"] = f"Number of devices to delete: {remaining}"
+        else:
+            context["status"] = "Waiting for the decommissioning job to start"
+
+        # the newest message is shown first
+        context["message"] = format_html_join(
+            "", "{}", ((message,) for message in reversed(messages))
         )
+        return render(request, self.site_template_name, context=context)
 
 
 ## ASN views